@@ -13,7 +13,8 @@ from urllib.request import urlopen, Request
 from models import Account, AccountCreate, UpdateSchedule, AddTitleGroups
 from store import load_accounts, save_account, get_account, delete_account, get_account_auth_dir
 from service_ftp import create_ftp_account, delete_ftp_account
-from service_broadcast import start_scheduler, refresh_scheduler
+from service_broadcast import start_scheduler, refresh_scheduler, list_active_broadcasts
+from youtube.fonts import preload_fonts
 import settings
 
 # Setup logging
@@ -280,6 +281,10 @@ def get_account_logs(name: str, current_user: str = Depends(get_current_user)):
         
     return logs[::-1]
 
+@app.get("/broadcasts/active")
+def get_active_broadcasts(current_user: str = Depends(get_current_user)):
+    return list_active_broadcasts()
+
 @app.put("/accounts/{name}/title_groups")
 def update_title_groups(name: str, payload: AddTitleGroups, current_user: str = Depends(get_current_user)):
     account = get_account(name)
@@ -341,4 +346,6 @@ def update_schedule(name: str, schedule: UpdateSchedule, current_user: str = Dep
 
 @app.on_event("startup")
 def startup_event():
+    # Load caption fonts once so scheduled jobs (and forked broadcast processes) reuse them
+    preload_fonts()
     start_scheduler()
@@ -7,6 +7,7 @@ from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from store import load_accounts, save_account, get_account_auth_dir
 from models import Account
@@ -15,14 +16,29 @@ import settings
 # Add parent directory to path to import upload_stream
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import upload_stream
+import normalize_live
+from youtube.media_probe import configure_media_probe
+from youtube.cover_pool import CoverPool, CoverProducer
+from youtube.broadcast_metrics import BroadcastMetrics
 
 logger = logging.getLogger(__name__)
 
+# 所有直播进程共享同一个持久化的 ffprobe 结果缓存
+configure_media_probe(settings.MEDIA_PROBE_DB)
+
 executors = {
-    'default': ThreadPoolExecutor(settings.SCHEDULER_MAX_WORKERS)
+    'default': ThreadPoolExecutor(settings.SCHEDULER_MAX_WORKERS),
+    # 素材预处理（libx264 编码可能持续数小时）单独一个线程，一次只处理一个任务，不占用直播任务的线程
+    'normalize': ThreadPoolExecutor(1)
 }
 scheduler = BackgroundScheduler(executors=executors)
 
+# 后台补齐各账号 live_cover/ 的封面，直播任务只取现成的封面，不在任务内生成
+cover_producer = CoverProducer(workers=settings.COVER_POOL_WORKERS)
+
+# 各直播进程把实时指标写入同一个 SQLite 文件，门户从这里汇总
+broadcast_metrics = BroadcastMetrics(settings.BROADCAST_METRICS_DB)
+
 LOG_DIR = os.path.join(os.path.dirname(__file__), "data", "broadcast_log")
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
@@ -60,11 +76,11 @@ def append_broadcast_log(account_name: str, status: str, title: str, message: st
     except Exception as e:
         logger.error(f"Failed to write log for {account_name}: {e}")
 
-def get_random_video(account_name: str):
+def list_live_videos(account_name: str, dirname: str = normalize_live.LIVE_DIRNAME):
     account_dir = os.path.join(settings.FTP_ROOT_DIR, account_name)
-    live_dir = os.path.join(account_dir, "live")
+    live_dir = os.path.join(account_dir, dirname)
     if not os.path.exists(live_dir):
-        return None
+        return []
     
     videos = []
     video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.flv', '.ts'}
@@ -90,10 +106,38 @@ def get_random_video(account_name: str):
     except Exception:
         pass
     
+    return videos
+
+def pick_day_playlist(videos):
+    """
+    Groups videos by their live/<date> directory and returns one day's files: today's if
+    there are any, otherwise a random day's.
+    """
+    days = {}
+    for video in videos:
+        days.setdefault(os.path.basename(os.path.dirname(video)), []).append(video)
+    day = datetime.now().strftime('%Y-%m-%d')
+    if day not in days:
+        day = random.choice(list(days.keys()))
+    return sorted(days[day])
+
+def get_playlist(account_name: str):
+    """
+    Returns (playlist, stream mode). Normalized material from live_ready/ is streamed in
+    "auto" mode: every file shares one format, so the uniformity check picks stream copy, and
+    anything left over from an older normalization target is transcoded instead of spliced.
+    Raw live/ files are only used until the normalizer has caught up.
+    """
+    videos = list_live_videos(account_name, normalize_live.READY_DIRNAME)
+    if videos:
+        return pick_day_playlist(videos), "auto"
+
+    videos = list_live_videos(account_name)
     if not videos:
-        return None
+        return [], None
     
-    return random.choice(videos)
+    logger.warning(f"No normalized videos for {account_name} yet, streaming raw material")
+    return pick_day_playlist(videos), settings.STREAM_MODE
 
 def get_random_cover(account_name: str):
     account_dir = os.path.join(settings.FTP_ROOT_DIR, account_name)
@@ -111,6 +155,27 @@ def get_random_cover(account_name: str):
 
     return random.choice(covers) if covers else None
 
+def live_cover_pool(account_name: str) -> CoverPool:
+    account_dir = os.path.join(settings.FTP_ROOT_DIR, account_name)
+    return CoverPool(
+        cover_dir=os.path.join(account_dir, "live_cover"),
+        videos=list_live_videos(account_name),
+        low_water=settings.COVER_POOL_LOW_WATER,
+    )
+
+def replenish_cover_pools(account_names=None):
+    """
+    Queues every account's live_cover/ that is below the low-water mark; never waits for generation.
+    """
+    if settings.COVER_POOL_LOW_WATER <= 0:
+        return 0
+    if account_names is None:
+        account_names = list(load_accounts().keys())
+    queued = cover_producer.request(live_cover_pool(name) for name in account_names)
+    if queued:
+        logger.info(f"Queued cover generation for {queued} live_cover pools")
+    return queued
+
 def broadcast_task(account_name: str, time_str: str):
     start_time = datetime.now()
     logger.info(f"Starting broadcast task for account: {account_name} at {time_str}")
@@ -142,14 +207,16 @@ def broadcast_task(account_name: str, time_str: str):
         description = group.description
 
     # Select Video
-    video_file = get_random_video(account_name)
-    if not video_file:
+    playlist, stream_mode = get_playlist(account_name)
+    if not playlist:
         logger.error(f"No valid video files found for {account_name}")
         append_broadcast_log(account_name, "FAILED", title, "No video files found", "0:00:00")
         return
 
     # Select Cover (Thumbnail)
     cover_file = get_random_cover(account_name)
+    # Top the pool up in the background for the next broadcasts
+    replenish_cover_pools([account_name])
     
     # Log file for this broadcast run
     log_file = os.path.join(LOG_DIR, f"{account_name}_broadcast.log")
@@ -162,18 +229,22 @@ def broadcast_task(account_name: str, time_str: str):
             target=upload_stream.run_broadcast,
             kwargs={
                 "auth_dir": auth_dir,
-                "video_file": video_file,
+                "video_file": playlist,
                 "title": title,
                 "description": description,
                 "privacy_status": "public",
                 "duration": float(account.duration),
                 "thumbnail": cover_file,
-                "log_file": log_file
+                "log_file": log_file,
+                "stream_mode": stream_mode,
+                "shuffle": True,
+                "account_name": account_name,
+                "metrics_db": settings.BROADCAST_METRICS_DB
             }
         )
         p.start()
         
-        append_broadcast_log(account_name, "STARTED", title, f"PID: {p.pid} | Video: {os.path.basename(video_file)}", "0:00:00")
+        append_broadcast_log(account_name, "STARTED", title, f"PID: {p.pid} | Videos: {len(playlist)} from {os.path.basename(os.path.dirname(playlist[0]))}", "0:00:00")
 
         # Update last broadcast time
         account.last_broadcast = datetime.now()
@@ -184,6 +255,28 @@ def broadcast_task(account_name: str, time_str: str):
         append_broadcast_log(account_name, "ERROR", title, str(e), "0:00:00")
 
 
+def list_active_broadcasts():
+    """
+    Live metrics of every running broadcast process, the ones falling behind first.
+    """
+    return broadcast_metrics.active()
+
+
+def normalize_live_task():
+    """
+    Normalizes new live/ material of every account into live_ready/ (see normalize_live.py).
+    """
+    for name in load_accounts().keys():
+        account_dir = os.path.join(settings.FTP_ROOT_DIR, name)
+        if not os.path.isdir(os.path.join(account_dir, normalize_live.LIVE_DIRNAME)):
+            continue
+        try:
+            summary = normalize_live.normalize_account(account_dir, workers=settings.NORMALIZE_WORKERS)
+            if summary["normalized"] or summary["remuxed"] or summary["failed"] or summary["removed"]:
+                logger.info(f"Normalized live material for {name}: {summary}")
+        except Exception as e:
+            logger.exception(f"Failed to normalize live material for {name}: {e}")
+
 def refresh_scheduler():
     """
     Reloads all schedules from the store.
@@ -207,6 +300,27 @@ def refresh_scheduler():
                 except ValueError:
                     logger.error(f"Invalid time format for {name}: {time_str}")
 
+    if settings.COVER_POOL_LOW_WATER > 0:
+        scheduler.add_job(
+            replenish_cover_pools,
+            IntervalTrigger(minutes=settings.COVER_POOL_CHECK_MINUTES),
+            id="cover_pool",
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+
+    if settings.NORMALIZE_CHECK_MINUTES > 0:
+        scheduler.add_job(
+            normalize_live_task,
+            IntervalTrigger(minutes=settings.NORMALIZE_CHECK_MINUTES),
+            id="normalize_live",
+            executor="normalize",
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+
 def start_scheduler():
     if not scheduler.running:
         scheduler.start()
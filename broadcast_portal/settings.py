@@ -44,9 +44,34 @@ if not os.path.isabs(_ftp_root_raw):
 else:
     FTP_ROOT_DIR = _ftp_root_raw
 
+# 媒体探测结果缓存（SQLite），默认放在 FTP 根目录旁，避免调度器反复 ffprobe 未变化的视频
+MEDIA_PROBE_DB = os.getenv("MEDIA_PROBE_DB", _config.get("MEDIA_PROBE_DB", os.path.join(os.path.dirname(FTP_ROOT_DIR), "media_probe.sqlite3")))
+
+# 直播实时指标（SQLite）：各直播进程定期写入 ffmpeg 进度、重启次数、YouTube 状态与 CPU/RSS，供 /broadcasts/active 汇总
+BROADCAST_METRICS_DB = os.getenv("BROADCAST_METRICS_DB", _config.get("BROADCAST_METRICS_DB", os.path.join(_current_dir, "data", "broadcast_metrics.sqlite3")))
+
 # FTP下的子目录
 SUBDIRS = _config.get("SUBDIRS", "")
 
+# 直播推流模式：auto（源文件已是 H.264/AAC 且关键帧间隔、码率符合 YouTube 推流要求时直接 -c copy，否则 libx264 转码）、copy、transcode
+# 已预处理到 live_ready/ 的素材总是 copy，该设置只用于尚未预处理的 live/ 原始素材
+STREAM_MODE = os.getenv("STREAM_MODE", _config.get("STREAM_MODE", "auto"))
+
+# 素材预处理：每隔多少分钟把 live/ 下新增的素材转成可直接推流的 live_ready/ 文件（0 表示关闭）
+NORMALIZE_CHECK_MINUTES = int(os.getenv("NORMALIZE_CHECK_MINUTES", _config.get("NORMALIZE_CHECK_MINUTES", 30)))
+
+# 同时预处理的文件数（libx264 本身已多线程）
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", _config.get("NORMALIZE_WORKERS", 1)))
+
+# 后台封面池：封面目录中的封面少于低水位时在后台补齐（0 表示关闭）
+COVER_POOL_LOW_WATER = int(os.getenv("COVER_POOL_LOW_WATER", _config.get("COVER_POOL_LOW_WATER", 5)))
+
+# 封面生成的工作进程数（与直播/上传共用 CPU，默认只占一个核）
+COVER_POOL_WORKERS = int(os.getenv("COVER_POOL_WORKERS", _config.get("COVER_POOL_WORKERS", 1)))
+
+# 检查封面池的间隔（分钟）
+COVER_POOL_CHECK_MINUTES = int(os.getenv("COVER_POOL_CHECK_MINUTES", _config.get("COVER_POOL_CHECK_MINUTES", 10)))
+
 # Max broadcast times per account
 MAX_BROADCAST_TIMES_PER_ACCOUNT = int(os.getenv("MAX_BROADCAST_TIMES_PER_ACCOUNT", _config.get("MAX_BROADCAST_TIMES_PER_ACCOUNT", 4)))
 
@@ -0,0 +1,240 @@
+"""
+Normalize live material ahead of time so broadcasts can push it with stream copy.
+
+Every broadcast used to re-encode the same `live/<date>/*.mp4` files on the fly. This
+script converts each new file under an account's `live/` tree once into
+`live_ready/<date>/<name>.mp4`:
+
+- H.264 (libx264, yuv420p), scaled and padded to one frame size (1920x1080) at one
+  frame rate (30 fps), a keyframe every 2 s and no scene-cut keyframes, constant
+  bitrate (nal-hrd=cbr);
+- AAC 128k 44.1 kHz stereo (a silent track is added when the source has none);
+- MP4 with the moov atom up front (`-movflags +faststart`).
+
+Every output shares the same stream parameters, so any day's files can be joined into
+one playlist and pushed with `-c copy`. Only sources whose video already matches the
+target exactly (`matches_target`: codec, pixel format, frame size, frame rate, keyframe
+interval, bitrate no higher than the target) skip the video encode; their audio is still
+made 44.1 kHz stereo AAC (or a silent track is added), everything else is transcoded.
+
+Results are recorded in `live_ready/.normalize_manifest.json` keyed by the source's size
+and mtime and the target (`TARGET_ID`), so unchanged files are never processed twice and
+changing the target redoes everything; files that are still being uploaded (modified
+within the last minute) are left for the next run, and outputs whose source was deleted
+are removed.
+
+Usage:
+    python normalize_live.py /home/ftp/cook /home/ftp/tetris --workers 2
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from youtube.media_probe import probe_media
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LIVE_DIRNAME = "live"
+READY_DIRNAME = "live_ready"
+MANIFEST_NAME = ".normalize_manifest.json"
+
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.flv', '.ts'}
+
+# Encoding target shared by all normalized material
+TARGET_WIDTH = 1920
+TARGET_HEIGHT = 1080
+TARGET_FPS = 30
+KEYFRAME_SECONDS = 2
+VIDEO_BITRATE = "4500k"
+AUDIO_BITRATE = "128k"
+AUDIO_RATE = 44100
+AUDIO_CHANNELS = 2
+# Recorded in the manifest: outputs made for another target are redone
+TARGET_ID = f"{TARGET_WIDTH}x{TARGET_HEIGHT}@{TARGET_FPS}/g{KEYFRAME_SECONDS}/{VIDEO_BITRATE}/{AUDIO_RATE}x{AUDIO_CHANNELS}"
+# Offline encode: spend more CPU once for better quality at the same bitrate
+PRESET = "medium"
+
+# Files modified more recently than this are probably still being uploaded
+STABLE_SECONDS = 60
+
+
+def ready_path(account_dir: str, src: str) -> str:
+    """`<account>/live/<date>/<name>.<ext>` -> `<account>/live_ready/<date>/<name>.mp4`."""
+    rel = os.path.relpath(src, os.path.join(account_dir, LIVE_DIRNAME))
+    return os.path.join(account_dir, READY_DIRNAME, os.path.splitext(rel)[0] + ".mp4")
+
+
+def matches_target(info) -> bool:
+    """Whether the video stream of a probed source already is the normalization target."""
+    if info is None or info.keyframe_interval is None or not info.fps:
+        return False
+    return (
+        info.video_codec == 'h264'
+        and info.pix_fmt == 'yuv420p'
+        and (info.width, info.height) == (TARGET_WIDTH, TARGET_HEIGHT)
+        and abs(info.fps - TARGET_FPS) < 0.01
+        and abs(info.keyframe_interval - KEYFRAME_SECONDS) < 0.05
+        and bool(info.bit_rate)
+        and info.bit_rate <= (int(VIDEO_BITRATE.rstrip("k")) + int(AUDIO_BITRATE.rstrip("k"))) * 1000
+    )
+
+
+def normalize_command(src: str, dst: str, info) -> List[str]:
+    """ffmpeg command that writes the ingest-ready version of `src` to `dst` (MP4)."""
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', src]
+    if info is not None and not info.audio_codec:
+        command += ['-f', 'lavfi', '-i', f'anullsrc=r={AUDIO_RATE}:cl=stereo']
+        audio_map = ['-map', '1:a:0', '-shortest']
+    else:
+        audio_map = ['-map', '0:a:0?']
+    audio_args = ['-c:a', 'aac', '-b:a', AUDIO_BITRATE, '-ar', str(AUDIO_RATE), '-ac', str(AUDIO_CHANNELS)]
+
+    if matches_target(info):
+        video_args = ['-c:v', 'copy']
+    else:
+        gop = TARGET_FPS * KEYFRAME_SECONDS
+        bitrate = int(VIDEO_BITRATE.rstrip("k"))
+        video_args = [
+            '-vf', (
+                f'scale={TARGET_WIDTH}:{TARGET_HEIGHT}:force_original_aspect_ratio=decrease,'
+                f'pad={TARGET_WIDTH}:{TARGET_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1'
+            ),
+            '-r', str(TARGET_FPS),
+            '-c:v', 'libx264', '-preset', PRESET, '-pix_fmt', 'yuv420p',
+            '-b:v', VIDEO_BITRATE, '-minrate', VIDEO_BITRATE, '-maxrate', VIDEO_BITRATE, '-bufsize', f'{bitrate * 2}k',
+            '-x264-params', 'nal-hrd=cbr', '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+        ]
+    return command + [
+        '-map', '0:v:0', *audio_map, *video_args, *audio_args,
+        '-movflags', '+faststart', '-f', 'mp4', dst,
+    ]
+
+
+def normalize_file(src: str, dst: str) -> dict:
+    """Normalize one file into `dst` (written to a temp file, then renamed). Returns a result record."""
+    start = time.perf_counter()
+    info = probe_media(src)
+    command = normalize_command(src, dst, info)
+    mode = "remux" if matches_target(info) else "transcode"
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.part")
+    command[-1] = tmp_path
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+        os.replace(tmp_path, dst)
+        error = None
+    except (subprocess.CalledProcessError, FileNotFoundError, OSError) as e:
+        error = e.stderr.strip()[-300:] if isinstance(e, subprocess.CalledProcessError) else str(e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"src": src, "output": None if error else dst, "mode": mode, "error": error,
+            "elapsed": time.perf_counter() - start}
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    """Load the manifest ({source path: {size, mtime_ns, target, output}}); empty if missing or invalid."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: str, manifest: Dict[str, dict]) -> None:
+    """Write the manifest atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def iter_live_files(account_dir: str):
+    """Yield (path, stat) for every video under `<account>/live/`."""
+    for dirpath, _, filenames in os.walk(os.path.join(account_dir, LIVE_DIRNAME)):
+        for fname in filenames:
+            if fname.startswith(".") or os.path.splitext(fname)[1].lower() not in VIDEO_EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, fname)
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                continue
+
+
+def normalize_account(account_dir: str, workers: int = 1, force: bool = False) -> dict:
+    """Normalize every new or changed file under `<account_dir>/live/`; returns a summary."""
+    account_dir = os.path.abspath(account_dir)
+    manifest_path = os.path.join(account_dir, READY_DIRNAME, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    summary = {"account": account_dir, "normalized": 0, "remuxed": 0, "skipped": 0, "pending": 0, "failed": 0, "removed": 0}
+
+    seen = set()
+    todo = []
+    now = time.time()
+    for src, st in iter_live_files(account_dir):
+        seen.add(src)
+        entry = manifest.get(src)
+        # Done, or failed before: only retried once the source changes (or with --force)
+        if (not force and entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+                and entry.get("target") == TARGET_ID
+                and (entry.get("error") or (entry.get("output") and os.path.exists(entry["output"])))):
+            summary["skipped"] += 1
+        elif now - st.st_mtime < STABLE_SECONDS:
+            summary["pending"] += 1
+        else:
+            todo.append((src, st))
+
+    # Drop outputs whose source is gone
+    for src in [s for s in manifest if s not in seen]:
+        output = manifest.pop(src).get("output")
+        if output and os.path.exists(output):
+            os.remove(output)
+        summary["removed"] += 1
+
+    def _one(item):
+        src, st = item
+        return st, normalize_file(src, ready_path(account_dir, src))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for st, result in executor.map(_one, todo):
+            manifest[result["src"]] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "target": TARGET_ID, "output": result["output"]}
+            if result["error"]:
+                manifest[result["src"]]["error"] = result["error"]
+                summary["failed"] += 1
+                logger.error(f"Failed to normalize {result['src']}: {result['error']}")
+            elif result["mode"] == "remux":
+                summary["remuxed"] += 1
+                logger.info(f"Copied video of {result['src']} -> {result['output']} ({result['elapsed']:.1f}s)")
+            else:
+                summary["normalized"] += 1
+                logger.info(f"Transcoded {result['src']} -> {result['output']} ({result['elapsed']:.1f}s)")
+            save_manifest(manifest_path, manifest)
+
+    if summary["removed"]:
+        save_manifest(manifest_path, manifest)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize live material into ingest-ready H.264/AAC MP4 files.")
+    parser.add_argument("account_dirs", nargs="+", help="Account directories (each containing live/)")
+    parser.add_argument("--workers", type=int, default=1, help="Files encoded in parallel (libx264 is already multi-threaded)")
+    parser.add_argument("--force", action="store_true", help="Re-normalize files even if the manifest says they are done")
+    args = parser.parse_args()
+
+    for account_dir in args.account_dirs:
+        summary = normalize_account(account_dir, workers=args.workers, force=args.force)
+        print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,14 @@ log_file=$LOG_DIR/broadcast-$CATEGORY-$thedate-$TIMESCOPE.$(date +%Y%m%d%H%M%S).
 
 # /home/ftp/UrbanGlamOutfits/live
 VIDEO_DIR=$base_dir/live/$thedate
+# 预处理后的素材（python normalize_live.py $base_dir），格式统一，auto 模式检查一致后直接 -c copy 推流
+READY_DIR=$base_dir/live_ready/$thedate
+STREAM_DIR=$READY_DIR
+stream_mode=auto
+if [ -z "$(find "$READY_DIR" -maxdepth 1 -type f -name "*.mp4" 2>/dev/null | head -n 1)" ]; then
+    echo "警告: $READY_DIR 中没有预处理过的素材，使用原始素材推流（自动判断是否转码）。"
+    STREAM_DIR=$VIDEO_DIR
+fi
 # cover 目录
 COVER_DIR=$base_dir/live_cover
 
@@ -75,18 +83,26 @@ if [ -z "$cover_file" ]; then
 fi
 
 
-for file in "$VIDEO_DIR"/*.mp4 "$VIDEO_DIR"/*.ts; do
+# 当天的全部素材作为一个播放列表推流（随机顺序），一个 ffmpeg 进程轮播，不再只循环第一个文件
+files=()
+for file in "$STREAM_DIR"/*.mp4 "$STREAM_DIR"/*.ts; do
 	# 检查文件是否存在（防止目录中没有文件时报错）
 	if [ -f "$file" ]; then
-	    echo ""
-	    echo "*****************************************************"
-	    echo ">>>> 正在推流文件: $file"
-	    echo "*****************************************************"
-        echo --auth_dir="$the_auth_dir" --video_file "$file" --title "$the_title" --description "$DESCRIPTION" --duration "$the_duration" --privacy_status public --thumbnail "$cover_file"
-		python $bin/upload_stream.py --auth_dir="$the_auth_dir" --video_file "$file" --title "$the_title" --description "$DESCRIPTION" --duration "$the_duration" --privacy_status public --thumbnail "$cover_file" > $log_file 2>&1 
-	    break
+	    files+=("$file")
 	fi
 done
 
+if [ ${#files[@]} -eq 0 ]; then
+    echo "错误: $STREAM_DIR 中没有可推流的素材。"
+    exit 1
+fi
+
+echo ""
+echo "*****************************************************"
+echo ">>>> 正在推流 ${#files[@]} 个文件: ${files[*]}"
+echo "*****************************************************"
+echo --auth_dir="$the_auth_dir" --video_file "${files[@]}" --shuffle --title "$the_title" --description "$DESCRIPTION" --duration "$the_duration" --privacy_status public --thumbnail "$cover_file" --stream_mode $stream_mode
+python $bin/upload_stream.py --auth_dir="$the_auth_dir" --video_file "${files[@]}" --shuffle --title "$the_title" --description "$DESCRIPTION" --duration "$the_duration" --privacy_status public --thumbnail "$cover_file" --stream_mode $stream_mode > $log_file 2>&1 
+
 wait
 
@@ -1,27 +1,507 @@
+import logging
+import os
+import random
 import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from youtube.media_probe import probe_media
+
+# Stream modes: "auto" probes the source and copies it when it is ingest-ready,
+# "copy" always pushes with `-c copy`, "transcode" always re-encodes.
+MODE_AUTO = 'auto'
+MODE_COPY = 'copy'
+MODE_TRANSCODE = 'transcode'
+STREAM_MODES = (MODE_AUTO, MODE_COPY, MODE_TRANSCODE)
+
+# What YouTube ingest accepts without re-encoding
+INGEST_VIDEO_CODECS = {'h264'}
+INGEST_AUDIO_CODECS = {'aac'}
+INGEST_PIX_FMTS = {'yuv420p', 'yuvj420p'}
+INGEST_MAX_KEYFRAME_INTERVAL = 4.0
+INGEST_MAX_FPS = 60.0
+INGEST_MAX_BIT_RATE = 12_000_000
+
+module_logger = logging.getLogger(__name__)
+
+# Supervisor defaults: restart when out_time has not advanced for STALL_SECONDS, or when
+# speed stayed below MIN_SPEED for SLOW_SECONDS; nothing is judged during STARTUP_GRACE.
+STALL_SECONDS = 20
+MIN_SPEED = 0.9
+SLOW_SECONDS = 30
+STARTUP_GRACE = 15
+# Restart backoff doubles from BACKOFF_INITIAL up to BACKOFF_MAX and resets after HEALTHY_SECONDS
+BACKOFF_INITIAL = 2
+BACKOFF_MAX = 60
+HEALTHY_SECONDS = 120
+MAX_RESTARTS = 20
+
+# Upper bound on ffconcat entries when a playlist is repeated to cover a long broadcast
+MAX_PLAYLIST_ENTRIES = 1000
+
+# Fallback libx264 settings: 2 s GOP and a constrained bitrate suited to RTMP ingest
+TRANSCODE_PRESET = 'veryfast'
+TRANSCODE_VIDEO_BITRATE = '4500k'
+TRANSCODE_AUDIO_BITRATE = '128k'
+TRANSCODE_KEYFRAME_SECONDS = 2
+
+
+def check_stream_copy(info):
+    """
+    Checks whether a probed source can be pushed to YouTube with `-c copy`.
+
+    Args:
+        info (MediaInfo | None): Result of `probe_media`.
+
+    Returns:
+        tuple[bool, str]: Whether stream copy is safe, and the reason.
+    """
+    if info is None:
+        return False, 'probe failed'
+    if info.video_codec not in INGEST_VIDEO_CODECS:
+        return False, f'video codec {info.video_codec}'
+    if info.audio_codec and info.audio_codec not in INGEST_AUDIO_CODECS:
+        return False, f'audio codec {info.audio_codec}'
+    if info.pix_fmt and info.pix_fmt not in INGEST_PIX_FMTS:
+        return False, f'pixel format {info.pix_fmt}'
+    if info.keyframe_interval is None:
+        return False, 'keyframe interval unknown'
+    if info.keyframe_interval > INGEST_MAX_KEYFRAME_INTERVAL:
+        return False, f'keyframe interval {info.keyframe_interval:.1f}s'
+    if info.fps and info.fps > INGEST_MAX_FPS:
+        return False, f'{info.fps:.0f} fps'
+    if info.bit_rate and info.bit_rate > INGEST_MAX_BIT_RATE:
+        return False, f'bitrate {info.bit_rate // 1000} kb/s'
+    return True, (
+        f'{info.video_codec}/{info.audio_codec or "no audio"}, '
+        f'keyframe every {info.keyframe_interval:.1f}s, {(info.bit_rate or 0) // 1000} kb/s'
+    )
+
+
+def transcode_args(video_bitrate=TRANSCODE_VIDEO_BITRATE, size=None):
+    """
+    ffmpeg output codec options for the libx264/AAC fallback.
+
+    With `size` (width, height) every input is scaled and padded to that frame size, so a
+    playlist mixing resolutions still feeds the encoder a constant frame size.
+    """
+    bufsize = f'{int(video_bitrate.rstrip("k")) * 2}k'
+    filter_args = []
+    if size:
+        width, height = size
+        filter_args = ['-vf', (
+            f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
+            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1'
+        )]
+    return [
+        *filter_args,
+        '-c:v', 'libx264', '-preset', TRANSCODE_PRESET, '-pix_fmt', 'yuv420p',
+        '-b:v', video_bitrate, '-maxrate', video_bitrate, '-bufsize', bufsize,
+        '-force_key_frames', f'expr:gte(t,n_forced*{TRANSCODE_KEYFRAME_SECONDS})', '-sc_threshold', '0',
+        '-c:a', 'aac', '-b:a', TRANSCODE_AUDIO_BITRATE, '-ar', '44100',
+    ]
+
+
+def _stream_signature(info):
+    """Parameters that must match across playlist entries for stream copy to be seamless."""
+    return (
+        info.video_codec, info.width, info.height, round(info.fps or 0), info.pix_fmt,
+        info.audio_codec, info.audio_sample_rate, info.audio_channels,
+    )
+
+
+def build_playlist(videos, shuffle=False, min_duration=None):
+    """
+    Orders a playlist for one broadcast.
+
+    The list is played once per round; each shuffled round is a fresh permutation that never
+    starts with the file the previous round ended on. With `min_duration` (seconds) rounds are
+    appended until the probed durations cover it, so a long broadcast rotates through the
+    material instead of looping one file.
+
+    Args:
+        videos (list[str]): Video files.
+        shuffle (bool): Shuffle every round.
+        min_duration (float | None): Seconds the playlist should cover.
+
+    Returns:
+        list[str]: Playlist entries (files may repeat across rounds).
+    """
+    videos = list(videos)
+    if not videos:
+        return []
+    infos = [probe_media(v) for v in videos]
+    round_seconds = sum(info.duration or 0 for info in infos if info)
+    rounds = 1
+    if min_duration and round_seconds > 0:
+        rounds = max(1, int(-(-min_duration // round_seconds)))
+    rounds = min(rounds, max(1, MAX_PLAYLIST_ENTRIES // len(videos)))
+
+    entries = []
+    for _ in range(rounds):
+        order = list(videos)
+        if shuffle:
+            random.shuffle(order)
+            if entries and len(order) > 1 and order[0] == entries[-1]:
+                order[0], order[-1] = order[-1], order[0]
+        entries.extend(order)
+    return entries
+
+
+def write_ffconcat(entries, path):
+    """Writes an ffconcat list for the concat demuxer (absolute paths, quotes escaped)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('ffconcat version 1.0\n')
+        for entry in entries:
+            escaped = os.path.abspath(entry).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return path
+
+
+def _parse_number(value):
+    """Parses ffmpeg progress values such as "2500.1kbits/s", "1.01x" or "N/A"."""
+    value = (value or '').strip().rstrip('x')
+    for suffix in ('kbits/s',):
+        if value.endswith(suffix):
+            value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+@dataclass
+class StreamProgress:
+    """Latest `-progress` block reported by ffmpeg, plus supervisor bookkeeping."""
+
+    frame: int = 0
+    fps: float | None = None
+    bitrate_kbps: float | None = None
+    speed: float | None = None
+    drop_frames: int = 0
+    dup_frames: int = 0
+    out_time: float = 0.0
+    total_size: int = 0
+    # time.monotonic() of the last block and of the last time out_time advanced
+    updated_at: float = 0.0
+    advanced_at: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def parse_progress_block(lines, progress):
+    """
+    Applies one `key=value` block from `ffmpeg -progress` to `progress`.
+
+    Returns True when out_time advanced.
+    """
+    now = time.monotonic()
+    values = dict(line.split('=', 1) for line in lines if '=' in line)
+    previous = progress.out_time
+    if 'frame' in values:
+        progress.frame = int(_parse_number(values['frame']) or 0)
+    if 'fps' in values:
+        progress.fps = _parse_number(values['fps'])
+    if 'bitrate' in values:
+        progress.bitrate_kbps = _parse_number(values['bitrate'])
+    if 'speed' in values:
+        progress.speed = _parse_number(values['speed'])
+    if 'drop_frames' in values:
+        progress.drop_frames = int(_parse_number(values['drop_frames']) or 0)
+    if 'dup_frames' in values:
+        progress.dup_frames = int(_parse_number(values['dup_frames']) or 0)
+    if 'total_size' in values:
+        progress.total_size = int(_parse_number(values['total_size']) or 0)
+    out_time_us = _parse_number(values.get('out_time_us'))
+    if out_time_us is not None and out_time_us >= 0:
+        progress.out_time = out_time_us / 1_000_000
+    progress.updated_at = now
+    if progress.out_time > previous:
+        progress.advanced_at = now
+        return True
+    return False
+
+
+class StreamSupervisor:
+    """
+    Runs ffmpeg with `-progress pipe:1`, parses its progress in a background thread and
+    restarts it (same command, same ingest URL) when it exits, stalls or falls behind real time.
+
+    The YouTube broadcast is never touched: a restart only reconnects the RTMP push, well
+    within the window in which the broadcast stays live.
+
+    Args:
+        command_factory (callable): Returns the ffmpeg command for each (re)start.
+        stall_seconds (float): Restart when out_time has not advanced for this long.
+        min_speed (float): Restart when speed stays below this for `slow_seconds`.
+        slow_seconds (float): See `min_speed`.
+        startup_grace (float): Seconds after a (re)start during which nothing is judged.
+        max_restarts (int | None): Give up after this many consecutive failed runs, i.e. without
+            a healthy stretch of `HEALTHY_SECONDS` in between (None: never).
+        logger (logging.Logger | None): Where to log restarts; defaults to this module's logger.
+    """
+
+    def __init__(self, command_factory, stall_seconds=STALL_SECONDS, min_speed=MIN_SPEED,
+                 slow_seconds=SLOW_SECONDS, startup_grace=STARTUP_GRACE, max_restarts=MAX_RESTARTS,
+                 logger=None):
+        self.command_factory = command_factory
+        self.stall_seconds = stall_seconds
+        self.min_speed = min_speed
+        self.slow_seconds = slow_seconds
+        self.startup_grace = startup_grace
+        self.max_restarts = max_restarts
+        self.logger = logger or module_logger
+        self.process = None
+        self.progress = StreamProgress()
+        # Lifetime restart count (metrics only); giving up is decided by consecutive failures
+        self.restarts = 0
+        self.last_restart_reason = None
+        # time.monotonic() at which the last failure was detected
+        self.last_failure_at = None
+        self.started_at = None
+        self.gave_up = False
+        self._run_started = 0.0
+        self._slow_since = None
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        """Starts ffmpeg and the watchdog thread."""
+        self.started_at = time.time()
+        self._launch()
+        self._watchdog = threading.Thread(target=self._watch, name='ffmpeg-supervisor', daemon=True)
+        self._watchdog.start()
+
+    def stop(self, timeout=10):
+        """Stops the watchdog and ffmpeg."""
+        self._stop.set()
+        self._terminate(timeout)
+        if self._watchdog and self._watchdog is not threading.current_thread():
+            self._watchdog.join(timeout)
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stats(self):
+        """Snapshot of progress and restart counters."""
+        with self._lock:
+            data = self.progress.to_dict()
+        now = time.monotonic()
+        data.update({
+            'running': self.is_running(),
+            'pid': self.process.pid if self.process else None,
+            'restarts': self.restarts,
+            'consecutive_failures': self._failures,
+            'last_restart_reason': self.last_restart_reason,
+            'gave_up': self.gave_up,
+            'uptime': time.time() - self.started_at if self.started_at else 0.0,
+            'seconds_since_progress': now - data['advanced_at'] if data['advanced_at'] else None,
+        })
+        return data
+
+    def _launch(self):
+        command = self.command_factory()
+        with self._lock:
+            self.progress = StreamProgress()
+        self._run_started = time.monotonic()
+        self._slow_since = None
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            text=True, encoding='utf-8', errors='ignore', bufsize=1,
+        )
+        reader = threading.Thread(target=self._read_progress, args=(self.process,), name='ffmpeg-progress', daemon=True)
+        reader.start()
+
+    def _read_progress(self, process):
+        block = []
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            block.append(line)
+            if line.startswith('progress='):
+                with self._lock:
+                    if process is self.process:
+                        parse_progress_block(block, self.progress)
+                block = []
+
+    def _terminate(self, timeout=10):
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _check(self):
+        """Returns why the running ffmpeg should be restarted, or None."""
+        code = self.process.poll()
+        if code is not None:
+            return f'exited with code {code}'
+        now = time.monotonic()
+        if now - self._run_started < self.startup_grace:
+            return None
+        with self._lock:
+            advanced_at = self.progress.advanced_at or self._run_started
+            speed = self.progress.speed
+        if now - advanced_at > self.stall_seconds:
+            return f'no progress for {now - advanced_at:.0f}s'
+        if speed is not None and speed < self.min_speed:
+            self._slow_since = self._slow_since or now
+            if now - self._slow_since > self.slow_seconds:
+                return f'speed {speed:.2f}x for {now - self._slow_since:.0f}s'
+        else:
+            self._slow_since = None
+        if now - self._run_started > HEALTHY_SECONDS:
+            self._failures = 0
+        return None
+
+    def _watch(self):
+        while not self._stop.wait(1):
+            reason = self._check()
+            if reason is None:
+                continue
+            if self.max_restarts is not None and self._failures >= self.max_restarts:
+                self.logger.error(f"ffmpeg {reason}; giving up after {self._failures} consecutive restarts")
+                self.gave_up = True
+                self._terminate()
+                return
+            self.last_failure_at = time.monotonic()
+            self.last_restart_reason = reason
+            delay = min(BACKOFF_MAX, BACKOFF_INITIAL * (2 ** self._failures))
+            self._failures += 1
+            self.logger.warning(f"ffmpeg {reason}; restarting in {delay}s (restart #{self.restarts + 1})")
+            # A hung ffmpeg may never act on SIGTERM, so do not wait long before SIGKILL
+            self._terminate(timeout=2)
+            if self._stop.wait(delay):
+                return
+            self.restarts += 1
+            try:
+                self._launch()
+            except OSError as e:
+                self.logger.error(f"Failed to restart ffmpeg: {e}")
+
 
 class Streamer:
-    def __init__(self, stream_url, video_path):
+    def __init__(self, stream_url, video_path, mode=MODE_AUTO, video_bitrate=TRANSCODE_VIDEO_BITRATE,
+                 shuffle=False, min_duration=None, supervise=True, logger=None):
         """
         Initializes the streamer.
 
         Args:
             stream_url (str): The RTMP URL to stream to.
-            video_path (str): The path to the video file to stream.
+            video_path (str | list[str]): The video file to stream, or a playlist of files.
+                A playlist is pushed through one ffmpeg process with the concat demuxer,
+                so timestamps stay continuous and the RTMP session is never restarted.
+            mode (str): "auto" (copy when the source is ingest-ready, else transcode),
+                "copy" or "transcode".
+            video_bitrate (str): libx264 bitrate used when transcoding.
+            shuffle (bool): Shuffle the playlist (every round when it is repeated).
+            min_duration (float | None): Seconds the playlist should cover before it loops.
+            supervise (bool): Run ffmpeg under a `StreamSupervisor` (progress parsing,
+                stall detection and restarts with backoff).
+            logger (logging.Logger | None): Logger for supervisor events.
         """
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Unknown stream mode: {mode}")
         self.stream_url = stream_url
-        self.video_path = video_path
-        self.process = None
+        self.videos = [video_path] if isinstance(video_path, str) else list(video_path)
+        if not self.videos:
+            raise ValueError("No video files to stream")
+        self.video_path = self.videos[0]
+        self.mode = mode
+        self.video_bitrate = video_bitrate
+        self.shuffle = shuffle
+        self.min_duration = min_duration
+        # Chosen path ("copy" or "transcode") and why, set by plan()
+        self.path = None
+        self.reason = None
+        # Frame size every entry is scaled to when a playlist is transcoded
+        self.frame_size = None
+        self.playlist_path = None
+        self.supervise = supervise
+        self.logger = logger or module_logger
+        self.supervisor = None
+        self._process = None
 
-    def start_streaming(self):
-        """Starts the FFmpeg streaming process."""
-        command = [
+    @property
+    def process(self):
+        """The running ffmpeg process; under a supervisor, the current one after restarts."""
+        if self.supervisor is not None:
+            return self.supervisor.process
+        return self._process
+
+    @property
+    def is_playlist(self):
+        return len(self.videos) > 1
+
+    def plan(self):
+        """Decides between stream copy and transcoding, probing every source once."""
+        if self.path is not None:
+            return self.path, self.reason
+        infos = [probe_media(v) for v in self.videos]
+        first = infos[0]
+        if self.is_playlist and first and first.width and first.height:
+            self.frame_size = (first.width - first.width % 2, first.height - first.height % 2)
+
+        if self.mode != MODE_AUTO:
+            self.path, self.reason = self.mode, 'forced'
+            # Spliced with -c copy, entries with different formats break the ingest at every boundary
+            if self.mode == MODE_COPY and self.is_playlist:
+                signatures = {_stream_signature(info) if info else None for info in infos}
+                if len(signatures) > 1:
+                    self.path, self.reason = MODE_TRANSCODE, f'copy forced, but playlist mixes {len(signatures)} formats'
+            return self.path, self.reason
+
+        for video, info in zip(self.videos, infos):
+            ok, reason = check_stream_copy(info)
+            if not ok:
+                self.path = MODE_TRANSCODE
+                self.reason = f'{os.path.basename(video)}: {reason}' if self.is_playlist else reason
+                return self.path, self.reason
+        signatures = {_stream_signature(info) for info in infos}
+        if len(signatures) > 1:
+            self.path, self.reason = MODE_TRANSCODE, f'playlist mixes {len(signatures)} formats'
+        else:
+            _, self.reason = check_stream_copy(first)
+            self.path = MODE_COPY
+            if self.is_playlist:
+                self.reason = f'{len(self.videos)} files, {self.reason}'
+        return self.path, self.reason
+
+    def _input_args(self):
+        if not self.is_playlist:
+            return ['-i', self.video_path]
+        if self.playlist_path is None:
+            entries = build_playlist(self.videos, self.shuffle, self.min_duration)
+            fd, path = tempfile.mkstemp(prefix='playlist_', suffix='.ffconcat')
+            os.close(fd)
+            self.playlist_path = write_ffconcat(entries, path)
+        return ['-f', 'concat', '-safe', '0', '-i', self.playlist_path]
+
+    def build_command(self, progress=False):
+        """Returns the ffmpeg command for the chosen path; `progress` adds `-progress pipe:1`."""
+        path, _ = self.plan()
+        if path == MODE_COPY:
+            codec_args = ['-c', 'copy']
+        else:
+            codec_args = transcode_args(self.video_bitrate, self.frame_size if self.is_playlist else None)
+        progress_args = ['-progress', 'pipe:1', '-nostats'] if progress else []
+        return [
             'ffmpeg',
+            *progress_args,
             '-re',
             '-stream_loop', '-1',
-            '-i', self.video_path,
-            # '-vcodec', 'libx264', '-pix_fmt', 'yuv420p', '-preset', 'medium', '-r', '30', '-g', '60', '-b:v', '2500k',
-            # '-acodec', 'aac', '-ar', '44100', '-b:a', '128k',
+            *self._input_args(),
+            *codec_args,
             '-f', 'flv',
             '-reconnect', '1',
             '-reconnect_streamed', '1',
@@ -29,9 +509,41 @@ class Streamer:
             '-reconnect_on_network_error', '1',
             self.stream_url
         ]
-        self.process = subprocess.Popen(command)
+
+    def _restart_command(self):
+        # A shuffled playlist gets a fresh order on every restart instead of replaying the start
+        if self.supervisor is not None and self.supervisor.process is not None and self.shuffle and self.playlist_path:
+            self._remove_playlist()
+        return self.build_command(progress=True)
+
+    def start_streaming(self):
+        """Starts the FFmpeg streaming process (supervised unless `supervise=False`)."""
+        if not self.supervise:
+            self._process = subprocess.Popen(self.build_command())
+            return
+        self.supervisor = StreamSupervisor(self._restart_command, logger=self.logger)
+        self.supervisor.start()
+
+    def stats(self):
+        """Live ffmpeg metrics from the supervisor (empty when not supervised)."""
+        if self.supervisor is None:
+            return {}
+        data = self.supervisor.stats()
+        data.update({'path': self.path, 'playlist_size': len(self.videos)})
+        return data
+
+    def _remove_playlist(self):
+        if self.playlist_path:
+            try:
+                os.remove(self.playlist_path)
+            except OSError:
+                pass
+            self.playlist_path = None
 
     def stop_streaming(self):
-        """Stops the FFmpeg streaming process."""
-        if self.process:
-            self.process.terminate()
\ No newline at end of file
+        """Stops the FFmpeg streaming process and removes the generated playlist."""
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        elif self.process:
+            self.process.terminate()
+        self._remove_playlist()
@@ -0,0 +1,177 @@
+"""
+Benchmarks for the live streaming path in `streamer.py`.
+
+Subcommands:
+- `copy`: probes `--video` the way `Streamer` does in "auto" mode and prints the
+  decision, then pushes `--seconds` of it through the copy and the transcode
+  command lines (without `-re`, into a temp FLV file instead of RTMP) and
+  reports CPU seconds per second of media and the implied number of concurrent
+  real-time streams per core.
+- `playlist`: pushes `--seconds` of a shuffled playlist of `--video` files through
+  one ffmpeg process with the concat demuxer (stream copy, offline into a temp FLV)
+  and reads the output back, reporting distinct files played,
+  frames, output duration and the largest gap or backwards step between video
+  timestamps; the previous single-file `-stream_loop` is shown for comparison.
+- `supervise`: runs a real-time push of `--video` (into a temp FLV) under
+  `streamer.StreamSupervisor`, then freezes ffmpeg with SIGSTOP and later kills it with
+  SIGKILL, reporting for each fault how long detection and recovery (out_time advancing
+  again in the restarted process) took.
+
+Example:
+    python tools/bench_stream.py copy --video /path/to/live.mp4 --seconds 30
+"""
+
+import argparse
+import os
+import re
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+# Ensure project root is on sys.path for imports when run directly
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import streamer  # noqa: E402
+from youtube.media_probe import probe_media  # noqa: E402
+
+
+def _offline_command(command: list, seconds: float) -> list:
+    """Turn a live push command into a bounded offline run: no `-re`, `-t` before the output."""
+    command = [arg for arg in command if arg != '-re']
+    command[-1:-1] = ['-t', str(seconds)]
+    return [command[0], '-hide_banner', '-loglevel', 'error', '-y', *command[1:]]
+
+
+def _child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_copy(args: argparse.Namespace) -> None:
+    """CPU cost of stream copy versus the libx264 fallback."""
+    info = probe_media(args.video)
+    ok, reason = streamer.check_stream_copy(info)
+    print(f"auto mode: {'copy' if ok else 'transcode'} ({reason})")
+
+    with tempfile.TemporaryDirectory(prefix="bench_stream_") as tmp_dir:
+        out = os.path.join(tmp_dir, "out.flv")
+        print(f"{'path':<10} {'wall s':>7} {'cpu s':>7} {'cpu s / media s':>16} {'streams/core':>13}")
+        for mode in (streamer.MODE_COPY, streamer.MODE_TRANSCODE):
+            command = _offline_command(streamer.Streamer(out, args.video, mode=mode).build_command(), args.seconds)
+            cpu = _child_cpu()
+            start = time.perf_counter()
+            subprocess.run(command, check=True)
+            wall = time.perf_counter() - start
+            cpu = _child_cpu() - cpu
+            per_second = cpu / args.seconds
+            print(f"{mode:<10} {wall:>7.2f} {cpu:>7.2f} {per_second:>16.3f} {1 / per_second if per_second else float('inf'):>13.1f}")
+
+
+def _video_pts(path: str) -> list:
+    """Presentation times of every video frame in `path` (decoded with the showinfo filter)."""
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-i', path, '-map', '0:v:0', '-vf', 'showinfo', '-f', 'null', '-'],
+        capture_output=True, text=True, encoding='utf-8', errors='ignore',
+    )
+    return [float(t) for t in re.findall(r'pts_time:([0-9.]+)', result.stderr)]
+
+
+def bench_playlist(args: argparse.Namespace) -> None:
+    """Timestamp continuity of one concat-demuxer ffmpeg process over a playlist."""
+    with tempfile.TemporaryDirectory(prefix="bench_playlist_") as tmp_dir:
+        out = os.path.join(tmp_dir, "out.flv")
+        print(f"{'input':<16} {'files':>5} {'frames':>7} {'out s':>6} {'max gap ms':>10} {'backwards':>9}")
+        for label, videos in (("single loop", args.video[:1]), ("concat playlist", args.video)):
+            s = streamer.Streamer(out, videos, mode=streamer.MODE_COPY, shuffle=True)
+            command = _offline_command(s.build_command(), args.seconds)
+            played = len(set(videos))
+            subprocess.run(command, check=True)
+            s.stop_streaming()
+            pts = _video_pts(out)
+            steps = [b - a for a, b in zip(pts, pts[1:])]
+            print(f"{label:<16} {played:>5} {len(pts):>7} {pts[-1] if pts else 0:>6.1f} "
+                  f"{max(steps) * 1000 if steps else 0:>10.0f} {sum(d <= 0 for d in steps):>9}")
+
+
+def _wait_for(predicate, timeout: float) -> float | None:
+    """Poll `predicate` every 0.1 s; seconds until it held, or None on timeout."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if predicate():
+            return time.monotonic() - start
+        time.sleep(0.1)
+    return None
+
+
+def bench_supervise(args: argparse.Namespace) -> None:
+    """Detection and recovery time of StreamSupervisor for a frozen and a crashed ffmpeg."""
+    with tempfile.TemporaryDirectory(prefix="bench_supervise_") as tmp_dir:
+        out = os.path.join(tmp_dir, "out.flv")
+        s = streamer.Streamer(out, args.video, mode=streamer.MODE_COPY, supervise=False)
+
+        def factory():
+            command = s.build_command(progress=True)
+            return [command[0], '-hide_banner', '-loglevel', 'error', '-y', *command[1:]]
+
+        sup = streamer.StreamSupervisor(factory, stall_seconds=args.stall, startup_grace=args.grace)
+        sup.start()
+        try:
+            _wait_for(lambda: sup.stats()['out_time'] > args.warmup, args.warmup + 30)
+            stats = sup.stats()
+            print(f"warm-up: out_time {stats['out_time']:.1f}s speed {stats['speed']}x fps {stats['fps']} "
+                  f"bitrate {stats['bitrate_kbps']}kbit/s")
+            print(f"{'fault':<8} {'detected s':>10} {'recovered s':>11} {'restarts':>8}  reason")
+            for fault, sig in (("SIGSTOP", signal.SIGSTOP), ("SIGKILL", signal.SIGKILL)):
+                restarts = sup.restarts
+                process = sup.process
+                start = time.monotonic()
+                os.kill(process.pid, sig)
+                detected = _wait_for(lambda: (sup.last_failure_at or 0) > start, 120)
+                recovered = _wait_for(lambda: sup.process is not process and sup.stats()['out_time'] > 0, 120)
+                recovered = time.monotonic() - start if recovered is not None else None
+                print(f"{fault:<8} {detected if detected is not None else float('nan'):>10.1f} "
+                      f"{recovered if recovered is not None else float('nan'):>11.1f} "
+                      f"{sup.restarts - restarts:>8}  {sup.last_restart_reason}")
+                _wait_for(lambda: sup.stats()['out_time'] > args.grace, args.grace + 30)
+        finally:
+            sup.stop()
+
+
+def parse_args(argv):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmarks for streamer.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_copy = sub.add_parser("copy", help="stream copy vs libx264 transcode CPU cost")
+    p_copy.add_argument("--video", required=True, help="Live material video")
+    p_copy.add_argument("--seconds", type=float, default=30, help="Seconds of media to push per path")
+    p_copy.set_defaults(func=bench_copy)
+
+    p_playlist = sub.add_parser("playlist", help="timestamp continuity of concat-demuxer playlists")
+    p_playlist.add_argument("--video", required=True, nargs="+", help="Playlist files (same codec parameters)")
+    p_playlist.add_argument("--seconds", type=float, default=40, help="Seconds of media to push")
+    p_playlist.set_defaults(func=bench_playlist)
+
+    p_supervise = sub.add_parser("supervise", help="stall/crash detection and restart of the ffmpeg supervisor")
+    p_supervise.add_argument("--video", required=True, help="Live material video")
+    p_supervise.add_argument("--stall", type=float, default=streamer.STALL_SECONDS, help="Stall threshold in seconds")
+    p_supervise.add_argument("--grace", type=float, default=5, help="Startup grace after each (re)start in seconds")
+    p_supervise.add_argument("--warmup", type=float, default=5, help="Seconds of media to push before the first fault")
+    p_supervise.set_defaults(func=bench_supervise)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """CLI entry point."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,984 @@
+"""
+Micro-benchmarks for the thumbnail pipeline in `youtube/thumbnail.py`.
+
+Subcommands:
+- `caption`: renders English, CJK and mixed captions and reports captions/sec
+  per sample for the caption path used before the layout engine (font loaded
+  per call, every character measured while wrapping and in all six draw
+  passes) and for `add_caption_to_image` with a cold glyph-metrics cache
+  (cleared before every caption) and with the warm, shared cache. `speedup` is
+  warm over old. `old measures` / `measures` are the FreeType measurements one
+  caption needs on the old path and on the new path with an empty cache. Also
+  reports the one-off font load time versus a lookup in the font registry.
+- `render`: compares the "passes" and "layered" caption render modes on a large
+  (default 4K) frame: in-memory ms per caption, size of the RGBA layer each mode allocates,
+  and a pixel diff of the two outputs (max / mean absolute difference and the
+  share of pixels that differ by more than 8 levels). Exits non-zero if any
+  channel differs by more than `--max-diff` levels (default 2).
+- `stitch`: times `stitch_horizontal` against the previous per-column mask loop
+  on synthetic frames and checks that both produce identical pixels.
+- `frames`: extracts random frames from `--video` once with one ffmpeg process
+  per frame through a temp directory (the previous approach) and once with the
+  single-process `extract_frames` pipe, reporting ms and process spawns.
+- `encode`: stitches and captions a cover the previous way (save JPEG, reopen,
+  caption, save again, read back for upload) and with `render_thumbnail`
+  (stitch, caption and encode once into memory), reporting ms, encodes and
+  disk writes per thumbnail.
+- `budget`: encodes one stitched, captioned cover with the fixed full-size
+  quality=85 optimize encode and with `encode_jpeg_to_budget` (1280x720,
+  quality searched to fit `--max-kib`), reporting ms, size and quality.
+- `shaping`: CJK classification and wrapping on the captions and titles in
+  `ytb_account_material_config.py` (each also joined with a Chinese caption
+  to get long mixed lines): the previous per-character linear range scan
+  versus the bisect table, the per-line regex and the memoized line lookup,
+  plus `layout_caption` throughput with warm caches.
+- `layout`: renders each caption sample with the "glyph" and "line" layout
+  backends through `caption_image` (warm caches), reporting ms per caption,
+  `draw.text` calls per caption, the text block width of each backend and a
+  pixel diff of the two outputs (mean absolute difference and the share of
+  pixels that differ by more than 8 levels).
+- `fit`: for short to long captions, compares the fixed 160px layout with the
+  fit-to-box font size search: block size against the safe area, the chosen
+  size, FreeType measurements and ms for the search (cold and warm metrics
+  cache) and for a full `caption_image` render with fit-to-box. Exits non-zero
+  if a fitted layout overflows the safe area or is smaller than the fixed size
+  while the fixed layout fits.
+- `select`: picks cover frames from `--video` blindly at random (previous
+  behaviour) and with `select_frame_timestamps` (K low-resolution candidates
+  scored, best N extracted at full resolution), reporting ms per cover and the
+  mean brightness, sharpness and entropy of the chosen frames plus how many
+  were unusable (black or blown out).
+- `keyframe`: extracts random frames from a long `--video` with accurate
+  seeking (decode forward from the previous keyframe) and with
+  `keyframe_only=True` (`-skip_frame nokey`), reporting ms per frame for one
+  frame per ffmpeg call and for a multi-frame `extract_frames` pipe.
+- `stitchmem`: stitches `--count` phone-sized JPEGs (default 4032x3024) the
+  previous way (every image opened as RGBA, then `stitch_horizontal`) and
+  with `stitch_image_files` (draft-decoded, RGB, one image at a time), each
+  in a fresh process, reporting ms, output size and the peak RSS growth.
+- `dedupe`: builds a directory of synthetic burst shots (`--groups` scenes x
+  `--burst` near-identical frames), times the first (cold) and repeated (warm)
+  `ImageHashIndex.update`, and counts near-duplicate pairs inside each cover
+  and repeats of the previous covers' images for plain `random.sample`
+  versus `choose_distinct`.
+- `coverpool`: with an empty `live_cover/`, the time a broadcast job spends
+  on its thumbnail when it generates one synchronously from `--video`
+  (previous behaviour) versus queueing the pool with `CoverProducer.request`,
+  plus how long the background producer takes to reach `--low-water`.
+
+Example:
+    python tools/bench_thumbnail.py caption --font /path/to/SourceHanSansCN-Heavy.otf --iterations 20
+"""
+
+import argparse
+import functools
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Ensure project root is on sys.path for imports when run directly
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from youtube import thumbnail  # noqa: E402
+from youtube.caption_layout import (  # noqa: E402
+    FIT_MIN_FONT_SIZE,
+    LAYOUT_BACKENDS,
+    clear_caches as clear_caption_caches,
+    fit_caption_layout,
+    glyph_metrics_cache,
+    layout_caption,
+    render_caption_tile,
+)
+from youtube.fonts import DEFAULT_FONT_SIZE, clear_fonts, find_font_file, get_font  # noqa: E402
+from youtube.frame_extract import extract_frames  # noqa: E402
+from youtube import cover_pool  # noqa: E402
+from youtube import frame_select  # noqa: E402
+from youtube import image_hash  # noqa: E402
+from youtube import text_shaping  # noqa: E402
+
+CAPTION_SAMPLES = {
+    "english": "Delicious Street Food Recipe - Quick and Easy Cooking Tips for Everyone!",
+    "cjk": "美味街头小食制作秘籍简单易学的烹饪技巧分享给每一个热爱美食的你",
+    "mixed": "BEAUTIFUL ASIAN FASHION 街头潮流穿搭 STREET STYLE 2025 最新合集",
+}
+
+
+def _make_base(path: str, size=(1920, 1080)) -> None:
+    """Create a dark base image used as the caption background."""
+    Image.new("RGB", size, (20, 20, 20)).save(path)
+
+
+def _caption_reference(image_path: str, caption: str, font_path=None) -> int:
+    """The caption path `add_caption_to_image` used before the layout engine (throughput baseline).
+
+    Loads the font on every call and measures every character with `draw.textbbox` while wrapping
+    and again in each of the six draw passes. Returns the number of FreeType measurements made.
+    """
+    base_img = Image.open(image_path).convert("RGB")
+    w, h = base_img.size
+    fontsize = DEFAULT_FONT_SIZE
+    spacing = int(max(0, fontsize * 0.50))
+    path = font_path or find_font_file()
+    try:
+        font = ImageFont.truetype(path, fontsize) if path else ImageFont.load_default()
+    except Exception:
+        font = ImageFont.load_default()
+    overlay = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    measures = 0
+
+    def measure(text: str) -> int:
+        nonlocal measures
+        measures += 1
+        bbox = draw.textbbox((0, 0), text, font=font)
+        return bbox[2] - bbox[0]
+
+    safe_w, safe_h = int(w * 0.70), int(h * 0.70)
+    # The old renderer looked up the per-line spacing before defining it and always fell back to 2%
+    wrap_spacing = int(max(0, fontsize * 0.02))
+
+    def split_chars(text: str) -> list:
+        lines_acc, current, current_w = [], [], 0
+        for ch in text:
+            ch_w = measure(ch)
+            extra = wrap_spacing if current else 0
+            if current_w + extra + ch_w <= safe_w:
+                current.append(ch)
+                current_w += extra + ch_w
+            else:
+                if current:
+                    lines_acc.append("".join(current))
+                current, current_w = [ch], ch_w
+        if current:
+            lines_acc.append("".join(current))
+        return lines_acc
+
+    if " " in caption:
+        space_w = measure(" ")
+        lines, current, current_w = [], [], 0
+        for word in caption.split():
+            w_w = measure(word)
+            need_w = (space_w + wrap_spacing if current else 0) + w_w
+            if need_w <= safe_w and current_w + need_w <= safe_w:
+                current.append(word)
+                current_w += need_w
+            elif w_w > safe_w:
+                if current:
+                    lines.append(" ".join(current))
+                    current, current_w = [], 0
+                lines.extend(split_chars(word))
+            else:
+                if current:
+                    lines.append(" ".join(current))
+                current, current_w = [word], w_w
+        if current:
+            lines.append(" ".join(current))
+    else:
+        lines = split_chars(caption)
+
+    def letter_spacing(ln: str) -> int:
+        # The old per-character range scan
+        return max(1, int(fontsize * 0.04)) if any(text_shaping.is_cjk_char(ch) for ch in ln) else 0
+
+    def measure_block() -> tuple:
+        nonlocal measures
+        measures += 1
+        bbox = draw.textbbox((0, 0), "Hg", font=font)
+        typical_h = bbox[3] - bbox[1]
+        widths = []
+        for ln in lines:
+            ls_px = letter_spacing(ln)
+            widths.append(sum(measure(ch) for ch in ln) + max(0, len(ln) - 1) * ls_px)
+        return max(widths, default=0), len(lines) * typical_h + max(0, len(lines) - 1) * spacing, typical_h
+
+    def draw_block(x0: int, y0: int, block_w: int, fill, stroke_width: int = 0, stroke_fill=None) -> None:
+        # Every pass measured the whole block and every character again
+        _, _, typical_h = measure_block()
+        y = y0
+        for ln in lines:
+            ls_px = letter_spacing(ln)
+            ch_widths = [measure(ch) for ch in ln]
+            x = x0 + max(0, (block_w - (sum(ch_widths) + max(0, len(ln) - 1) * ls_px)) // 2)
+            for i, ch in enumerate(ln):
+                draw.text((x, y), ch, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+                x += ch_widths[i] + (ls_px if i < len(ln) - 1 else 0)
+            y += typical_h + spacing
+
+    text_w, text_h, _ = measure_block()
+    tx = int(w * 0.15) + max(0, (safe_w - text_w) // 2)
+    ty = int(h * 0.15) + max(0, (safe_h - text_h) // 2)
+    draw_block(tx + 2, ty + 2, text_w, fill=(0, 0, 0, 180))
+    bold_offset = max(1, int(fontsize * 0.02))
+    for ox, oy in [(bold_offset, 0), (-bold_offset, 0), (0, bold_offset), (0, -bold_offset)]:
+        draw_block(tx + ox, ty + oy, text_w, fill=(255, 255, 0, 255))
+    draw_block(tx, ty, text_w, fill=(255, 255, 0, 255), stroke_width=2, stroke_fill=(0, 0, 0, 255))
+
+    composed = base_img.convert("RGBA")
+    composed.alpha_composite(overlay)
+    if image_path.lower().endswith((".jpg", ".jpeg")):
+        composed.convert("RGB").save(image_path, quality=95)
+    else:
+        composed.save(image_path)
+    return measures
+
+
+def _time_captions(base_path: str, work_path: str, caption: str, iterations: int, render, font_path=None) -> float:
+    """Render `caption` `iterations` times with `render(path, caption, font_path)` and return captions/sec."""
+    elapsed = 0.0
+    for _ in range(iterations):
+        shutil.copy(base_path, work_path)
+        start = time.perf_counter()
+        render(work_path, caption, font_path)
+        elapsed += time.perf_counter() - start
+    return iterations / elapsed if elapsed > 0 else 0.0
+
+
+def bench_caption(args: argparse.Namespace) -> None:
+    """Report captions/sec for each caption sample: the old caption path vs `add_caption_to_image`."""
+    clear_fonts()
+    start = time.perf_counter()
+    get_font(args.font, DEFAULT_FONT_SIZE)
+    load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    get_font(args.font, DEFAULT_FONT_SIZE)
+    cached_us = (time.perf_counter() - start) * 1e6
+    print(f"font load: {load_ms:.2f} ms first call, {cached_us:.2f} us from the font registry")
+
+    def new_cold(path, caption, font_path):
+        clear_caption_caches()
+        thumbnail.add_caption_to_image(path, caption, font_path=font_path)
+
+    def new_warm(path, caption, font_path):
+        thumbnail.add_caption_to_image(path, caption, font_path=font_path)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_caption_")
+    try:
+        base_path = os.path.join(tmp_dir, "base.png")
+        work_path = os.path.join(tmp_dir, "work.png")
+        _make_base(base_path, (args.width, args.height))
+        print(
+            f"{'sample':<10} {'old cap/s':>10} {'cold cap/s':>11} {'warm cap/s':>11} {'speedup':>8} "
+            f"{'old measures':>13} {'measures':>9}"
+        )
+        for name, caption in CAPTION_SAMPLES.items():
+            shutil.copy(base_path, work_path)
+            old_measures = _caption_reference(work_path, caption, args.font)
+            old = _time_captions(base_path, work_path, caption, args.iterations, _caption_reference, font_path=args.font)
+            cold = _time_captions(base_path, work_path, caption, args.iterations, new_cold, font_path=args.font)
+            # FreeType measurements needed for one caption with an empty cache
+            measures = glyph_metrics_cache.misses
+            # one untimed render to populate the cache before measuring warm throughput
+            shutil.copy(base_path, work_path)
+            new_warm(work_path, caption, args.font)
+            warm = _time_captions(base_path, work_path, caption, args.iterations, new_warm, font_path=args.font)
+            speedup = warm / old if old else 0.0
+            print(
+                f"{name:<10} {old:>10.2f} {cold:>11.2f} {warm:>11.2f} {speedup:>7.2f}x "
+                f"{old_measures:>13} {measures:>9}"
+            )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+RENDERERS = {
+    "passes": thumbnail._render_caption_passes,
+    "layered": thumbnail._render_caption_layered,
+}
+
+# Largest per-channel difference allowed between the two render modes (rounding only)
+RENDER_MAX_DIFF = 2
+
+
+def bench_render(args: argparse.Namespace) -> None:
+    """Compare per-glyph passes against the layered renderer for speed, memory and pixel parity.
+
+    Only the in-memory rendering is timed; image decode and encode are excluded.
+    """
+    # Mid-tone background so shadow and stroke differences are visible in the diff
+    base = Image.new("RGB", (args.width, args.height), (40, 90, 20))
+    font = get_font(args.font, DEFAULT_FONT_SIZE)
+    spacing = int(DEFAULT_FONT_SIZE * 0.5)
+    safe_w, safe_h = int(args.width * 0.70), int(args.height * 0.70)
+    overlay_mb = args.width * args.height * 4 / 1e6
+    failures = []
+    print(f"{'sample':<10} {'passes ms':>10} {'layered ms':>11} {'layer MB':>14} {'max diff':>9} {'mean diff':>10} {'>8 px %':>8}")
+    for name, caption in CAPTION_SAMPLES.items():
+        layout = layout_caption(font, caption, safe_w, DEFAULT_FONT_SIZE, spacing)
+        tx = int(args.width * 0.15) + max(0, (safe_w - layout.width) // 2)
+        ty = int(args.height * 0.15) + max(0, (safe_h - layout.height) // 2)
+
+        timings = {}
+        pixels = {}
+        for mode, render in RENDERERS.items():
+            total = 0.0
+            for _ in range(args.iterations):
+                img = base.copy()
+                start = time.perf_counter()
+                out = render(img, layout, font, (255, 255, 0), DEFAULT_FONT_SIZE, tx, ty)
+                total += time.perf_counter() - start
+            timings[mode] = total / args.iterations * 1000
+            pixels[mode] = np.asarray(out.convert("RGB"), dtype=np.int16)
+
+        tile, _ = render_caption_tile(layout, font, (255, 255, 0, 255), DEFAULT_FONT_SIZE)
+        tile_mb = tile.width * tile.height * 4 / 1e6 if tile else 0.0
+
+        diff = np.abs(pixels["passes"] - pixels["layered"])
+        changed = (diff.max(axis=2) > 8).mean() * 100
+        print(
+            f"{name:<10} {timings['passes']:>10.1f} {timings['layered']:>11.1f} "
+            f"{overlay_mb:>6.1f}->{tile_mb:<6.1f} {int(diff.max()):>9} {diff.mean():>10.4f} {changed:>7.3f}%"
+        )
+        if diff.max() > args.max_diff:
+            failures.append(f"{name}: max diff {int(diff.max())} exceeds {args.max_diff}")
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1)
+
+
+def _stitch_reference(images: list, overlap: int = 150) -> Image.Image:
+    """The stitching loop `generate_thumbnail` used before `stitch_horizontal` (parity reference)."""
+    target_h = min(img.height for img in images)
+    imgs = [
+        img if img.height == target_h else img.resize((max(1, int(img.width * target_h / img.height)), target_h), Image.LANCZOS)
+        for img in images
+    ]
+    widths = [img.width for img in imgs]
+    overlap = max(1, min(overlap, *widths))
+    base = Image.new("RGBA", (sum(widths) - overlap * (len(imgs) - 1), target_h), (0, 0, 0, 0))
+    x = 0
+    for idx, img in enumerate(imgs):
+        if idx == 0:
+            base.paste(img, (x, 0))
+        else:
+            alpha = np.ones((target_h, img.width), dtype=np.uint8) * 255
+            for j in range(overlap):
+                alpha[:, j] = int(255 * (j / float(overlap)))
+            x -= overlap
+            base.paste(img, (x, 0), Image.fromarray(alpha, mode="L"))
+        x += img.width
+    return base
+
+
+def bench_stitch(args: argparse.Namespace) -> None:
+    """Time stitch_horizontal against the per-column reference loop and verify identical output."""
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)).convert("RGBA")
+        for _ in range(args.count)
+    ]
+    # one frame with a different height exercises the resize path
+    images[-1] = images[-1].resize((args.width, args.height + 64))
+
+    results = {}
+    for name, stitch in (("reference", _stitch_reference), ("stitch_horizontal", thumbnail.stitch_horizontal)):
+        stitch(images)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            out = stitch(images)
+        results[name] = ((time.perf_counter() - start) / args.iterations * 1000, np.asarray(out))
+
+    ref_ms, ref_px = results["reference"]
+    new_ms, new_px = results["stitch_horizontal"]
+    identical = ref_px.shape == new_px.shape and np.array_equal(ref_px, new_px)
+    print(f"{args.count} x {args.width}x{args.height} frames")
+    print(f"reference:         {ref_ms:8.1f} ms")
+    print(f"stitch_horizontal: {new_ms:8.1f} ms ({ref_ms / new_ms:.2f}x)")
+    print(f"identical pixels:  {identical}")
+
+
+def _extract_frames_reference(video_path: str, timestamps: list) -> list:
+    """One `ffmpeg -ss ... -vframes 1` per timestamp into a temp dir, decoded by PIL (previous approach)."""
+    tmp_dir = tempfile.mkdtemp(prefix="temp_frames_")
+    try:
+        frames = []
+        for i, t in enumerate(timestamps):
+            frame_path = os.path.join(tmp_dir, f"frame_{i + 1}.jpg")
+            command = ["ffmpeg", "-ss", str(t), "-i", video_path, "-vframes", "1", "-q:v", "2", frame_path, "-y"]
+            subprocess.run(command, check=True, capture_output=True)
+            with Image.open(frame_path) as img:
+                frames.append(img.convert("RGB"))
+        return frames
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_frames(args: argparse.Namespace) -> None:
+    """Time per-frame ffmpeg processes against one multi-frame ffmpeg pipe on a real video."""
+    duration, _, _ = thumbnail.probe_video(args.video)
+    if duration is None:
+        print(f"Could not probe {args.video}")
+        return
+    rng = random.Random(0)
+    runs = [
+        [rng.uniform(duration * 0.1, duration * 0.9) for _ in range(args.count)]
+        for _ in range(args.iterations)
+    ]
+    print(f"{args.count} frames x {args.iterations} runs from {args.video} ({duration:.1f}s)")
+    for name, extract, spawns in (
+        ("per-frame ffmpeg", _extract_frames_reference, args.count),
+        ("extract_frames", extract_frames, 1),
+    ):
+        start = time.perf_counter()
+        for timestamps in runs:
+            frames = extract(args.video, timestamps)
+        elapsed = (time.perf_counter() - start) / args.iterations * 1000
+        print(f"{name:<17} {elapsed:8.1f} ms/thumbnail  {spawns} ffmpeg spawn(s)  {len(frames)} frames")
+
+
+def _make_frames(tmp_dir: str, count: int, width: int, height: int) -> list:
+    """Write `count` synthetic frames to `tmp_dir` and return their paths."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        # smooth gradients plus mild noise compress like real frames rather than pure noise
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+        x = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        arr = (y * 0.6 + x * 0.4 + rng.normal(0, 6, (height, width, 3))) % 256
+        path = os.path.join(tmp_dir, f"frame_{i}.jpg")
+        Image.fromarray(arr.astype(np.uint8)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def _render_via_disk(image_paths: list, caption: str, out_path: str) -> bytes:
+    """Previous pipeline: encode the stitched cover, reopen it, caption, encode again, read back."""
+    base = thumbnail.stitch_horizontal([Image.open(p).convert("RGBA") for p in image_paths])
+    thumbnail._save_compressed_jpeg(base, out_path, True, 85)
+    thumbnail.add_caption_to_image(out_path, caption)
+    with open(out_path, "rb") as f:
+        return f.read()
+
+
+def bench_encode(args: argparse.Namespace) -> None:
+    """Time the disk round-trip pipeline against the in-memory single-encode pipeline."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_encode_")
+    try:
+        image_paths = _make_frames(tmp_dir, args.count, args.width, args.height)
+        caption = CAPTION_SAMPLES["mixed"]
+        out_path = os.path.join(tmp_dir, "thumb.jpg")
+
+        for name, run, encodes, writes in (
+            ("disk round-trip", lambda: _render_via_disk(image_paths, caption, out_path), 2, 2),
+            ("render_thumbnail", lambda: thumbnail.render_thumbnail(image_paths=image_paths, caption=caption, font_path=args.font).getvalue(), 1, 0),
+        ):
+            run()
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                data = run()
+            elapsed = (time.perf_counter() - start) / args.iterations * 1000
+            print(f"{name:<17} {elapsed:8.1f} ms  {encodes} JPEG encode(s)  {writes} disk write(s)  {len(data) / 1024:8.1f} KiB")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_budget(args: argparse.Namespace) -> None:
+    """Compare the fixed full-size JPEG encode with the size-targeted adaptive encode."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_budget_")
+    try:
+        image_paths = _make_frames(tmp_dir, args.count, args.width, args.height)
+        base = thumbnail.stitch_horizontal([Image.open(p).convert("RGBA") for p in image_paths]).convert("RGB")
+        cover = thumbnail.caption_image(base, CAPTION_SAMPLES["mixed"], font_path=args.font)
+        max_bytes = args.max_kib * 1024
+
+        def fixed():
+            buf = thumbnail.encode_jpeg(cover, True, 85)
+            return buf, 85
+
+        def adaptive():
+            return thumbnail.encode_jpeg_to_budget(cover, max_bytes)
+
+        print(f"cover {cover.width}x{cover.height}, budget {args.max_kib} KiB")
+        for name, run in (("fixed q85", fixed), ("budget", adaptive)):
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                buf, quality = run()
+            elapsed = (time.perf_counter() - start) / args.iterations * 1000
+            size = len(buf.getvalue())
+            print(f"{name:<10} {elapsed:8.1f} ms  quality={quality:<3} {size / 1024:8.1f} KiB  within budget: {size <= max_bytes}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _is_cjk_char_reference(ch: str) -> bool:
+    """The classifier `caption_layout` used before `text_shaping` (range list rebuilt per call)."""
+    cp = ord(ch)
+    ranges = [
+        (0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0x20000, 0x2A6DF), (0x2A700, 0x2B73F),
+        (0x2B740, 0x2B81F), (0x2B820, 0x2CEAF), (0xF900, 0xFAFF), (0x2F800, 0x2FA1F),
+        (0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xAC00, 0xD7AF),
+    ]
+    return any(start <= cp <= end for start, end in ranges)
+
+
+def _material_captions() -> list:
+    """Captions and titles from ytb_account_material_config, plus long mixed CJK/English variants."""
+    from ytb_account_material_config import YTB_ACCOUNT_MATERIAL_CONFIG
+
+    texts = []
+    for conf in YTB_ACCOUNT_MATERIAL_CONFIG.values():
+        texts.extend(conf.get("caption") or [])
+        texts.extend(item.get("title", "") for item in conf.get("copywriting") or [])
+    texts = [t for t in dict.fromkeys(texts) if t]
+    return texts + [f"{t} {CAPTION_SAMPLES['cjk']}" for t in texts]
+
+
+def bench_shaping(args: argparse.Namespace) -> None:
+    """Time CJK line classification and caption layout on the material-config captions."""
+    captions = _material_captions()
+    # every layout pass classifies each wrapped line; approximate lines by splitting captions in half
+    lines = [part for c in captions for part in (c[: len(c) // 2], c[len(c) // 2:])]
+    chars = sum(len(line) for line in lines)
+    print(f"{len(captions)} captions, {len(lines)} lines, {chars} characters")
+
+    classifiers = (
+        ("linear scan per char", lambda line: any(_is_cjk_char_reference(ch) for ch in line)),
+        ("bisect per char", lambda line: any(text_shaping.is_cjk_char(ch) for ch in line)),
+        ("regex per line", text_shaping.contains_cjk),
+        ("memoized line", text_shaping.line_has_cjk),
+    )
+    expected = [classifiers[0][1](line) for line in lines]
+    for name, classify in classifiers:
+        assert [classify(line) for line in lines] == expected, name
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for line in lines:
+                classify(line)
+        per_pass = (time.perf_counter() - start) / args.iterations * 1e6
+        print(f"{name:<22} {per_pass:10.1f} us per pass over all lines")
+
+    font = get_font(args.font, DEFAULT_FONT_SIZE)
+    spacing = int(DEFAULT_FONT_SIZE * 0.5)
+    for caption in captions:
+        layout_caption(font, caption, args.width, DEFAULT_FONT_SIZE, spacing)
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for caption in captions:
+            layout_caption(font, caption, args.width, DEFAULT_FONT_SIZE, spacing)
+    elapsed = time.perf_counter() - start
+    print(f"layout_caption (warm): {len(captions) * args.iterations / elapsed:10.1f} captions/sec")
+
+
+def bench_layout(args: argparse.Namespace) -> None:
+    """Compare the per-glyph and whole-line layout backends for speed and visual parity."""
+    base = Image.new("RGB", (args.width, args.height), (40, 90, 20))
+    font = get_font(args.font, DEFAULT_FONT_SIZE)
+    spacing = int(DEFAULT_FONT_SIZE * 0.5)
+    safe_w = int(args.width * 0.70)
+    print(f"{'sample':<10} {'glyph ms':>9} {'line ms':>8} {'draws':>11} {'block width':>13} {'mean diff':>10} {'>8 px %':>8}")
+    for name, caption in CAPTION_SAMPLES.items():
+        timings, pixels, draws, widths = {}, {}, {}, {}
+        for backend in LAYOUT_BACKENDS:
+            layout = layout_caption(font, caption, safe_w, DEFAULT_FONT_SIZE, spacing, backend=backend)
+            draws[backend] = sum(len(line.glyphs) for line in layout.lines)
+            widths[backend] = layout.width
+            total = 0.0
+            for _ in range(args.iterations):
+                img = base.copy()
+                start = time.perf_counter()
+                out = thumbnail.caption_image(img, caption, font_path=args.font, render_mode=args.mode, layout_backend=backend)
+                total += time.perf_counter() - start
+            timings[backend] = total / args.iterations * 1000
+            pixels[backend] = np.asarray(out.convert("RGB"), dtype=np.int16)
+
+        diff = np.abs(pixels["glyph"] - pixels["line"])
+        changed = (diff.max(axis=2) > 8).mean() * 100
+        print(
+            f"{name:<10} {timings['glyph']:>9.1f} {timings['line']:>8.1f} "
+            f"{draws['glyph']:>5}->{draws['line']:<5} {widths['glyph']:>6}->{widths['line']:<6} "
+            f"{diff.mean():>10.4f} {changed:>7.3f}%"
+        )
+
+
+def bench_fit(args: argparse.Namespace) -> None:
+    """Compare fixed-size layouts with the fit-to-box font size search."""
+    samples = {
+        "short": "HOT ASIAN GIRLS",
+        **CAPTION_SAMPLES,
+        "long": " ".join(CAPTION_SAMPLES.values()),
+    }
+    base = Image.new("RGB", (args.width, args.height), (40, 90, 20))
+    safe_w, safe_h = int(args.width * 0.70), int(args.height * 0.70)
+    font_for_size = functools.partial(get_font, args.font)
+    fixed_font = font_for_size(DEFAULT_FONT_SIZE)
+    failures = []
+    print(f"safe area {safe_w}x{safe_h}")
+    print(
+        f"{'sample':<8} {'fixed wxh':>11} {'fit px':>7} {'fit wxh':>10} {'measures':>9} "
+        f"{'cold ms':>8} {'warm ms':>8} {'render ms':>10}"
+    )
+    for name, caption in samples.items():
+        fixed = layout_caption(fixed_font, caption, safe_w, DEFAULT_FONT_SIZE, int(DEFAULT_FONT_SIZE * 0.5))
+        fixed_fits = fixed.width <= safe_w and fixed.height <= safe_h
+
+        glyph_metrics_cache.clear()
+        start = time.perf_counter()
+        size, _, layout = fit_caption_layout(
+            font_for_size, caption, safe_w, safe_h, 0.5, baseline_size=DEFAULT_FONT_SIZE
+        )
+        cold_ms = (time.perf_counter() - start) * 1000
+        measures = glyph_metrics_cache.misses
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            fit_caption_layout(font_for_size, caption, safe_w, safe_h, 0.5, baseline_size=DEFAULT_FONT_SIZE)
+        warm_ms = (time.perf_counter() - start) / args.iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            thumbnail.caption_image(base.copy(), caption, font_path=args.font, fit_to_box=True)
+        render_ms = (time.perf_counter() - start) / args.iterations * 1000
+
+        if size > FIT_MIN_FONT_SIZE and (layout.width > safe_w or layout.height > safe_h):
+            failures.append(f"{name}: {size}px layout {layout.width}x{layout.height} overflows the safe area")
+        if fixed_fits and size < DEFAULT_FONT_SIZE:
+            failures.append(f"{name}: fit chose {size}px although the fixed {DEFAULT_FONT_SIZE}px layout fits")
+
+        overflow = " " if fixed_fits else "!"
+        print(
+            f"{name:<8} {f'{fixed.width}x{fixed.height}':>10}{overflow} {size:>7} "
+            f"{f'{layout.width}x{layout.height}':>10} {measures:>9} "
+            f"{cold_ms:>8.1f} {warm_ms:>8.2f} {render_ms:>10.1f}"
+        )
+    print(f"! = the fixed {DEFAULT_FONT_SIZE}px layout overflows the safe area")
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1)
+
+
+def bench_select(args: argparse.Namespace) -> None:
+    """Compare blind random frame picks with quality-scored candidate selection."""
+    duration, _, _ = thumbnail.probe_video(args.video)
+    if duration is None:
+        print(f"Could not probe {args.video}")
+        return
+    start_t, end_t = duration * 0.1, duration * 0.9
+
+    def blind():
+        return [random.uniform(start_t, end_t) for _ in range(args.count)]
+
+    def scored():
+        return frame_select.select_frame_timestamps(
+            args.video, start_t, end_t, count=args.count, candidates=args.candidates
+        ) or blind()
+
+    print(f"{args.count} frames per cover, {args.candidates} candidates, {args.iterations} covers from {args.video}")
+    print(f"{'picker':<8} {'ms/cover':>9} {'luma':>7} {'sharpness':>10} {'entropy':>8} {'unusable':>9}")
+    for name, pick in (("random", blind), ("scored", scored)):
+        random.seed(0)
+        measured, elapsed = [], 0.0
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            timestamps = pick()
+            frames = extract_frames(args.video, timestamps)
+            elapsed += time.perf_counter() - start
+            # score the full-resolution frames at the sampling width so both pickers are measured alike
+            for frame, t in zip(frames, timestamps):
+                small = frame.resize((frame_select.SAMPLE_WIDTH, max(1, frame.height * frame_select.SAMPLE_WIDTH // frame.width)))
+                measured.append(frame_select.measure_frame(small, t))
+        n = max(1, len(measured))
+        print(
+            f"{name:<8} {elapsed / args.iterations * 1000:>9.1f} "
+            f"{sum(m.luma for m in measured) / n:>7.1f} {sum(m.sharpness for m in measured) / n:>10.1f} "
+            f"{sum(m.entropy for m in measured) / n:>8.2f} {sum(not m.usable for m in measured):>5}/{len(measured)}"
+        )
+
+
+def bench_keyframe(args: argparse.Namespace) -> None:
+    """Per-frame latency of accurate seeking versus keyframe-only decoding on a long video."""
+    duration, width, height = thumbnail.probe_video(args.video)
+    if duration is None:
+        print(f"Could not probe {args.video}")
+        return
+    rng = random.Random(0)
+    timestamps = [rng.uniform(duration * 0.1, duration * 0.9) for _ in range(args.count)]
+    print(f"{args.count} frames from {args.video} ({width}x{height}, {duration:.1f}s)")
+    print(f"{'mode':<14} {'single ms/frame':>16} {'pipe ms/frame':>14}")
+    for name, keyframe_only in (("accurate", False), ("keyframe-only", True)):
+        start = time.perf_counter()
+        for t in timestamps:
+            extract_frames(args.video, [t], keyframe_only=keyframe_only)
+        single = (time.perf_counter() - start) / len(timestamps) * 1000
+        start = time.perf_counter()
+        frames = extract_frames(args.video, timestamps, keyframe_only=keyframe_only)
+        pipe = (time.perf_counter() - start) / max(1, len(frames)) * 1000
+        print(f"{name:<14} {single:>16.1f} {pipe:>14.1f}")
+
+
+def _stitch_files_reference(paths: list) -> Image.Image:
+    """Image-group stitching as `_compose_thumbnail` did it before `stitch_image_files`."""
+    imgs = [Image.open(p).convert("RGBA") for p in paths]
+    return thumbnail.stitch_horizontal(imgs).convert("RGB")
+
+
+def _peak_rss_kib() -> int:
+    """Peak resident set size of this process in KiB.
+
+    Reads VmHWM from /proc (reset on exec); `ru_maxrss` is used elsewhere, but on Linux it
+    carries over the parent's high-water mark into a spawned child.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _stitch_memory_child(impl: str, paths: list, max_height, queue) -> None:
+    """Run one stitch in a fresh process and report (ms, size, peak RSS growth in MB)."""
+    baseline = _peak_rss_kib()
+    start = time.perf_counter()
+    if impl == "reference":
+        out = _stitch_files_reference(paths)
+    else:
+        out = thumbnail.stitch_image_files(paths, max_height=max_height)
+    elapsed = (time.perf_counter() - start) * 1000
+    queue.put((elapsed, out.size, (_peak_rss_kib() - baseline) / 1024))
+
+
+def bench_stitchmem(args: argparse.Namespace) -> None:
+    """Compare peak memory of RGBA all-at-once stitching with the streaming RGB stitcher."""
+    import multiprocessing
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_stitchmem_")
+    try:
+        paths = _make_frames(tmp_dir, args.count, args.width, args.height)
+        ctx = multiprocessing.get_context("spawn")
+        print(f"{args.count} JPEGs of {args.width}x{args.height}")
+        print(f"{'stitcher':<19} {'ms':>8} {'output':>12} {'peak RSS +MB':>13}")
+        runs = (
+            ("reference", "reference", None),
+            ("stitch_image_files", "stitch_image_files", None),
+            (f"  max_height={thumbnail.STITCH_MAX_HEIGHT}", "stitch_image_files", thumbnail.STITCH_MAX_HEIGHT),
+        )
+        for label, impl, max_height in runs:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_stitch_memory_child, args=(impl, paths, max_height, queue))
+            proc.start()
+            elapsed, size, rss_mb = queue.get()
+            proc.join()
+            print(f"{label:<19} {elapsed:>8.1f} {size[0]:>6}x{size[1]:<5} {rss_mb:>13.1f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _make_bursts(tmp_dir: str, groups: int, burst: int, size=(640, 480)) -> list:
+    """Write `groups` random scenes with `burst` slightly shifted, noisy shots each."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for g in range(groups):
+        # coarse random blocks upscaled: distinct scenes with real structure
+        scene = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)).resize(size, Image.BILINEAR)
+        for b in range(burst):
+            arr = np.asarray(scene.rotate(b * 0.5), dtype=np.int16) + rng.normal(0, 4, (size[1], size[0], 3))
+            path = os.path.join(tmp_dir, f"scene{g:03d}_{b}.jpg")
+            Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(path, quality=90)
+            paths.append(path)
+    return paths
+
+
+def bench_dedupe(args: argparse.Namespace) -> None:
+    """Hashing cost of the persisted dHash index and duplicate rates of plain vs deduplicated picks."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_dedupe_")
+    try:
+        paths = _make_bursts(tmp_dir, args.groups, args.burst)
+        start = time.perf_counter()
+        index = image_hash.ImageHashIndex(tmp_dir)
+        index.update(paths)
+        index.save()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        index = image_hash.ImageHashIndex(tmp_dir)
+        rehashed = index.update(paths)
+        warm = time.perf_counter() - start
+        print(f"{len(paths)} images: cold index {cold * 1000:.0f} ms, warm reload+update {warm * 1000:.1f} ms ({rehashed} rehashed)")
+
+        hashes = index.hashes(paths)
+        scene = {p: os.path.basename(p).split("_")[0] for p in paths}
+        print(f"{'picker':<16} {'same-scene pairs/cover':>23} {'images reused from last covers':>31}")
+        for name, pick in (
+            ("random.sample", lambda recent: random.sample(paths, args.per_cover)),
+            ("choose_distinct", lambda recent: image_hash.choose_distinct(paths, args.per_cover, hashes, recent)),
+        ):
+            random.seed(0)
+            history, pairs, reused = [], 0, 0
+            for _ in range(args.covers):
+                recent_paths = [p for cover in history[-args.recent:] for p in cover]
+                picks = pick([hashes[p] for p in recent_paths])
+                pairs += sum(scene[a] == scene[b] for i, a in enumerate(picks) for b in picks[i + 1:])
+                reused += sum(scene[p] in {scene[q] for q in recent_paths} for p in picks)
+                history.append(picks)
+            print(f"{name:<16} {pairs / args.covers:>23.2f} {reused / args.covers:>31.2f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_coverpool(args: argparse.Namespace) -> None:
+    """Scheduled-job latency of synchronous thumbnail generation vs queueing the background cover pool."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_coverpool_")
+    try:
+        video = os.path.join(tmp_dir, "live", "day1", os.path.basename(args.video))
+        os.makedirs(os.path.dirname(video))
+        shutil.copyfile(args.video, video)
+        cover_dir = os.path.join(tmp_dir, "live_cover")
+
+        sync_ms = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            buf = thumbnail.render_stream_thumbnail(video)
+            sync_ms.append((time.perf_counter() - start) * 1000)
+            if buf is None:
+                print("render_stream_thumbnail failed")
+                return
+        print(f"sync render_stream_thumbnail in the job: {np.median(sync_ms):.0f} ms per broadcast")
+
+        producer = cover_pool.CoverProducer(workers=args.workers)
+        pool = cover_pool.CoverPool(cover_dir=cover_dir, videos=[video], low_water=args.low_water)
+        start = time.perf_counter()
+        queued = producer.request([pool])
+        request_ms = (time.perf_counter() - start) * 1000
+        again = time.perf_counter()
+        producer.request([pool])
+        again_ms = (time.perf_counter() - again) * 1000
+        producer.wait_idle()
+        filled = time.perf_counter() - start
+        producer.stop()
+        print(f"CoverProducer.request in the job: {request_ms:.2f} ms ({queued} pool queued), "
+              f"repeat while pending {again_ms:.2f} ms")
+        print(f"background fill to {args.low_water} covers: {filled:.1f} s, "
+              f"{cover_pool.count_covers(cover_dir)} covers, {producer.failed} failed, workers={args.workers}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def parse_args(argv):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmarks for youtube/thumbnail.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_caption = sub.add_parser("caption", help="captions/sec for add_caption_to_image")
+    p_caption.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_caption.add_argument("--iterations", type=int, default=10, help="Renders per sample")
+    p_caption.add_argument("--width", type=int, default=1920, help="Base image width")
+    p_caption.add_argument("--height", type=int, default=1080, help="Base image height")
+    p_caption.set_defaults(func=bench_caption)
+
+    p_render = sub.add_parser("render", help="passes vs layered caption rendering")
+    p_render.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_render.add_argument("--iterations", type=int, default=5, help="Renders per sample and mode")
+    p_render.add_argument("--width", type=int, default=3840, help="Base image width")
+    p_render.add_argument("--height", type=int, default=2160, help="Base image height")
+    p_render.add_argument("--max-diff", type=int, default=RENDER_MAX_DIFF,
+                          help="Largest per-channel difference allowed between the two modes")
+    p_render.set_defaults(func=bench_render)
+
+    p_stitch = sub.add_parser("stitch", help="stitch_horizontal vs the previous mask loop")
+    p_stitch.add_argument("--count", type=int, default=3, help="Frames per cover")
+    p_stitch.add_argument("--iterations", type=int, default=5, help="Stitches per implementation")
+    p_stitch.add_argument("--width", type=int, default=1080, help="Frame width")
+    p_stitch.add_argument("--height", type=int, default=1920, help="Frame height")
+    p_stitch.set_defaults(func=bench_stitch)
+
+    p_frames = sub.add_parser("frames", help="per-frame ffmpeg processes vs one multi-frame pipe")
+    p_frames.add_argument("--video", required=True, help="Video file to extract frames from")
+    p_frames.add_argument("--count", type=int, default=3, help="Frames per thumbnail")
+    p_frames.add_argument("--iterations", type=int, default=5, help="Thumbnails per implementation")
+    p_frames.set_defaults(func=bench_frames)
+
+    p_encode = sub.add_parser("encode", help="disk round-trip vs in-memory single-encode thumbnails")
+    p_encode.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_encode.add_argument("--count", type=int, default=3, help="Frames per cover")
+    p_encode.add_argument("--iterations", type=int, default=5, help="Thumbnails per pipeline")
+    p_encode.add_argument("--width", type=int, default=1080, help="Frame width")
+    p_encode.add_argument("--height", type=int, default=1920, help="Frame height")
+    p_encode.set_defaults(func=bench_encode)
+
+    p_budget = sub.add_parser("budget", help="fixed quality vs byte-budget JPEG encoding")
+    p_budget.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_budget.add_argument("--count", type=int, default=3, help="Frames per cover")
+    p_budget.add_argument("--iterations", type=int, default=3, help="Encodes per mode")
+    p_budget.add_argument("--width", type=int, default=1080, help="Frame width")
+    p_budget.add_argument("--height", type=int, default=1920, help="Frame height")
+    p_budget.add_argument("--max-kib", type=int, default=2048, help="Byte budget in KiB")
+    p_budget.set_defaults(func=bench_budget)
+
+    p_shaping = sub.add_parser("shaping", help="CJK classification and wrapping on material-config captions")
+    p_shaping.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_shaping.add_argument("--iterations", type=int, default=200, help="Passes over the caption set")
+    p_shaping.add_argument("--width", type=int, default=int(1920 * 0.70), help="Wrap width in pixels")
+    p_shaping.set_defaults(func=bench_shaping)
+
+    p_layout = sub.add_parser("layout", help="per-glyph vs whole-line caption layout")
+    p_layout.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_layout.add_argument("--iterations", type=int, default=10, help="Renders per sample and backend")
+    p_layout.add_argument("--width", type=int, default=3240, help="Base image width (three stitched 1080p frames)")
+    p_layout.add_argument("--height", type=int, default=1920, help="Base image height")
+    p_layout.add_argument("--mode", choices=["layered", "passes"], default="layered", help="Caption render mode")
+    p_layout.set_defaults(func=bench_layout)
+
+    p_fit = sub.add_parser("fit", help="fixed font size vs fit-to-box font size search")
+    p_fit.add_argument("--font", default=None, help="Font file to use instead of fonts/SourceHanSansCN-Heavy.otf")
+    p_fit.add_argument("--iterations", type=int, default=10, help="Searches and renders per sample")
+    p_fit.add_argument("--width", type=int, default=1920, help="Base image width")
+    p_fit.add_argument("--height", type=int, default=1080, help="Base image height")
+    p_fit.set_defaults(func=bench_fit)
+
+    p_select = sub.add_parser("select", help="random vs quality-scored cover frame selection")
+    p_select.add_argument("--video", required=True, help="Video file to pick frames from")
+    p_select.add_argument("--count", type=int, default=3, help="Frames per cover")
+    p_select.add_argument("--candidates", type=int, default=frame_select.DEFAULT_CANDIDATES, help="Low-resolution candidates")
+    p_select.add_argument("--iterations", type=int, default=5, help="Covers per picker")
+    p_select.set_defaults(func=bench_select)
+
+    p_keyframe = sub.add_parser("keyframe", help="accurate seek vs keyframe-only frame extraction")
+    p_keyframe.add_argument("--video", required=True, help="Long (e.g. 1080p) video file")
+    p_keyframe.add_argument("--count", type=int, default=6, help="Frames to extract")
+    p_keyframe.set_defaults(func=bench_keyframe)
+
+    p_stitchmem = sub.add_parser("stitchmem", help="peak memory of image-group stitching")
+    p_stitchmem.add_argument("--count", type=int, default=4, help="Images per cover")
+    p_stitchmem.add_argument("--width", type=int, default=4032, help="Image width")
+    p_stitchmem.add_argument("--height", type=int, default=3024, help="Image height")
+    p_stitchmem.set_defaults(func=bench_stitchmem)
+
+    p_dedupe = sub.add_parser("dedupe", help="perceptual-hash index cost and duplicate rates of cover picks")
+    p_dedupe.add_argument("--groups", type=int, default=40, help="Distinct scenes")
+    p_dedupe.add_argument("--burst", type=int, default=5, help="Near-identical shots per scene")
+    p_dedupe.add_argument("--per-cover", type=int, default=4, help="Images per cover")
+    p_dedupe.add_argument("--covers", type=int, default=50, help="Covers to pick")
+    p_dedupe.add_argument("--recent", type=int, default=5, help="Previous covers to avoid")
+    p_dedupe.set_defaults(func=bench_dedupe)
+
+    p_coverpool = sub.add_parser("coverpool", help="synchronous thumbnails vs the background cover pool")
+    p_coverpool.add_argument("--video", required=True, help="Live material video")
+    p_coverpool.add_argument("--iterations", type=int, default=3, help="Synchronous thumbnails to time")
+    p_coverpool.add_argument("--low-water", type=int, default=5, help="Covers the pool keeps")
+    p_coverpool.add_argument("--workers", type=int, default=1, help="Cover generation processes")
+    p_coverpool.set_defaults(func=bench_coverpool)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """CLI entry point."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,51 @@
+"""
+Extract one cover frame per video into `<directory>/cover/<W>x<H>/...`.
+
+Large FTP trees hold tens of thousands of clips, so the scan is incremental and parallel:
+- A manifest (`cover/manifest.json` by default) records (path, size, mtime, output) for every
+  extracted video; on re-runs unchanged videos whose cover still exists are skipped without
+  probing or starting ffmpeg.
+- `--workers N` probes and extracts in a process pool; at most `N * QUEUE_FACTOR` files are in
+  flight, so memory stays flat however large the tree is.
+- A JSON summary (files/sec, extracted, skipped, failures) is printed at the end and can be
+  written to `--summary`.
+- `--fused` starts a single ffmpeg process per video: the frame is piped out as PPM, its
+  dimensions (from the PPM header) choose the `cover/<W>x<H>` bucket, and PIL writes the image.
+  The separate ffprobe call is no longer needed, halving the processes started per file.
+- `--keyframe-only` adds `-skip_frame nokey`: only keyframes are decoded and the cover is the first
+  keyframe at or after the seek point, instead of decoding forward from the previous keyframe.
+  This is plain CPU decoding and needs no GPU.
+"""
+
+import json
 import os
 import sys
 import argparse
 import subprocess
-from typing import List, Tuple
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple
 from typing import Optional
 
+# Ensure project root is on sys.path for imports when run directly
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from PIL import Image  # noqa: E402
+
+from youtube import media_probe  # noqa: E402
+from youtube.frame_extract import parse_ppm_stream  # noqa: E402
+from youtube.frame_select import select_frame_timestamps  # noqa: E402
+
+
+# Pending tasks per worker before the scan waits for results
+QUEUE_FACTOR = 4
+
+# Manifest is flushed to disk after this many new entries (and at the end)
+MANIFEST_FLUSH_EVERY = 200
+
+MANIFEST_NAME = "manifest.json"
 
 SUPPORTED_EXTS = {
     ".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v", ".ts", ".flv", ".wmv", ".3gp"
@@ -17,9 +58,16 @@ def is_video_file(filename: str) -> bool:
     return ext.lower() in SUPPORTED_EXTS
 
 
+# Directories already created by this process, so each one costs a single makedirs call
+_created_dirs: set = set()
+
+
 def ensure_dir(path: str) -> None:
-    """Create directory path if it does not exist."""
+    """Create directory path if it does not exist (once per process)."""
+    if path in _created_dirs:
+        return
     os.makedirs(path, exist_ok=True)
+    _created_dirs.add(path)
 
 
 def build_output_path(base_dir: str, cover_dir: str, dirpath: str, filename: str, fmt: str = "jpg") -> str:
@@ -37,32 +85,29 @@ def build_output_path(base_dir: str, cover_dir: str, dirpath: str, filename: str
 
 
 def probe_video_resolution(video_path: str) -> Optional[Tuple[int, int]]:
-    """Probe video resolution using ffprobe. Returns (width, height) or None on failure."""
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-select_streams",
-        "v:0",
-        "-show_entries",
-        "stream=width,height",
-        "-of",
-        "csv=s=x:p=0",
-        video_path,
-    ]
-    try:
-        res = subprocess.run(cmd, check=True, capture_output=True, text=True, encoding="utf-8", errors="ignore")
-        out = res.stdout.strip()
-        if not out:
-            return None
-        parts = out.split('x')
-        if len(parts) != 2:
-            return None
-        width = int(parts[0])
-        height = int(parts[1])
-        return width, height
-    except Exception:
+    """Probe video resolution via the shared media probe. Returns (width, height) or None on failure."""
+    info = media_probe.probe_media(video_path)
+    if info is None or not info.width or not info.height:
         return None
+    return info.width, info.height
+
+
+def pick_cover_seek(video_path: str, seek: float, window: float, keyframe_only: bool = False) -> float:
+    """Return the best-scoring frame time in [seek, seek + window], or `seek` if sampling fails.
+
+    Candidates are decoded at low resolution in one ffmpeg call and scored for brightness,
+    sharpness and detail (see `youtube/frame_select.py`), so black intro frames are skipped
+    without a hand-tuned `--seek`.
+    """
+    start = max(0.0, seek or 0.0)
+    end = start + window
+    info = media_probe.probe_media(video_path)
+    if info is not None and info.duration:
+        end = min(end, info.duration * 0.9)
+    if end <= start:
+        return start
+    selected = select_frame_timestamps(video_path, start, end, count=1, keyframe_only=keyframe_only)
+    return selected[0] if selected else start
 
 
 def extract_first_frame(
@@ -72,6 +117,7 @@ def extract_first_frame(
     quality: int = 2,
     fmt: str = "jpg",
     seek: float = 0.0,
+    keyframe_only: bool = False,
 ) -> Tuple[bool, str]:
     """Extract the very first frame of a video to a JPEG using ffmpeg.
 
@@ -79,6 +125,7 @@ def extract_first_frame(
         video_path: Input video file path.
         output_path: Target image path (.jpg).
         overwrite: Whether to overwrite existing image.
+        keyframe_only: Decode keyframes only (`-skip_frame nokey`); the nearest keyframe after `seek` is used.
 
     Returns:
         (ok, message): ok indicates success; message includes info or error detail.
@@ -95,6 +142,8 @@ def extract_first_frame(
         "-y" if overwrite else "-n",
     ]
 
+    if keyframe_only:
+        cmd += ["-skip_frame", "nokey"]
     # If seek provided and > 0, use it; otherwise use 0
     cmd += ["-ss", str(seek if seek and seek > 0 else 0)]
     cmd += ["-i", video_path, "-frames:v", "1"]
@@ -121,31 +170,117 @@ def extract_first_frame(
         return False, "ffmpeg not found. Please install ffmpeg and ensure it is in PATH."
 
 
-def scan_and_extract(
-    base_dir: str,
+def _pil_save_options(fmt: str, quality: int) -> dict:
+    """Map the ffmpeg-style quality (1-31, lower is better) to PIL save options."""
+    q = max(1, min(31, quality))
+    if fmt.lower() == "png":
+        # Same inverse mapping as the ffmpeg -compression_level path
+        return {"format": "PNG", "compress_level": int(max(0, min(9, round((31 - q) / 31 * 9))))}
+    # q=2 (ffmpeg default high quality) -> 95
+    return {"format": "JPEG", "quality": max(5, min(100, 101 - 3 * q))}
+
+
+def decode_frame(video_path: str, seek: float = 0.0, keyframe_only: bool = False) -> Image.Image:
+    """Decode one frame at `seek` with a single ffmpeg process, returning it as an RGB image.
+
+    Raises `subprocess.CalledProcessError` / `FileNotFoundError` from ffmpeg, or `ValueError`
+    if no frame was decoded.
+    """
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostdin",
+        *(["-skip_frame", "nokey"] if keyframe_only else []),
+        "-ss",
+        str(seek if seek and seek > 0 else 0),
+        "-i",
+        video_path,
+        "-frames:v",
+        "1",
+        "-pix_fmt",
+        "rgb24",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "ppm",
+        "pipe:1",
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True)
+    frames = parse_ppm_stream(result.stdout)
+    if not frames:
+        raise ValueError("no frame decoded")
+    return frames[0]
+
+
+def cover_output_path(cover_dir: str, rel: str, in_path: str, wh: Optional[Tuple[int, int]], fmt: str) -> str:
+    """Output path `cover/<W>x<H>/<rel>/<name>.<ext>` (or `unknown_resolution`), creating its directory."""
+    res_dir = os.path.join(cover_dir, f"{wh[0]}x{wh[1]}" if wh else "unknown_resolution")
+    # Use res_dir as the base for mirroring relative structure
+    out_parent_dir = os.path.join(res_dir, rel) if rel != "." else res_dir
+    ensure_dir(out_parent_dir)
+    name, _ = os.path.splitext(os.path.basename(in_path))
+    ext = "png" if fmt.lower() == "png" else "jpg"
+    return os.path.join(out_parent_dir, f"{name}.{ext}")
+
+
+def extract_cover_fused(
+    in_path: str,
+    rel: str,
+    cover_dir: str,
     overwrite: bool = False,
-    recursive: bool = True,
     quality: int = 2,
     fmt: str = "jpg",
     seek: float = 0.0,
-) -> List[str]:
-    """Traverse `base_dir` and extract first frames for all videos to `cover` subdirectory.
-
-    - Mirrors input directory structure under `cover` to avoid collisions.
-    - Skips files already extracted unless `overwrite=True`.
+    keyframe_only: bool = False,
+) -> Tuple[bool, str, Optional[str]]:
+    """Decode one frame and save it under the bucket given by its decoded size; no ffprobe call.
 
     Returns:
-        A list of status messages for each processed file.
+        (ok, message, output path).
     """
-    base_dir = os.path.abspath(base_dir)
-    if not os.path.isdir(base_dir):
-        return [f"Not a directory: {base_dir}"]
+    try:
+        frame = decode_frame(in_path, seek, keyframe_only)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode("utf-8", errors="ignore") if e.stderr else e
+        return False, f"ffmpeg error for {in_path}: {stderr}", None
+    except FileNotFoundError:
+        return False, "ffmpeg not found. Please install ffmpeg and ensure it is in PATH.", None
+    except ValueError as e:
+        return False, f"ffmpeg error for {in_path}: {e}", None
 
-    cover_dir = os.path.join(base_dir, "cover")
-    ensure_dir(cover_dir)
+    out_path = cover_output_path(cover_dir, rel, in_path, frame.size, fmt)
+    if (not overwrite) and os.path.exists(out_path):
+        return True, f"Skip existing: {out_path}", out_path
+    try:
+        frame.save(out_path, **_pil_save_options(fmt, quality))
+    except OSError as e:
+        return False, f"Error saving {out_path}: {e}", None
+    return True, f"Saved: {out_path}", out_path
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    """Load the extraction manifest ({video path: {size, mtime_ns, output}}); empty if missing or invalid."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
 
-    messages: List[str] = []
 
+def save_manifest(path: str, manifest: Dict[str, dict]) -> None:
+    """Write the manifest atomically (temp file + rename)."""
+    ensure_dir(os.path.dirname(os.path.abspath(path)))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def iter_videos(base_dir: str, cover_dir: str, recursive: bool = True) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """Yield (video path, directory relative to `base_dir`, stat) for every video, skipping `cover_dir`."""
     if recursive:
         walker = os.walk(base_dir)
     else:
@@ -155,32 +290,192 @@ def scan_and_extract(
     for dirpath, dirnames, filenames in walker:
         # Avoid traversing the 'cover' output directory itself
         dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != cover_dir]
-
+        rel = os.path.relpath(dirpath, start=base_dir)
         for fname in filenames:
             if not is_video_file(fname):
                 continue
             in_path = os.path.join(dirpath, fname)
-            # Probe resolution to route into subdirectories like cover/1080x1920
-            wh = probe_video_resolution(in_path)
-            if wh:
-                res_dir = os.path.join(cover_dir, f"{wh[0]}x{wh[1]}")
-            else:
-                res_dir = os.path.join(cover_dir, "unknown_resolution")
-            ensure_dir(res_dir)
-
-            # Use res_dir as the base for mirroring relative structure
-            rel = os.path.relpath(dirpath, start=base_dir)
-            out_parent_dir = os.path.join(res_dir, rel) if rel != "." else res_dir
-            ensure_dir(out_parent_dir)
-            name, _ = os.path.splitext(fname)
-            ext = "png" if fmt.lower() == "png" else "jpg"
-            out_path = os.path.join(out_parent_dir, f"{name}.{ext}")
-            ok, msg = extract_first_frame(
-                in_path, out_path, overwrite=overwrite, quality=quality, fmt=fmt, seek=seek
-            )
-            messages.append(msg)
-
-    return messages
+            try:
+                st = os.stat(in_path)
+            except OSError:
+                continue
+            yield in_path, rel, st
+
+
+def is_unchanged(entry: Optional[dict], st: os.stat_result) -> bool:
+    """True if the manifest entry matches the file's size and mtime and its cover still exists."""
+    return bool(
+        entry
+        and entry.get("size") == st.st_size
+        and entry.get("mtime_ns") == st.st_mtime_ns
+        and entry.get("output")
+        and os.path.exists(entry["output"])
+    )
+
+
+def _init_worker(probe_cache: Optional[str]) -> None:
+    """Process-pool initializer: share the persistent probe cache with every worker."""
+    if probe_cache:
+        media_probe.configure_media_probe(probe_cache)
+
+
+def process_video(in_path: str, rel: str, cover_dir: str, options: dict) -> dict:
+    """Extract one video's cover into `cover/<W>x<H>/<rel>/` and return a result record.
+
+    The resolution comes from the media probe, or in fused mode from the decoded frame itself.
+    """
+    start = time.perf_counter()
+    frame_seek = options["seek"]
+    if options["fused"]:
+        if options["auto_seek"] > 0:
+            frame_seek = pick_cover_seek(in_path, options["seek"], options["auto_seek"], options["keyframe_only"])
+        ok, msg, out_path = extract_cover_fused(
+            in_path,
+            rel,
+            cover_dir,
+            overwrite=options["overwrite"],
+            quality=options["quality"],
+            fmt=options["fmt"],
+            seek=frame_seek,
+            keyframe_only=options["keyframe_only"],
+        )
+        return {"path": in_path, "output": out_path, "ok": ok, "message": msg, "elapsed": time.perf_counter() - start}
+
+    # Probe resolution to route into subdirectories like cover/1080x1920
+    out_path = cover_output_path(cover_dir, rel, in_path, probe_video_resolution(in_path), options["fmt"])
+
+    if options["auto_seek"] > 0 and (options["overwrite"] or not os.path.exists(out_path)):
+        frame_seek = pick_cover_seek(in_path, options["seek"], options["auto_seek"], options["keyframe_only"])
+    ok, msg = extract_first_frame(
+        in_path,
+        out_path,
+        overwrite=options["overwrite"],
+        quality=options["quality"],
+        fmt=options["fmt"],
+        seek=frame_seek,
+        keyframe_only=options["keyframe_only"],
+    )
+    return {"path": in_path, "output": out_path, "ok": ok, "message": msg, "elapsed": time.perf_counter() - start}
+
+
+def _collect(future, item: Tuple[str, os.stat_result], handle) -> None:
+    """Pass a finished future's result to `handle`; a crashed worker counts as a failure."""
+    in_path, st = item
+    try:
+        result = future.result()
+    except Exception as e:
+        result = {"path": in_path, "output": None, "ok": False, "message": f"worker error for {in_path}: {e}", "elapsed": 0.0}
+    handle(result, st)
+
+
+def scan_and_extract(
+    base_dir: str,
+    overwrite: bool = False,
+    recursive: bool = True,
+    quality: int = 2,
+    fmt: str = "jpg",
+    seek: float = 0.0,
+    auto_seek: float = 0.0,
+    workers: int = 1,
+    manifest_path: Optional[str] = None,
+    probe_cache: Optional[str] = None,
+    fused: bool = False,
+    keyframe_only: bool = False,
+) -> Tuple[List[str], dict]:
+    """Traverse `base_dir` and extract first frames for all videos to `cover` subdirectory.
+
+    - Mirrors input directory structure under `cover/<W>x<H>` to avoid collisions.
+    - Skips files already extracted unless `overwrite=True`; videos recorded in the manifest with
+      the same size and mtime are skipped without probing.
+    - With `auto_seek > 0`, the frame is chosen by quality scoring within `auto_seek` seconds after `seek`.
+    - With `workers > 1`, videos are processed in a process pool with a bounded number of pending tasks.
+    - With `fused=True`, each video costs one ffmpeg process (no ffprobe); the bucket is the decoded frame size.
+
+    Returns:
+        (messages, summary): a status message per processed file and a throughput summary dict.
+    """
+    base_dir = os.path.abspath(base_dir)
+    if not os.path.isdir(base_dir):
+        return [f"Not a directory: {base_dir}"], {"directory": base_dir, "error": "not a directory"}
+
+    cover_dir = os.path.join(base_dir, "cover")
+    ensure_dir(cover_dir)
+    manifest_path = manifest_path or os.path.join(cover_dir, MANIFEST_NAME)
+    manifest = {} if overwrite else load_manifest(manifest_path)
+    options = {
+        "overwrite": overwrite,
+        "quality": quality,
+        "fmt": fmt,
+        "seek": seek,
+        "auto_seek": auto_seek,
+        "fused": fused,
+        "keyframe_only": keyframe_only,
+    }
+
+    messages: List[str] = []
+    stats = {"scanned": 0, "skipped": 0, "extracted": 0, "failed": 0}
+    failures: List[str] = []
+    pending_updates = 0
+    start = time.perf_counter()
+
+    def handle(result: dict, st: os.stat_result) -> None:
+        nonlocal pending_updates
+        messages.append(result["message"])
+        if result["ok"]:
+            stats["extracted"] += 1
+            manifest[result["path"]] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "output": result["output"]}
+            pending_updates += 1
+            if pending_updates >= MANIFEST_FLUSH_EVERY:
+                save_manifest(manifest_path, manifest)
+                pending_updates = 0
+        else:
+            stats["failed"] += 1
+            failures.append(result["path"])
+
+    def todo() -> Iterator[Tuple[str, str, os.stat_result]]:
+        for in_path, rel, st in iter_videos(base_dir, cover_dir, recursive):
+            stats["scanned"] += 1
+            if not overwrite and is_unchanged(manifest.get(in_path), st):
+                stats["skipped"] += 1
+                continue
+            yield in_path, rel, st
+
+    workers = max(1, int(workers or 1))
+    try:
+        if workers == 1:
+            _init_worker(probe_cache)
+            for in_path, rel, st in todo():
+                handle(process_video(in_path, rel, cover_dir, options), st)
+        else:
+            max_pending = workers * QUEUE_FACTOR
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(probe_cache,)) as executor:
+                pending = {}
+                for in_path, rel, st in todo():
+                    pending[executor.submit(process_video, in_path, rel, cover_dir, options)] = (in_path, st)
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            _collect(future, pending.pop(future), handle)
+                for future in list(pending):
+                    _collect(future, pending.pop(future), handle)
+    finally:
+        save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - start
+    processed = stats["extracted"] + stats["failed"]
+    summary = {
+        "directory": base_dir,
+        "workers": workers,
+        "fused": fused,
+        "keyframe_only": keyframe_only,
+        **stats,
+        "elapsed_sec": round(elapsed, 3),
+        "files_per_sec": round(stats["scanned"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "processed_per_sec": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "failures": failures,
+        "manifest": manifest_path,
+    }
+    return messages, summary
 
 
 def parse_args(argv: List[str]) -> argparse.Namespace:
@@ -207,6 +502,49 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
         default=0.0,
         help="Seek seconds before first frame (e.g., 0.2 to avoid black frames)",
     )
+    parser.add_argument(
+        "--auto-seek",
+        type=float,
+        default=0.0,
+        help=(
+            "Pick the sharpest non-black frame within this many seconds after --seek "
+            "(low-resolution candidates scored in one ffmpeg call); 0 disables"
+        ),
+    )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help=(
+            "One ffmpeg process per video: bucket by the decoded frame size and write the image with PIL "
+            "instead of running ffprobe first"
+        ),
+    )
+    parser.add_argument(
+        "--keyframe-only",
+        action="store_true",
+        help="Decode keyframes only (-skip_frame nokey): use the first keyframe after the seek point, CPU-only",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for probing and extraction (default 1: serial)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="Manifest JSON recording extracted videos (default: <directory>/cover/manifest.json)",
+    )
+    parser.add_argument(
+        "--summary",
+        default=None,
+        help="Also write the JSON throughput summary to this file",
+    )
+    parser.add_argument(
+        "--probe-cache",
+        default=None,
+        help="SQLite file for cached ffprobe results; unchanged videos are not probed again on later runs",
+    )
     return parser.parse_args(argv)
 
 
@@ -220,19 +558,31 @@ def main(argv: List[str]) -> int:
     print(f"Scanning: {os.path.abspath(base_dir)}")
     print(f"Recursive: {recursive} | Overwrite: {overwrite}")
 
-    messages = scan_and_extract(
+    messages, summary = scan_and_extract(
         base_dir,
         overwrite=overwrite,
         recursive=recursive,
         quality=args.quality,
         fmt=args.format,
         seek=args.seek,
+        auto_seek=args.auto_seek,
+        workers=args.workers,
+        manifest_path=args.manifest,
+        probe_cache=args.probe_cache,
+        fused=args.fused,
+        keyframe_only=args.keyframe_only,
     )
     for m in messages:
         print(m)
 
+    summary_json = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(summary_json)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(summary_json)
+
     # Indicate success if at least one file processed or no errors
-    has_error = any(m.lower().startswith("ffmpeg error") or m.lower().startswith("not a directory") for m in messages)
+    has_error = bool(summary.get("failed")) or any(m.lower().startswith("not a directory") for m in messages)
     return 1 if has_error else 0
 
 
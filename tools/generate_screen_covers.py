@@ -2,21 +2,25 @@
 生成横向拼接的封面图片（screen_cover）的小工具。
 
 功能概述：
-- 从一个图片目录中随机选择若干图片（默认每个封面 3 张）。
-- 调用 `youtube.thumbnail.generate_thumbnail(image_paths=..., caption=...)` 生成横向拼接的封面图片（可叠加字幕）。
-- 将拼接后的封面图片保存到图片目录下的 `screen_cover/` 子目录。
+- 从一个或多个图片目录中随机选择若干图片（默认每个封面 4 张）；借助按目录持久化的
+  感知哈希索引（`youtube/image_hash.py`），同一封面内、以及与最近 N 个封面之间避免选入近似重复的图片。
+- 通过 `ThumbnailGenerator.generate_batch` 用进程池批量生成横向拼接的封面图片（可叠加字幕），
+  所有目录的任务放进同一个进程池，一次运行即可用满全部 CPU 核。
+- 将拼接后的封面图片保存到各自图片目录下的 `screen_cover/` 子目录。
 
 命令行参数：
-- `images_dir`：图片目录（必填）。
+- `images_dirs`：图片目录（必填，可传多个，例如多个账号的素材目录）。
 - `--caption`：字幕文本（可选）。
-- `--count`：要生成的封面图片个数（默认 10）。
-- `--per-cover`：每个封面由几张图片组成（默认 3）。
-- `--workers`：并发线程数（默认根据 CPU，通常为 4）。
+- `--count`：每个目录要生成的封面图片个数（默认 10）。
+- `--per-cover`：每个封面由几张图片组成（默认 4）。
+- `--workers`：工作进程数（默认 CPU 核数）。
 - `--seed`：随机种子（可选，便于复现）。
 - `--color`：字幕颜色（默认 yellow）。
+- `--recent`：跨封面去重时参考最近多少个封面（默认 20）。
+- `--dedupe-threshold`：dHash 汉明距离不超过该值视为近似重复（默认 10，0 表示只排除完全相同）。
 
 依赖：
-- 依赖项目内的 `youtube/thumbnail.py`（仅调用其中的 `generate_thumbnail` 进行合成）。
+- 依赖项目内的 `youtube/thumbnail.py`（`ThumbnailGenerator.generate_batch` 进行合成）。
 """
 
 import argparse
@@ -27,7 +31,6 @@ import uuid
 from typing import List
 import shutil
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 # 允许从项目根目录运行 `python tools/generate_screen_covers.py`
@@ -36,9 +39,10 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 try:
-    from youtube.thumbnail import generate_thumbnail  # type: ignore
+    from youtube.thumbnail import ThumbnailGenerator, ThumbnailJob  # type: ignore
+    from youtube.image_hash import DEFAULT_RECENT_COVERS, DEFAULT_THRESHOLD, ImageHashIndex, choose_distinct  # type: ignore
 except Exception as e:
-    print(f"Error importing youtube.thumbnail.generate_thumbnail: {e}")
+    print(f"Error importing youtube.thumbnail: {e}")
     raise
 
 
@@ -68,21 +72,34 @@ def list_images(images_dir: str) -> List[str]:
     return files
 
 
-def choose_images(candidates: List[str], k: int) -> List[str]:
+def choose_images(
+    candidates: List[str],
+    k: int,
+    hashes: dict | None = None,
+    recent: List[int] | None = None,
+    threshold: int = DEFAULT_THRESHOLD,
+) -> List[str]:
     """从候选图片中选择 k 张。
 
-    - 若候选数 >= k，使用 `random.sample` 无重复抽取。
+    - 提供 `hashes`（路径 -> dHash）时，使用 `choose_distinct`：跳过与本封面已选图片、
+      以及 `recent`（最近封面用过的哈希）近似的候选，候选不足时逐级放宽。
+    - 否则若候选数 >= k，使用 `random.sample` 无重复抽取。
     - 若候选数 < k，使用 `random.choices` 允许重复抽取。
 
     Args:
         candidates: 候选图片路径列表。
         k: 选择数量。
+        hashes: 感知哈希，可选。
+        recent: 最近封面使用过的哈希，可选。
+        threshold: 近似判定的汉明距离阈值。
 
     Returns:
         选择的图片路径列表（长度为 k）。
     """
     if not candidates:
         return []
+    if hashes is not None:
+        return choose_distinct(candidates, k, hashes, recent, threshold)
     if len(candidates) >= k:
         return random.sample(candidates, k)
     return random.choices(candidates, k=k)
@@ -100,7 +117,7 @@ def save_stitched_cover(stitched_image_path: str, images_dir: str) -> str:
     """把拼接好的封面图片移动到 `images_dir/screen_cover/` 并返回新路径。
 
     Args:
-        stitched_image_path: `generate_thumbnail` 返回的图片路径。
+        stitched_image_path: 批量任务生成的图片路径。
         images_dir: 用户提供的图片目录路径，用于创建 `screen_cover` 子目录。
 
     Returns:
@@ -120,112 +137,139 @@ def save_stitched_cover(stitched_image_path: str, images_dir: str) -> str:
         return stitched_image_path
 
 
-def generate_one_cover(
-    images_dir: str,
-    image_paths: List[str],
-    caption: str | None,
-    color: str = "yellow",
-) -> str | None:
-    """从若干图片生成一个横向拼接的封面图片并保存到 `screen_cover/`。
-
-    Returns the final saved path or None on failure.
-    """
-    stitched_path = generate_thumbnail(image_paths=image_paths, caption=caption, color=color)
-    if not stitched_path or not os.path.exists(stitched_path):
-        print("Failed to generate stitched cover image.")
-        return None
-
-    out_path = save_stitched_cover(stitched_path, images_dir)
-    return out_path
-
-
 def generate_covers_concurrently(
-    images_dir: str,
-    all_images: List[str],
+    images_dirs: List[str],
+    all_images: dict,
     count: int,
     per_cover: int,
     caption: str | None,
     color: str,
     workers: int,
+    recent_covers: int = DEFAULT_RECENT_COVERS,
+    threshold: int = DEFAULT_THRESHOLD,
 ) -> int:
-    """并发生成封面图片。
+    """用进程池批量生成多个目录的封面图片。
+
+    - 先在主进程预生成每个任务的图片选择，避免并发影响随机数状态。
+    - 选图前增量更新每个目录的感知哈希索引（只哈希新增或变化的图片），选图避开近似重复
+      （包括本次运行中排在前面的封面）；只有成功生成的封面才记入索引，供之后的运行跨封面去重。
+    - 所有目录的任务一起交给 `ThumbnailGenerator.generate_batch`，每个工作进程只加载一次字体。
 
-    - 先在主线程预生成每个任务的图片选择，避免并发影响随机数状态。
-    - 使用线程池并发执行 `generate_one_cover`。
+    Args:
+        images_dirs: 图片目录列表。
+        all_images: 目录 -> 该目录候选图片列表。
 
     Returns:
         成功生成的封面数量。
     """
-    tasks: List[List[str]] = [choose_images(all_images, per_cover) for _ in range(count)]
+    jobs: List[ThumbnailJob] = []
+    job_dirs: dict = {}
+    indexes: dict = {}
+    for images_dir in images_dirs:
+        index = ImageHashIndex(images_dir, recent_covers=recent_covers)
+        indexes[images_dir] = index
+        started = time.perf_counter()
+        hashed = index.update(all_images[images_dir])
+        if hashed:
+            print(f"Hashed {hashed} new or changed images in {images_dir} ({time.perf_counter() - started:.1f}s).")
+        hashes = index.hashes(all_images[images_dir])
+        # 本次运行已排队封面的哈希：同批封面之间也去重，但在生成成功前不写入索引
+        queued: List[List[int]] = []
+        for _ in range(count):
+            recent = index.recent_hashes() + [h for cover in queued[-recent_covers:] for h in cover]
+            picks = choose_images(all_images[images_dir], per_cover, hashes, recent, threshold)
+            queued.append([hashes[p] for p in picks if p in hashes])
+            job = ThumbnailJob(kind="images", image_paths=picks, caption=caption, color=color)
+            jobs.append(job)
+            job_dirs[job.job_id] = images_dir
+        # 保存新计算的哈希
+        index.save()
+    total = len(jobs)
     # 预览任务队列
-    for i, picks in enumerate(tasks, start=1):
-        print(f"[queued {i}/{count}] Using images: {', '.join(os.path.basename(p) for p in picks)}")
+    for i, job in enumerate(jobs, start=1):
+        print(f"[queued {i}/{total}] Using images: {', '.join(os.path.basename(p) for p in job.image_paths)}")
 
     ok_count = 0
-    workers = max(1, int(workers))
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {
-            executor.submit(generate_one_cover, images_dir, picks, caption, color): i
-            for i, picks in enumerate(tasks, start=1)
-        }
-        for future in as_completed(future_map):
-            idx = future_map[future]
-            try:
-                result = future.result()
-                if result:
-                    ok_count += 1
-                    print(f"[done {idx}/{count}] Generated cover: {result}")
-                else:
-                    print(f"[done {idx}/{count}] Failed to generate cover")
-            except Exception as e:
-                print(f"[done {idx}/{count}] Exception: {e}")
+    started = time.perf_counter()
+    for done, result in enumerate(ThumbnailGenerator().generate_batch(jobs, workers=workers), start=1):
+        job_id = result.job.job_id
+        if result.path and os.path.exists(result.path):
+            out_path = save_stitched_cover(result.path, job_dirs[job_id])
+            indexes[job_dirs[job_id]].remember_cover(result.job.image_paths)
+            ok_count += 1
+            print(f"[done {done}/{total}] ({result.elapsed:.2f}s, pid {result.worker_pid}) Generated cover: {out_path}")
+        else:
+            print(f"[done {done}/{total}] ({result.elapsed:.2f}s) Failed to generate cover: {result.error}")
+    for index in indexes.values():
+        index.save()
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        print(f"Generated {ok_count} covers in {elapsed:.1f}s ({ok_count / elapsed:.2f} covers/s).")
     return ok_count
 
 
 def main() -> None:
     """命令行入口：批量生成横向拼接的封面图片（screen_cover）。"""
-    parser = argparse.ArgumentParser(description="Generate stitched cover images from a directory of photos.")
-    parser.add_argument("images_dir", help="图片目录")
+    parser = argparse.ArgumentParser(description="Generate stitched cover images from one or more directories of photos.")
+    parser.add_argument("images_dirs", nargs="+", help="图片目录，可传多个")
     parser.add_argument("--caption", default=None, help="字幕文本")
-    parser.add_argument("--count", type=int, default=10, help="生成的封面图片个数，默认 10")
+    parser.add_argument("--count", type=int, default=10, help="每个目录生成的封面图片个数，默认 10")
     parser.add_argument("--per-cover", type=int, default=4, help="每个封面由几张图片组成，默认 4")
     parser.add_argument("--seed", type=int, default=int(time.time()), help="随机种子，可选")
     parser.add_argument("--color", default="yellow", help="字幕颜色，默认 yellow")
-    workers_default = max(1, min(8, (os.cpu_count() or 1)))
-    parser.add_argument("--workers", type=int, default=workers_default, help=f"并发线程数，默认 {workers_default}")
+    parser.add_argument("--recent", type=int, default=DEFAULT_RECENT_COVERS, help=f"跨封面去重参考最近多少个封面，默认 {DEFAULT_RECENT_COVERS}")
+    parser.add_argument(
+        "--dedupe-threshold",
+        type=int,
+        default=DEFAULT_THRESHOLD,
+        help=f"dHash 汉明距离不超过该值视为近似重复，默认 {DEFAULT_THRESHOLD}",
+    )
+    workers_default = max(1, os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=workers_default, help=f"工作进程数，默认 {workers_default}")
 
     args = parser.parse_args()
 
-    images_dir = os.path.abspath(args.images_dir)
-    if not os.path.isdir(images_dir):
-        print(f"Not a directory: {images_dir}")
-        sys.exit(1)
-
     if args.seed is not None:
         random.seed(args.seed)
 
-    all_images = list_images(images_dir)
-    if not all_images:
-        print(f"No images found in {images_dir}")
+    images_dirs: List[str] = []
+    all_images: dict = {}
+    for raw_dir in args.images_dirs:
+        images_dir = os.path.abspath(raw_dir)
+        if not os.path.isdir(images_dir):
+            print(f"Not a directory: {images_dir}")
+            continue
+        images = list_images(images_dir)
+        if not images:
+            print(f"No images found in {images_dir}")
+            continue
+        images_dirs.append(images_dir)
+        all_images[images_dir] = images
+        print(f"Found {len(images)} images in {images_dir}.")
+
+    if not images_dirs:
         sys.exit(1)
 
+    total = args.count * len(images_dirs)
     print(
-        f"Found {len(all_images)} images. Generating {args.count} covers, "
+        f"Generating {args.count} covers for each of {len(images_dirs)} directories, "
         f"{args.per_cover} images per cover, workers={args.workers}."
     )
 
     generated = generate_covers_concurrently(
-        images_dir=images_dir,
+        images_dirs=images_dirs,
         all_images=all_images,
         count=args.count,
         per_cover=args.per_cover,
         caption=args.caption,
         color=args.color,
         workers=args.workers,
+        recent_covers=args.recent,
+        threshold=args.dedupe_threshold,
     )
 
-    print(f"Done. Successfully generated {generated}/{args.count} covers.")
+    print(f"Done. Successfully generated {generated}/{total} covers.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,10 +6,12 @@ import os
 import platform
 import signal
 import logging
-from typing import Optional
+from typing import List, Optional, Union
 from youtube.client import YouTubeClient
-from youtube.thumbnail import generate_stream_thumbnail, add_caption_to_image
-from streamer import Streamer
+from youtube.thumbnail import render_stream_thumbnail
+from youtube.thumbnail_cache import ThumbnailCache, get_captioned_thumbnail
+from youtube.broadcast_metrics import BroadcastMetrics, ProcessSampler
+from streamer import MODE_AUTO, STREAM_MODES, Streamer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -40,7 +42,7 @@ def shutdown_after_duration(duration_seconds, duration_hours, stop_event=None):
 
 def run_broadcast(
     auth_dir: str,
-    video_file: str,
+    video_file: Union[str, List[str]],
     title: str = "My Live Stream",
     description: str = "",
     privacy_status: str = "unlisted",
@@ -49,10 +51,23 @@ def run_broadcast(
     thumbnail: Optional[str] = None,
     thumbnail_caption: str = "",
     thumbnail_color: str = "yellow",
-    log_file: Optional[str] = None
+    log_file: Optional[str] = None,
+    stream_mode: str = MODE_AUTO,
+    shuffle: bool = False,
+    account_name: Optional[str] = None,
+    metrics_db: Optional[str] = None
 ):
     """
     Main entry point for running a broadcast programmatically.
+
+    `stream_mode` is "auto" (push with `-c copy` when the source is already H.264/AAC with an
+    ingest-friendly GOP and bitrate, otherwise transcode with libx264), "copy" or "transcode".
+
+    `video_file` may be a list: the files are pushed as one playlist (optionally shuffled) through a
+    single ffmpeg process, rotating through the material for the whole broadcast.
+
+    With `metrics_db` the process publishes its live metrics (ffmpeg progress, restarts, YouTube
+    lifecycle status, CPU/RSS) there under its PID, see youtube/broadcast_metrics.py.
     """
     # Configure file logging if requested
     if log_file:
@@ -63,8 +78,35 @@ def run_broadcast(
         except Exception as e:
             logger.error(f"Failed to setup log file {log_file}: {e}")
 
+    video_files = [video_file] if isinstance(video_file, str) else list(video_file)
+    if not video_files:
+        logger.error("No video files to stream.")
+        return
+
     # Use a threading Event to control the loop
     stop_event = threading.Event()
+
+    metrics = BroadcastMetrics(metrics_db) if metrics_db else None
+    sampler = ProcessSampler()
+    started_at = time.time()
+    broadcast_id = None
+    streamer = None
+
+    def publish_metrics(lifecycle_status):
+        if metrics is None:
+            return
+        try:
+            data = streamer.stats() if streamer else {}
+            # time.monotonic() values mean nothing outside this process
+            data.pop('updated_at', None)
+            data.pop('advanced_at', None)
+            data['lifecycle_status'] = lifecycle_status
+            data['title'] = title
+            data['process'] = sampler.sample(os.getpid())
+            data['ffmpeg'] = sampler.sample(data.get('pid'))
+            metrics.publish(os.getpid(), account_name, broadcast_id, started_at, data)
+        except Exception as e:
+            logger.error(f"Failed to publish broadcast metrics: {e}")
     
     credentials_file = os.path.join(auth_dir, "client_secret.json")
     token_file = os.path.join(auth_dir, "token.json")
@@ -129,36 +171,32 @@ def run_broadcast(
     # Thumbnail handling
     logger.info("Preparing thumbnail...")
     
+    thumbnail_cache = ThumbnailCache.for_account(auth_dir)
+
     def prepare_thumbnail_with_caption(video_path, base_thumbnail, caption, color):
+        """Returns a cached thumbnail path, or an in-memory JPEG generated from the video."""
         caption_text = caption.strip() if caption else ""
         if caption_text and base_thumbnail and os.path.exists(base_thumbnail):
-            root, ext = os.path.splitext(base_thumbnail)
-            ext = ext or ".jpg"
-            captioned_path = f"{root}_captioned{ext}"
             try:
-                import shutil
-                shutil.copy(base_thumbnail, captioned_path)
-                result = add_caption_to_image(captioned_path, caption_text, color=color)
+                result = get_captioned_thumbnail(thumbnail_cache, base_thumbnail, caption_text, color=color)
                 if result: return result
             except Exception as e:
                 logger.error(f"Error preparing captioned thumbnail: {e}")
 
-        generated = generate_stream_thumbnail(video_path, caption_text if caption_text else None, color=color)
-        return generated
+        return render_stream_thumbnail(video_path, caption_text if caption_text else None, color=color)
 
-    if thumbnail and os.path.exists(thumbnail):
+    if thumbnail and os.path.exists(thumbnail) and not (thumbnail_caption or "").strip():
         thumbnail_path = thumbnail
     else:
-        thumbnail_path = prepare_thumbnail_with_caption(video_file, thumbnail, thumbnail_caption, thumbnail_color)
+        thumbnail_path = prepare_thumbnail_with_caption(video_files[0], thumbnail, thumbnail_caption, thumbnail_color)
 
     if thumbnail_path:
         try:
             client.set_thumbnail(broadcast_id, thumbnail_path)
-            logger.info(f"Thumbnail set: {thumbnail_path}")
-            if thumbnail_path != thumbnail: # If generated or captioned copy
-                 try:
-                    os.remove(thumbnail_path)
-                 except: pass
+            if isinstance(thumbnail_path, str):
+                logger.info(f"Thumbnail set: {thumbnail_path}")
+            else:
+                logger.info(f"Thumbnail set from memory ({len(thumbnail_path.getbuffer())} bytes)")
         except Exception as e:
             logger.error(f"Failed to set thumbnail: {e}")
     else:
@@ -167,7 +205,18 @@ def run_broadcast(
     stream_url = f"{stream['cdn']['ingestionInfo']['ingestionAddress']}/{stream['cdn']['ingestionInfo']['streamName']}"
     
     time.sleep(3)
-    streamer = Streamer(stream_url, video_file)
+    streamer = Streamer(
+        stream_url,
+        video_files,
+        mode=stream_mode,
+        shuffle=shuffle,
+        min_duration=duration * 3600 if duration > 0 else None,
+        logger=logger
+    )
+    if len(video_files) > 1:
+        logger.info(f"Streaming a playlist of {len(video_files)} files (shuffle={shuffle})")
+    stream_path, stream_reason = streamer.plan()
+    logger.info(f"Stream path: {stream_path} ({stream_reason})")
     logger.info(f"Starting stream to {stream_url}")
     streamer.start_streaming()
 
@@ -178,6 +227,7 @@ def run_broadcast(
         if stop_event.is_set(): break
         status = client.get_live_broadcast_status(broadcast_id)
         logger.info(f"Status: {status}")
+        publish_metrics(status)
         if status == 'live':
             is_live = True
             logger.info(f"Broadcast {broadcast_id} is live.")
@@ -187,6 +237,8 @@ def run_broadcast(
     if not is_live and not stop_event.is_set():
         logger.error("Timeout waiting for live status.")
         streamer.stop_streaming()
+        if metrics is not None:
+            metrics.remove(os.getpid())
         try:
             client.delete_live_broadcast(broadcast_id)
         except: pass
@@ -206,9 +258,14 @@ def run_broadcast(
     try:
         while not stop_event.is_set():
             status = client.get_live_broadcast_status(broadcast_id)
+            publish_metrics(status)
             if status != 'live':
                 logger.warning(f"Broadcast no longer live (status: {status}). Stopping.")
                 break
+            stats = streamer.stats()
+            if stats.get('gave_up'):
+                logger.error(f"ffmpeg kept failing ({stats['restarts']} restarts). Stopping.")
+                break
             time.sleep(15)
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received.")
@@ -219,6 +276,8 @@ def run_broadcast(
         logger.info("Stopping stream and closing broadcast...")
         stop_event.set() # Ensure monitor thread knows
         streamer.stop_streaming()
+        if metrics is not None:
+            metrics.remove(os.getpid())
         try:
             client.close_live_broadcast(broadcast_id)
             logger.info("Broadcast closed.")
@@ -228,7 +287,8 @@ def run_broadcast(
 def main():
     parser = argparse.ArgumentParser(description="YouTube Live Streamer")
     parser.add_argument("--auth_dir", required=True, help="Directory for authentication files (client_secret.json and token.json).")
-    parser.add_argument("--video_file", required=True, help="Path to the video file to stream.")
+    parser.add_argument("--video_file", required=True, nargs="+", help="Path to the video file to stream; several files are streamed as one playlist.")
+    parser.add_argument("--shuffle", action="store_true", help="Shuffle the playlist.")
     parser.add_argument("--title", default="My Live Stream", help="Title of the live stream.")
     parser.add_argument("--description", default="", help="Description of the live stream.")
     parser.add_argument("--privacy_status", default="unlisted", help="Privacy status of the live stream (public, private, or unlisted).")
@@ -237,6 +297,8 @@ def main():
     parser.add_argument("--thumbnail", type=str, help="Optional path to a custom thumbnail image")
     parser.add_argument("--thumbnail_caption", type=str, default="", help="Caption text for the thumbnail")
     parser.add_argument("--thumbnail_color", type=str, default="yellow", help="Caption color")
+    parser.add_argument("--metrics_db", type=str, default=None, help="SQLite file to publish live metrics to (see youtube/broadcast_metrics.py)")
+    parser.add_argument("--stream_mode", choices=STREAM_MODES, default=MODE_AUTO, help="auto: copy ingest-ready sources, otherwise transcode; copy; transcode")
     args = parser.parse_args()
 
     run_broadcast(
@@ -249,7 +311,10 @@ def main():
         duration=args.duration,
         thumbnail=args.thumbnail,
         thumbnail_caption=args.thumbnail_caption,
-        thumbnail_color=args.thumbnail_color
+        thumbnail_color=args.thumbnail_color,
+        stream_mode=args.stream_mode,
+        shuffle=args.shuffle,
+        metrics_db=args.metrics_db
     )
 
 if __name__ == "__main__":
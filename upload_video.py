@@ -5,15 +5,24 @@ import re
 from typing import List, Optional, Tuple, Dict, Any
 from youtube.client import YouTubeClient
 from youtube.thumbnail import generate_stream_thumbnail, add_caption_to_image, get_video_duration
+from youtube.thumbnail_cache import ThumbnailCache, get_captioned_thumbnail
 
 
-def prepare_thumbnail_with_caption(video_path: str, base_thumbnail: Optional[str], caption: str, color: str) -> Tuple[Optional[str], bool]:
+def prepare_thumbnail_with_caption(
+    video_path: str,
+    base_thumbnail: Optional[str],
+    caption: str,
+    color: str,
+    cache: Optional[ThumbnailCache] = None,
+) -> Tuple[Optional[str], bool]:
     """Prepare a thumbnail with an optional caption overlay.
 
     Behavior:
     - If `base_thumbnail` is a directory, randomly pick one image (jpg/jpeg/png/webp) from it.
     - If caption is empty and a base image exists, return it directly (no mutation).
     - If a base image exists and caption provided, copy it and overlay caption (non-destructive).
+      With a `cache`, the captioned copy lives in the content-addressed thumbnail cache and
+      repeat requests reuse it without rendering; cached files are never reported as generated.
     - If no base image usable, generate a thumbnail from the video with caption.
 
     Returns:
@@ -26,6 +35,7 @@ def prepare_thumbnail_with_caption(video_path: str, base_thumbnail: Optional[str
       base_thumbnail: An existing thumbnail image path or a directory containing images.
       caption: The text to overlay on the thumbnail.
       color: The color for caption text (e.g., 'yellow', 'red', 'blue').
+      cache: Optional thumbnail cache (see `youtube/thumbnail_cache.py`).
     """
     # If a directory is provided, randomly select one image
     try:
@@ -51,7 +61,15 @@ def prepare_thumbnail_with_caption(video_path: str, base_thumbnail: Optional[str
         return base_thumbnail, False
 
     # If a thumbnail exists, copy and overlay caption to avoid mutating original
-    if base_thumbnail and os.path.exists(base_thumbnail) and caption:
+    if base_thumbnail and os.path.exists(base_thumbnail) and caption and cache is not None:
+        try:
+            result = get_captioned_thumbnail(cache, base_thumbnail, caption, color=color)
+            if result:
+                return result, False
+            print("Failed to overlay caption on provided thumbnail. Will attempt to generate from video.")
+        except Exception as e:
+            print(f"Error preparing captioned thumbnail from provided file: {e}")
+    elif base_thumbnail and os.path.exists(base_thumbnail) and caption:
         root, ext = os.path.splitext(base_thumbnail)
         ext = ext or ".jpg"
         captioned_path = f"{root}_captioned{ext}"
@@ -84,6 +102,7 @@ def resolve_thumbnail_for_video(
     provided_thumbnail: Optional[str],
     caption: str,
     color: str,
+    cache: Optional[ThumbnailCache] = None,
 ) -> Tuple[Optional[str], bool]:
     """Resolve final thumbnail for a given video.
 
@@ -122,7 +141,7 @@ def resolve_thumbnail_for_video(
     if duration_sec is not None and duration_sec > 180:
         if provided_thumbnail:
             final_thumb, final_thumb_generated = prepare_thumbnail_with_caption(
-                video_path, provided_thumbnail, caption, color
+                video_path, provided_thumbnail, caption, color, cache=cache
             )
         else:
             final_thumb = thumbnail_preselected
@@ -236,6 +255,7 @@ def upload_video_once(
         thumbnail,
         thumbnail_caption,
         thumbnail_color,
+        cache=ThumbnailCache.for_account(auth_dir),
     )
     print(f"Thumbnail path: {final_thumb}")
 
@@ -17,6 +17,7 @@ from models import Account, AccountCreate, UpdateSchedule, AddCopywriting, Copyw
 from store import load_accounts, save_account, get_account, delete_account, get_account_auth_dir
 from service_ftp import create_ftp_account, delete_ftp_account
 from service_youtube import start_scheduler, refresh_scheduler
+from youtube.fonts import preload_fonts
 import settings
 
 # Setup logging
@@ -362,4 +363,6 @@ def update_schedule(
 
 @app.on_event("startup")
 def startup_event():
+    # Load caption fonts once so scheduled jobs (and forked broadcast processes) reuse them
+    preload_fonts()
     start_scheduler()
@@ -6,11 +6,14 @@ from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 # Add parent directory to path to import upload_video
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from upload_video import upload_video_once
+from youtube.media_probe import configure_media_probe
+from youtube.cover_pool import VIDEO_EXTS, CoverPool, CoverProducer, list_files
 
 from store import load_accounts, save_account, get_account_auth_dir
 from models import Account
@@ -18,6 +21,9 @@ import settings
 
 logger = logging.getLogger(__name__)
 
+# 发布任务共享同一个持久化的 ffprobe 结果缓存
+configure_media_probe(settings.MEDIA_PROBE_DB)
+
 # Config for where FTP users are located on disk
 # In production, this should match FTP_BASE in create_ftpuser.sh
 executors = {
@@ -25,6 +31,9 @@ executors = {
 }
 scheduler = BackgroundScheduler(executors=executors)
 
+# 后台补齐各视频目录下 screen_cover/ 的封面，发布任务只取现成的封面，不在任务内生成
+cover_producer = CoverProducer(workers=settings.COVER_POOL_WORKERS)
+
 LOG_DIR = os.path.join(os.path.dirname(__file__), "data", "published_log")
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
@@ -66,6 +75,43 @@ def get_video_dir(ftp_username: str) -> str:
     # In a real deployment, this path must be accessible by this service
     return os.path.join(settings.FTP_ROOT_DIR, ftp_username, "video")
 
+def get_pending_video_dirs(video_dir: str) -> list:
+    # 获取视频目录下的非_published结尾的目录
+    if not os.path.exists(video_dir):
+        return []
+    return [os.path.join(video_dir, d) for d in os.listdir(video_dir)
+            if os.path.isdir(os.path.join(video_dir, d)) and not d.endswith("_published")]
+
+def screen_cover_pools(account: Account) -> list:
+    return [
+        CoverPool(
+            cover_dir=os.path.join(d, "screen_cover"),
+            videos=list_files(d, VIDEO_EXTS),
+            low_water=settings.COVER_POOL_LOW_WATER,
+        )
+        for d in get_pending_video_dirs(get_video_dir(account.ftp_username))
+    ]
+
+def replenish_cover_pools(account_names=None):
+    """
+    Queues every pending video directory's screen_cover/ that is below the low-water mark;
+    never waits for generation.
+    """
+    if settings.COVER_POOL_LOW_WATER <= 0:
+        return 0
+    accounts = load_accounts()
+    if account_names is None:
+        account_names = list(accounts.keys())
+    pools = []
+    for name in account_names:
+        account = accounts.get(name)
+        if account:
+            pools.extend(screen_cover_pools(account))
+    queued = cover_producer.request(pools)
+    if queued:
+        logger.info(f"Queued cover generation for {queued} screen_cover pools")
+    return queued
+
 def publish_video_task(account_name: str):
     start_time = datetime.now()
     logger.info(f"Starting publish task for account: {account_name}")
@@ -106,11 +152,7 @@ def publish_video_task(account_name: str):
         logger.warning(f"Video directory {video_dir} does not exist. Assuming dev env or mount issue.")
         # For dev testing, maybe use a temp dir or just log
         # return 
-    # 获取视频目录下的非_published结尾的目录
-    video_dirs = []
-    if os.path.exists(video_dir):
-        video_dirs = [os.path.join(video_dir, d) for d in os.listdir(video_dir) 
-                      if os.path.isdir(os.path.join(video_dir, d)) and not d.endswith("_published")]
+    video_dirs = get_pending_video_dirs(video_dir)
     
     try:
         logger.info(f"Calling upload_video_once for {account_name} with title: {copywriting_title}")
@@ -143,6 +185,9 @@ def publish_video_task(account_name: str):
         duration = str(datetime.now() - start_time)
         append_publish_log(account_name, "ERROR", copywriting_title if copywriting_title else "-", str(e), duration)
 
+    # Top the pools up in the background for the next uploads
+    replenish_cover_pools([account_name])
+
 def refresh_scheduler():
     """
     Reloads all schedules from the store.
@@ -166,6 +211,15 @@ def refresh_scheduler():
                 except ValueError:
                     logger.error(f"Invalid time format for {name}: {time_str}")
 
+    if settings.COVER_POOL_LOW_WATER > 0:
+        scheduler.add_job(
+            replenish_cover_pools,
+            IntervalTrigger(minutes=settings.COVER_POOL_CHECK_MINUTES),
+            id="cover_pool",
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+
 def start_scheduler():
     if not scheduler.running:
         scheduler.start()
@@ -53,6 +53,18 @@ if not os.path.isabs(_ftp_root_raw):
 else:
     FTP_ROOT_DIR = _ftp_root_raw
 
+# 媒体探测结果缓存（SQLite），默认放在 FTP 根目录旁，避免调度器反复 ffprobe 未变化的视频
+MEDIA_PROBE_DB = os.getenv("MEDIA_PROBE_DB", _config.get("MEDIA_PROBE_DB", os.path.join(os.path.dirname(FTP_ROOT_DIR), "media_probe.sqlite3")))
+
 # FTP下的子目录
 SUBDIRS = _config.get("SUBDIRS", "")
 
+# 后台封面池：封面目录中的封面少于低水位时在后台补齐（0 表示关闭）
+COVER_POOL_LOW_WATER = int(os.getenv("COVER_POOL_LOW_WATER", _config.get("COVER_POOL_LOW_WATER", 5)))
+
+# 封面生成的工作进程数（与直播/上传共用 CPU，默认只占一个核）
+COVER_POOL_WORKERS = int(os.getenv("COVER_POOL_WORKERS", _config.get("COVER_POOL_WORKERS", 1)))
+
+# 检查封面池的间隔（分钟）
+COVER_POOL_CHECK_MINUTES = int(os.getenv("COVER_POOL_CHECK_MINUTES", _config.get("COVER_POOL_CHECK_MINUTES", 10)))
+
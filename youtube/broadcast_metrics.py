@@ -0,0 +1,191 @@
+"""
+直播进程的实时指标存储。
+
+每场直播都在调度器启动的独立 `multiprocessing.Process` 中运行，门户原先只能从日志里看到 PID。
+`BroadcastMetrics` 用一个本地 SQLite 文件（WAL 模式）在进程之间共享指标：
+- 直播进程按 PID 定期覆盖写入自己的一行：ffmpeg 的 fps、码率、速度、重启次数、运行时长，
+  YouTube 的 lifeCycleStatus，以及直播进程与 ffmpeg 的 CPU 占用和 RSS；
+- 门户通过 `active()` 读取仍在运行的直播，已退出或长时间未更新的行会被忽略并清理。
+
+CPU/RSS 从 /proc 读取，无需额外依赖；在没有 /proc 的系统上这两项为 None。
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+# 超过这么多秒没有更新的记录视为已失效（直播进程至少每 15 秒写一次）
+STALE_SECONDS = 90
+
+# ffmpeg 速度低于该值即视为跟不上实时（与 streamer.MIN_SPEED 一致）
+LAGGING_SPEED = 0.9
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def pid_alive(pid: int | None) -> bool:
+    """`pid` 对应的进程是否仍然存在。"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def read_process_usage(pid: int | None) -> tuple[float, int] | None:
+    """返回进程累计 CPU 时间（秒）与 RSS（字节）；无法读取 /proc 时返回 None。"""
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            statm = f.read().split()
+    except OSError:
+        return None
+    # comm 字段可能含空格，从最后一个 ")" 之后开始按空格切分；utime/stime 是第 14、15 个字段
+    fields = stat.rsplit(')', 1)[-1].split()
+    try:
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        rss = int(statm[1]) * _PAGE_SIZE
+    except (IndexError, ValueError):
+        return None
+    return cpu_seconds, rss
+
+
+class ProcessSampler:
+    """按两次采样之间的 CPU 时间差计算进程的 CPU 占用（100 表示占满一个核）。"""
+
+    def __init__(self):
+        self._last: dict = {}
+
+    def sample(self, pid: int | None) -> dict:
+        usage = read_process_usage(pid)
+        if usage is None:
+            return {'cpu_percent': None, 'rss_mb': None}
+        cpu_seconds, rss = usage
+        now = time.monotonic()
+        cpu_percent = None
+        last = self._last.get(pid)
+        if last and now > last[0]:
+            cpu_percent = round(max(0.0, cpu_seconds - last[1]) / (now - last[0]) * 100, 1)
+        self._last[pid] = (now, cpu_seconds)
+        return {'cpu_percent': cpu_percent, 'rss_mb': round(rss / (1024 * 1024), 1)}
+
+
+class BroadcastMetrics:
+    """直播指标的 SQLite 存储，可在多个进程中同时使用。
+
+    参数：
+        db_path (str): SQLite 文件路径。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作单独连接，直播进程与门户进程共享同一个数据库文件
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS broadcast_metrics ('
+                    ' pid INTEGER PRIMARY KEY,'
+                    ' account TEXT,'
+                    ' broadcast_id TEXT,'
+                    ' started_at REAL NOT NULL,'
+                    ' updated_at REAL NOT NULL,'
+                    ' metrics TEXT NOT NULL)'
+                )
+        except sqlite3.Error as e:
+            print(f"Broadcast metrics disabled ({self.db_path}): {e}")
+            self.db_path = None
+
+    def publish(self, pid: int, account: str | None, broadcast_id: str | None, started_at: float, metrics: dict) -> None:
+        """写入（覆盖）`pid` 这场直播的最新指标。"""
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO broadcast_metrics (pid, account, broadcast_id, started_at, updated_at, metrics)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (pid, account, broadcast_id, started_at, time.time(), json.dumps(metrics, ensure_ascii=False)),
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing broadcast metrics: {e}")
+
+    def remove(self, pid: int) -> None:
+        """直播结束时删除其记录。"""
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM broadcast_metrics WHERE pid = ?', (pid,))
+        except sqlite3.Error as e:
+            print(f"Error removing broadcast metrics: {e}")
+
+    def active(self, stale_seconds: float = STALE_SECONDS) -> list[dict]:
+        """
+        返回仍在运行的直播，跟不上实时或不在 live 状态的排在前面。
+
+        进程已退出或超过 `stale_seconds` 未更新的记录会被删除。
+        """
+        if not self.db_path:
+            return []
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    'SELECT pid, account, broadcast_id, started_at, updated_at, metrics FROM broadcast_metrics'
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading broadcast metrics: {e}")
+            return []
+
+        now = time.time()
+        result, dead = [], []
+        for pid, account, broadcast_id, started_at, updated_at, raw in rows:
+            if now - updated_at > stale_seconds or not pid_alive(pid):
+                dead.append(pid)
+                continue
+            entry = json.loads(raw)
+            # streamer.stats() 中的 pid 是 ffmpeg 的，本表的 pid 是直播进程的
+            entry['ffmpeg_pid'] = entry.pop('pid', None)
+            speed = entry.get('speed')
+            entry.update({
+                'pid': pid,
+                'account': account,
+                'broadcast_id': broadcast_id,
+                'started_at': started_at,
+                # uptime 为 ffmpeg 首次启动以来的推流时长，elapsed 为直播进程启动以来的时长
+                'elapsed': now - started_at,
+                'seconds_since_update': now - updated_at,
+                'lagging': bool(
+                    entry.get('gave_up')
+                    or not entry.get('running', True)
+                    or (speed is not None and speed < LAGGING_SPEED)
+                ),
+            })
+            result.append(entry)
+
+        for pid in dead:
+            self.remove(pid)
+        result.sort(key=lambda e: (
+            not e['lagging'],
+            e.get('lifecycle_status') == 'live',
+            e.get('speed') if e.get('speed') is not None else float('inf'),
+        ))
+        return result
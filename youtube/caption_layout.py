@@ -0,0 +1,442 @@
+"""
+字幕排版引擎：字形度量缓存 + 一次性排版。
+
+`add_caption_to_image` 原先在换行、测量文本块以及每一次绘制（阴影、四次加粗偏移、描边）
+时都会对每个字符重新调用 `draw.textbbox`，长中文标题一张封面要做上千次 FreeType 测量。
+
+本模块提供：
+- `GlyphMetricsCache`：按 (字体, 字号, 文本) 缓存像素宽度的进程级 LRU 缓存，跨调用共享；
+- `layout_caption`：一次性计算换行结果与每个字形的 x 偏移，得到 `CaptionLayout`；
+  支持两种排版后端：
+  - `"glyph"`（默认）：逐字符定位，每个字符单独绘制（原有效果）；
+  - `"line"`：整行交给 Pillow 的排版引擎（有 libraqm 时走 raqm，否则为 basic 布局）
+    一次绘制，保留字距调整（kerning）；只有需要中日韩字间距的行才退回逐字符定位；
+- `fit_caption_layout`：二分查找排版后能放进给定区域的最大字号，每次试排只做测量
+  （复用字形度量缓存），不做任何绘制；
+- `draw_caption_layout`：按既有排版结果绘制，多次绘制复用同一份排版，不再做任何测量；
+- `render_caption_tile`：只栅格化一次文字蒙版，由蒙版派生阴影与加粗，描边与文字本体直接画在图块上，
+  输出紧贴文字包围盒的 RGBA 图块，避免在整张原图大小的图层上重复绘制六遍。
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .text_shaping import clear_caches as clear_shaping_caches, cjk_letter_spacing, line_has_cjk, line_letter_spacing, tokenize_caption
+
+# 缓存条目上限（字形 + 单词 + 行高），超出后按最近最少使用淘汰
+DEFAULT_CACHE_SIZE = 16384
+
+# 排版后端
+LAYOUT_GLYPH = "glyph"
+LAYOUT_LINE = "line"
+LAYOUT_BACKENDS = (LAYOUT_GLYPH, LAYOUT_LINE)
+
+# 自动字号的默认搜索范围（像素）
+FIT_MIN_FONT_SIZE = 48
+FIT_MAX_FONT_SIZE = 320
+
+# 仅用于测量的画布；ImageDraw.textbbox 不会修改图像内容
+_MEASURE_DRAW = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+def _font_key(font) -> tuple:
+    """返回字体在缓存中的标识：优先使用 (路径, 字号, face 索引)，否则退回对象 id。"""
+    path = getattr(font, "path", None)
+    if isinstance(path, str):
+        return (path, getattr(font, "size", None), getattr(font, "index", 0))
+    return ("id", id(font))
+
+
+class GlyphMetricsCache:
+    """线程安全的文本宽度 LRU 缓存，键为 (字体标识, 文本)。"""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _store(self, key: tuple, value: int) -> None:
+        with self._lock:
+            self.misses += 1
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def text_width(self, font, text: str, fallback: int) -> int:
+        """返回 `text` 的像素宽度（与 `draw.textbbox` 一致），测量失败时返回 `fallback`。"""
+        key = (_font_key(font), "w", text)
+        value = self._lookup(key)
+        if value is None:
+            try:
+                bbox = _MEASURE_DRAW.textbbox((0, 0), text, font=font)
+                value = bbox[2] - bbox[0]
+            except Exception:
+                value = int(fallback)
+            self._store(key, value)
+        return value
+
+    def line_height(self, font, fallback: int) -> int:
+        """返回典型行高（以 "Hg" 的包围盒高度计），测量失败时返回 `fallback`。"""
+        key = (_font_key(font), "h", "Hg")
+        value = self._lookup(key)
+        if value is None:
+            try:
+                bbox = _MEASURE_DRAW.textbbox((0, 0), "Hg", font=font)
+                value = bbox[3] - bbox[1]
+            except Exception:
+                value = int(fallback)
+            self._store(key, value)
+        return value
+
+    def clear(self) -> None:
+        """清空缓存与命中统计。"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 进程级共享缓存
+glyph_metrics_cache = GlyphMetricsCache()
+
+
+@dataclass
+class LayoutLine:
+    """排版后的一行：文本、行宽、字间距以及每段文本相对行首的 x 偏移。
+
+    `glyphs` 中每一项为一次 `draw.text` 调用：逐字符排版时是单个字符，整行排版时是整行文本。
+    """
+
+    text: str
+    width: int
+    letter_spacing: int
+    glyphs: list = field(default_factory=list)  # [(x_offset, text), ...]
+
+
+@dataclass
+class CaptionLayout:
+    """整段字幕的排版结果，可被多次绘制复用。"""
+
+    lines: list
+    width: int
+    height: int
+    line_height: int
+    spacing: int
+
+
+def wrap_caption(
+    font,
+    text: str,
+    max_width: int,
+    fontsize: int,
+    cache: GlyphMetricsCache | None = None,
+    backend: str = LAYOUT_GLYPH,
+) -> list:
+    """按像素宽度将字幕换行，保证每一行经 `layout_caption` 排版后的宽度不超过 `max_width`。
+
+    - 含空格：按单词换行；超长单词按字符拆分。
+    - 不含空格：逐字符累加宽度换行。
+    - 行宽与排版阶段的算法一致：逐字符宽度之和加上该行的字间距（`line_letter_spacing`，
+      含中日韩字符的行为 `cjk_letter_spacing`）；整行后端下不含中日韩字符的行按整行测量（保留字距调整）。
+      单个字符本身比 `max_width` 还宽时只能独占一行。
+    """
+    if cache is None:
+        cache = glyph_metrics_cache
+    fallback_w = int(fontsize * 0.6)
+
+    def _line_width(line: str, char_sum: int, has_cjk: bool) -> int:
+        # 与 layout_caption 中的行宽计算保持一致
+        if backend == LAYOUT_LINE and not has_cjk:
+            return cache.text_width(font, line, len(line) * fallback_w)
+        ls_px = cjk_letter_spacing(fontsize) if has_cjk else 0
+        return char_sum + max(0, len(line) - 1) * ls_px
+
+    def _chars_width(segment: str) -> tuple:
+        """返回 (逐字符宽度之和, 是否含中日韩字符)。"""
+        return sum(cache.text_width(font, ch, fallback_w) for ch in segment), line_has_cjk(segment)
+
+    def _split_chars(segment: str) -> list:
+        lines_acc = []
+        current = ""
+        current_sum = 0
+        current_cjk = False
+        for ch in segment:
+            ch_w, ch_cjk = _chars_width(ch)
+            candidate = current + ch
+            if not current or _line_width(candidate, current_sum + ch_w, current_cjk or ch_cjk) <= max_width:
+                current = candidate
+                current_sum += ch_w
+                current_cjk = current_cjk or ch_cjk
+            else:
+                lines_acc.append(current)
+                current, current_sum, current_cjk = ch, ch_w, ch_cjk
+        if current:
+            lines_acc.append(current)
+        return lines_acc
+
+    if not text:
+        return []
+    tokens = tokenize_caption(text)
+    if not tokens.has_space:
+        return _split_chars(text)
+
+    space_w, _ = _chars_width(" ")
+    lines = []
+    current = ""
+    current_sum = 0
+    current_cjk = False
+    for word in tokens.words:
+        w_sum, w_cjk = _chars_width(word)
+        if current:
+            candidate = current + " " + word
+            if _line_width(candidate, current_sum + space_w + w_sum, current_cjk or w_cjk) <= max_width:
+                current = candidate
+                current_sum += space_w + w_sum
+                current_cjk = current_cjk or w_cjk
+                continue
+            lines.append(current)
+        if _line_width(word, w_sum, w_cjk) <= max_width:
+            current, current_sum, current_cjk = word, w_sum, w_cjk
+        else:
+            # 超长单词按字符拆分
+            lines.extend(_split_chars(word))
+            current, current_sum, current_cjk = "", 0, False
+    if current:
+        lines.append(current)
+    return lines
+
+
+def layout_caption(
+    font,
+    text: str,
+    max_width: int,
+    fontsize: int,
+    spacing: int,
+    cache: GlyphMetricsCache | None = None,
+    backend: str = LAYOUT_GLYPH,
+) -> CaptionLayout:
+    """一次性完成换行与字形定位，返回可复用的 `CaptionLayout`。
+
+    参数：
+        font: PIL 字体对象。
+        text: 字幕文本。
+        max_width: 可用宽度（像素）。
+        fontsize: 名义字号，用于推导字间距与兜底宽度。
+        spacing: 行间距（像素）。
+        cache: 字形度量缓存，默认使用进程级共享缓存。
+        backend: 排版后端，`"glyph"` 或 `"line"`（见模块说明）。
+    """
+    if backend not in LAYOUT_BACKENDS:
+        raise ValueError(f"Unknown layout backend: {backend}")
+    if cache is None:
+        cache = glyph_metrics_cache
+    fallback_w = int(fontsize * 0.6)
+    typical_h = cache.line_height(font, fontsize)
+
+    lines = []
+    for text_line in wrap_caption(font, text, max_width, fontsize, cache, backend):
+        ls_px = line_letter_spacing(text_line, fontsize)
+        if backend == LAYOUT_LINE and not ls_px:
+            # 无需额外字间距：整行一次测量、一次绘制，字距由排版引擎处理
+            width = cache.text_width(font, text_line, len(text_line) * fallback_w)
+            lines.append(LayoutLine(text=text_line, width=width, letter_spacing=0, glyphs=[(0, text_line)]))
+            continue
+        glyphs = []
+        x = 0
+        for i, ch in enumerate(text_line):
+            glyphs.append((x, ch))
+            x += cache.text_width(font, ch, fallback_w)
+            if i < len(text_line) - 1:
+                x += ls_px
+        lines.append(LayoutLine(text=text_line, width=x, letter_spacing=ls_px, glyphs=glyphs))
+
+    block_w = max((ln.width for ln in lines), default=0)
+    block_h = len(lines) * typical_h + max(0, len(lines) - 1) * spacing
+    return CaptionLayout(lines=lines, width=block_w, height=block_h, line_height=typical_h, spacing=spacing)
+
+
+def fit_caption_layout(
+    font_for_size,
+    text: str,
+    max_width: int,
+    max_height: int,
+    spacing_ratio: float,
+    min_size: int = FIT_MIN_FONT_SIZE,
+    max_size: int = FIT_MAX_FONT_SIZE,
+    cache: GlyphMetricsCache | None = None,
+    backend: str = LAYOUT_GLYPH,
+    baseline_size: int | None = None,
+) -> tuple:
+    """二分查找能放进 `max_width` x `max_height` 的最大字号，返回 (字号, 字体, 排版结果)。
+
+    每次试排只调用 `layout_caption`（换行 + 测量），宽度来自字形度量缓存，不绘制任何像素；
+    字号越大行越多、行越高，“能否放下”对字号近似单调（换行位置变化时可能有个别例外，
+    此时取二分到达的边界），约 log2(max_size - min_size) 次试排即可。
+    给出 `baseline_size`（如固定字号）且它能放下时，结果不小于它，不会因上述例外反而比固定字号更小。
+    连 `min_size` 都放不下时返回 `min_size` 的排版结果。结果只取决于输入，同一字幕每次得到相同字号。
+
+    参数：
+        font_for_size: 字号 -> PIL 字体对象 的函数（如 `functools.partial(get_font, font_path)`）。
+        text: 字幕文本。
+        max_width / max_height: 可用区域（像素）。
+        spacing_ratio: 行间距与字号之比。
+        min_size / max_size: 字号搜索范围。
+        cache: 字形度量缓存，默认使用进程级共享缓存。
+        backend: 排版后端。
+        baseline_size: 能放下时作为搜索下界的字号。
+    """
+    results = {}
+
+    def _trial(size: int):
+        if size not in results:
+            font = font_for_size(size)
+            spacing = int(max(0, size * spacing_ratio))
+            layout = layout_caption(font, text, max_width, size, spacing, cache=cache, backend=backend)
+            results[size] = (size, font, layout)
+        return results[size]
+
+    def _fits(size: int) -> bool:
+        _, _, layout = _trial(size)
+        return layout.width <= max_width and layout.height <= max_height
+
+    lo, hi = int(min_size), max(int(min_size), int(max_size))
+    if baseline_size is not None and lo < baseline_size <= hi and _fits(baseline_size):
+        lo = int(baseline_size)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _fits(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return _trial(lo)
+
+
+def draw_caption_layout(
+    draw: ImageDraw.ImageDraw,
+    layout: CaptionLayout,
+    origin: tuple,
+    font,
+    fill,
+    stroke_width: int = 0,
+    stroke_fill=None,
+) -> None:
+    """按排版结果在 `origin` 处绘制字幕，每行在文本块宽度内水平居中。
+
+    整行排版的行只调用一次 `draw.text`；逐字符排版的行每个字符调用一次。
+    """
+    origin_x, y = origin
+    for line in layout.lines:
+        x0 = origin_x + max(0, (layout.width - line.width) // 2)
+        for x_off, run in line.glyphs:
+            draw.text((x0 + x_off, y), run, font=font, fill=fill,
+                      stroke_width=stroke_width or 0,
+                      stroke_fill=stroke_fill)
+        y += layout.line_height + layout.spacing
+
+
+def _shift(mask: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    """把蒙版平移 (dx, dy)，移出的部分丢弃，空出的部分补 0。"""
+    h, w = mask.shape
+    out = np.zeros_like(mask)
+    out[max(0, dy):h + min(0, dy), max(0, dx):w + min(0, dx)] = \
+        mask[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+    return out
+
+
+def render_caption_tile(
+    layout: CaptionLayout,
+    font,
+    fill: tuple,
+    fontsize: int,
+    shadow_offset: tuple = (2, 2),
+    shadow_fill: tuple = (0, 0, 0, 180),
+    stroke_width: int = 2,
+):
+    """把字幕渲染成紧贴文字的 RGBA 图块（描边为黑色）。
+
+    文字只栅格化一次得到灰度蒙版 M，随后派生：
+    - 阴影：M 平移 `shadow_offset`，以 `shadow_fill` 的透明度绘制黑色；
+    - 加粗：M 在上下左右各平移 `max(1, 2% 字号)`，以文字颜色绘制。
+    这五层按逐遍绘制的顺序，用与 PIL 在 RGBA 图层上填充蒙版相同的混合规则
+    （目标像素完全透明时颜色直接取墨色，否则按蒙版线性混合）做向量化叠加。
+    描边与文字本体仍由 PIL 直接画在图块上：FreeType 的圆角描边以及后一个字的描边压住
+    前一个字的效果无法由蒙版膨胀准确还原，这样与逐遍绘制的结果一致。
+    全部运算都只在文字包围盒内进行，不再分配原图大小的图层。
+
+    返回：
+        (tile, (x, y)): RGBA 图块及其相对文本块原点（`layout` 左上角）的偏移；无可见像素时 tile 为 None。
+    """
+    bold_offset = max(1, int(fontsize * 0.02))
+    margin = bold_offset + stroke_width + max(abs(v) for v in shadow_offset) + 1
+    # 字形可能超出排版盒（上伸/下伸部分、负左边距），先在宽松画布上绘制再裁剪
+    pad = int(fontsize)
+    canvas = Image.new("L", (layout.width + 2 * pad, layout.height + 2 * pad), 0)
+    draw_caption_layout(ImageDraw.Draw(canvas), layout, (pad, pad), font, fill=255)
+    bbox = canvas.getbbox()
+    if not bbox:
+        return None, (0, 0)
+    left, top = bbox[0] - margin, bbox[1] - margin
+    text = np.asarray(canvas.crop((left, top, bbox[2] + margin, bbox[3] + margin)), dtype=np.uint8)
+
+    m = text.astype(np.float32) / 255.0
+    # 图层：(蒙版, 颜色取文字色的比例 0/1, 图层 alpha)
+    layers = [(_shift(m, shadow_offset[0], shadow_offset[1]), 0.0, shadow_fill[3] / 255.0)]
+    for dx, dy in [(bold_offset, 0), (-bold_offset, 0), (0, bold_offset), (0, -bold_offset)]:
+        layers.append((_shift(m, dx, dy), 1.0, 1.0))
+
+    # 只对至少被一个图层覆盖的像素做运算（行间距与字间空白不参与）
+    active = np.zeros(m.shape, dtype=bool)
+    for mask, _, _ in layers:
+        active |= mask > 0
+    idx = np.flatnonzero(active)
+
+    # color = fill * t，alpha = a；黑色图层把 t 拉向 0，文字色图层把 t 拉向 1
+    t = np.zeros(idx.size, dtype=np.float32)
+    a = np.zeros(idx.size, dtype=np.float32)
+    tmp = np.empty_like(t)
+    for mask, target, ink_alpha in layers:
+        mask = mask.ravel()[idx]
+        # 目标像素完全透明时颜色直接取墨色
+        effective = mask.copy()
+        effective[(a == 0) & (mask > 0)] = 1.0
+        np.subtract(target, t, out=tmp)
+        tmp *= effective
+        t += tmp
+        np.subtract(ink_alpha, a, out=tmp)
+        tmp *= mask
+        a += tmp
+
+    tile = np.zeros(text.shape + (4,), dtype=np.uint8)
+    flat = tile.reshape(-1, 4)
+    for i in range(3):
+        flat[idx, i] = np.rint(t * fill[i])
+    flat[idx, 3] = np.rint(a * 255.0)
+    tile = Image.fromarray(tile, mode="RGBA")
+    # 描边 + 文字本体：与逐遍绘制的最后一遍相同
+    draw_caption_layout(ImageDraw.Draw(tile), layout, (pad - left, pad - top), font, fill=fill,
+                        stroke_width=stroke_width, stroke_fill=(0, 0, 0, 255))
+    return tile, (left - pad, top - pad)
+
+
+def clear_caches() -> None:
+    """清空进程级字形度量缓存与文本整形缓存（用于基准测试或字体文件更新后）。"""
+    glyph_metrics_cache.clear()
+    clear_shaping_caches()
@@ -4,10 +4,10 @@ import google.auth.transport.requests
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from datetime import datetime, timedelta
 import pytz
-from .thumbnail import generate_thumbnail
+from .thumbnail import YOUTUBE_THUMBNAIL_MAX_BYTES, render_thumbnail
 
 class YouTubeClient:
     def __init__(self, credentials_file, token_file, proxy=None):
@@ -206,15 +206,14 @@ class YouTubeClient:
             description (str): The description of the video.
             privacy_status (str): The privacy status of the video (e.g., "public", "private", "unlisted").
             tags (list, optional): A list of tags for the video. Defaults to None.
-            thumbnail_path (str, optional): Path to the thumbnail image. Defaults to None.
+            thumbnail_path (str | io.BytesIO, optional): Path to the thumbnail image, or an in-memory JPEG. Defaults to None.
             publish_after_processing (bool): If True, waits for the video to be processed and then sets its privacy to public.
         """
-        generated_thumbnail = False
         if not thumbnail_path:
             print("No thumbnail provided, attempting to generate one...")
-            thumbnail_path = generate_thumbnail(file_path)
+            # Generated in memory and uploaded straight from the buffer; nothing to clean up afterwards
+            thumbnail_path = render_thumbnail(video_path=file_path, max_bytes=YOUTUBE_THUMBNAIL_MAX_BYTES)
             if thumbnail_path:
-                generated_thumbnail = True
                 print("Thumbnail generated successfully.")
             else:
                 print("Thumbnail generation skipped. Proceeding without one.")
@@ -251,9 +250,6 @@ class YouTubeClient:
 
         if thumbnail_path:
             self.set_thumbnail(video_id, thumbnail_path)
-            if generated_thumbnail and os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-                print(f"Removed generated thumbnail: {thumbnail_path}")
 
         if publish_after_processing:
             published = self.wait_for_processing_and_publish(video_id)
@@ -310,9 +306,14 @@ class YouTubeClient:
 
         Args:
             video_id (str): The ID of the video.
-            thumbnail_path (str): Path to the thumbnail image.
+            thumbnail_path (str | file-like): Path to the thumbnail image, or a readable binary
+                buffer such as the `io.BytesIO` JPEG returned by `render_thumbnail`.
         """
-        media = MediaFileUpload(thumbnail_path)
+        if isinstance(thumbnail_path, (str, os.PathLike)):
+            media = MediaFileUpload(thumbnail_path)
+        else:
+            thumbnail_path.seek(0)
+            media = MediaIoBaseUpload(thumbnail_path, mimetype="image/jpeg")
 
         request = self.youtube.thumbnails().set(
             videoId=video_id,
@@ -0,0 +1,261 @@
+"""
+后台封面池：把封面生成从直播/上传任务中移出去。
+
+直播任务从 `live_cover/` 随机取封面（`service_broadcast.get_random_cover`），上传任务从
+`screen_cover/` 取（`upload_video.resolve_thumbnail_for_video`）；目录为空时只能在任务内同步
+抽帧、拼接、叠字幕，调度线程被整段图片生成阻塞。本模块提供：
+
+- `CoverPool`：一个封面目录及其素材（视频和/或图片）与低水位；
+- `CoverProducer`：后台线程 + `ThumbnailGenerator.generate_batch` 进程池。`request()` 只把
+  低于低水位的封面池放进队列，立即返回，调度任务永远不会等待图片生成；
+  封面在内存中渲染后直接写成封面目录内的 `.part` 临时文件再原子改名，取封面的一方看不到半成品，
+  素材目录中也不会产生中间文件；生成失败时临时文件会被删除；
+  同一目录排队/生成中时不会重复入队，一轮一张都没生成成功的目录冷却一段时间后才再尝试。
+
+封面池为空（如新账号或素材刚更新、生产者尚未补齐）时，直播与上传任务仍会退回到原来的同步生成：
+直播进程用 `render_stream_thumbnail` 在内存中抽帧生成，上传任务用 `generate_stream_thumbnail`。
+封面池只是让这种情况变少，并不保证任务内永远不生成封面。
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from .thumbnail import ThumbnailGenerator, ThumbnailJob
+
+# 视为封面的图片扩展名
+COVER_EXTS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# 可作为拼接素材的图片扩展名
+IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+# 可抽帧的视频扩展名
+VIDEO_EXTS = {'.mp4', '.mkv', '.avi', '.mov', '.flv', '.ts'}
+
+# 默认低水位：目录中的封面少于该数量时补齐
+DEFAULT_LOW_WATER = 5
+
+# 一轮没有生成出任何封面的目录，冷却多久后再尝试（秒）
+DEFAULT_COOLDOWN = 3600
+
+# 生成中的临时文件后缀（不会被当作封面）
+PART_SUFFIX = '.part'
+
+
+def list_files(directory: str, exts: set) -> list[str]:
+    """列出目录（不递归）中扩展名属于 `exts` 的文件，忽略隐藏文件；目录不存在时返回空列表。"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in names
+        if not name.startswith('.')
+        and os.path.splitext(name)[1].lower() in exts
+        and os.path.isfile(os.path.join(directory, name))
+    ]
+
+
+def count_covers(cover_dir: str) -> int:
+    """目录中现有的封面数量。"""
+    return len(list_files(cover_dir, COVER_EXTS))
+
+
+@dataclass
+class CoverPool:
+    """一个需要保持封面数量的目录。
+
+    - 有图片素材时按 `per_cover` 张一组拼接（同 `tools/generate_screen_covers.py`）；
+    - 否则从视频素材中抽帧生成（同 `generate_stream_thumbnail`：竖屏三帧拼接，横屏单帧）。
+
+    参数：
+        cover_dir (str): 封面目录，例如 `<账号>/live_cover`。
+        videos (list[str]): 可抽帧的视频。
+        images (list[str]): 可拼接的图片。
+        low_water (int): 低水位。
+        per_cover (int): 图片拼接时每个封面的图片数。
+        caption (str | None): 可选字幕。
+        color (str): 字幕颜色。
+    """
+
+    cover_dir: str
+    videos: list = field(default_factory=list)
+    images: list = field(default_factory=list)
+    low_water: int = DEFAULT_LOW_WATER
+    per_cover: int = 4
+    caption: str | None = None
+    color: str = 'yellow'
+
+    @property
+    def prefix(self) -> str:
+        return os.path.basename(os.path.normpath(self.cover_dir))
+
+    def missing(self) -> int:
+        """距离低水位还差几张封面。"""
+        return max(0, self.low_water - count_covers(self.cover_dir))
+
+    def plan_jobs(self, count: int) -> list[ThumbnailJob]:
+        """生成 `count` 个任务，输出到封面目录内的临时文件；没有素材时返回空列表。"""
+        jobs = []
+        for _ in range(count):
+            part_path = os.path.join(self.cover_dir, f".{self.prefix}_{uuid.uuid4().hex[:8]}.jpg{PART_SUFFIX}")
+            if self.images:
+                k = self.per_cover
+                picks = random.sample(self.images, k) if len(self.images) >= k else random.choices(self.images, k=k)
+                job = ThumbnailJob(kind='images', image_paths=picks, caption=self.caption, color=self.color, output_path=part_path)
+            elif self.videos:
+                job = ThumbnailJob(kind='stream', video_path=random.choice(self.videos), caption=self.caption, color=self.color, output_path=part_path)
+            else:
+                break
+            jobs.append(job)
+        return jobs
+
+
+def publish_cover(part_path: str) -> str:
+    """把生成完成的临时文件原子改名为正式封面，返回新路径。"""
+    final_path = part_path[: -len(PART_SUFFIX)]
+    directory, name = os.path.split(final_path)
+    final_path = os.path.join(directory, name.lstrip('.'))
+    os.replace(part_path, final_path)
+    return final_path
+
+
+class CoverProducer:
+    """后台补齐封面池的生产者。
+
+    参数：
+        workers (int): `generate_batch` 的工作进程数；为 1 时在后台线程内顺序生成。
+        cooldown (float): 一轮一张都没生成成功的目录的冷却时间（秒）。
+        generator (ThumbnailGenerator | None): 使用的生成器；默认自动探测字体。
+    """
+
+    def __init__(self, workers: int = 1, cooldown: float = DEFAULT_COOLDOWN, generator: ThumbnailGenerator | None = None):
+        self.workers = max(1, int(workers))
+        self.cooldown = cooldown
+        self.generator = generator or ThumbnailGenerator()
+        self.generated = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue()
+        # 排队或生成中的目录
+        self._pending: set = set()
+        # 目录 -> 冷却结束时间
+        self._cooling: dict = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def start(self) -> None:
+        """启动后台线程（已启动时不做任何事）。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='cover-producer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """处理完当前批次后停止后台线程。"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    def request(self, pools) -> int:
+        """把低于低水位的封面池放入队列并立即返回，返回新入队的目录数。
+
+        已在排队/生成中、或仍在冷却期内的目录会被跳过。
+        """
+        self.start()
+        now = time.monotonic()
+        queued = 0
+        for pool in pools:
+            key = os.path.abspath(pool.cover_dir)
+            with self._lock:
+                if key in self._pending or self._cooling.get(key, 0) > now:
+                    continue
+                if pool.missing() <= 0 or not (pool.videos or pool.images):
+                    continue
+                self._pending.add(key)
+                self._idle.clear()
+                self._queue.put(pool)
+            queued += 1
+        return queued
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """等待队列清空且当前批次完成（主要供命令行工具和基准测试使用）。"""
+        return self._idle.wait(timeout)
+
+    def _drain(self, first) -> list:
+        pools = [first]
+        while True:
+            try:
+                pool = self._queue.get_nowait()
+            except queue.Empty:
+                return pools
+            pools.append(pool)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            drained = self._drain(first)
+            pools = [p for p in drained if p is not None]
+            try:
+                self._produce(pools)
+            except Exception as e:
+                print(f"Error producing covers: {e}")
+            finally:
+                with self._lock:
+                    for pool in pools:
+                        self._pending.discard(os.path.abspath(pool.cover_dir))
+                    if self._queue.empty():
+                        self._idle.set()
+            if None in drained:
+                return
+
+    def _produce(self, pools: list) -> None:
+        """为一批封面池规划任务，交给同一个进程池生成，完成一张发布一张。"""
+        jobs, job_pools = [], {}
+        for pool in pools:
+            os.makedirs(pool.cover_dir, exist_ok=True)
+            for job in pool.plan_jobs(pool.missing()):
+                jobs.append(job)
+                job_pools[job.job_id] = pool
+        if not jobs:
+            return
+
+        started = time.perf_counter()
+        produced: dict = {}
+        for result in self.generator.generate_batch(jobs, workers=self.workers):
+            pool = job_pools[result.job.job_id]
+            key = os.path.abspath(pool.cover_dir)
+            if result.path and os.path.exists(result.path):
+                try:
+                    out_path = publish_cover(result.path)
+                except OSError as e:
+                    print(f"Error publishing cover {result.path}: {e}")
+                    continue
+                produced[key] = produced.get(key, 0) + 1
+                self.generated += 1
+                print(f"Cover pool: generated {out_path} ({result.elapsed:.2f}s)")
+            else:
+                self.failed += 1
+                print(f"Cover pool: failed to generate a cover for {pool.cover_dir}: {result.error}")
+                if result.job.output_path and os.path.exists(result.job.output_path):
+                    os.remove(result.job.output_path)
+
+        until = time.monotonic() + self.cooldown
+        for pool in pools:
+            key = os.path.abspath(pool.cover_dir)
+            if not produced.get(key):
+                with self._lock:
+                    self._cooling[key] = until
+        print(f"Cover pool: {sum(produced.values())}/{len(jobs)} covers for {len(pools)} pools in {time.perf_counter() - started:.1f}s")
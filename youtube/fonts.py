@@ -0,0 +1,95 @@
+"""
+进程级字体注册表。
+
+`ImageFont.truetype` 每次都会重新解析字体文件（SourceHanSansCN-Heavy.otf 约 15 MB），
+批量生成封面时这部分开销会被重复支付上千次。本模块按 (字体路径, 字号) 缓存已加载的
+字体对象，同一进程内每个字体只加载一次，并被过程式 API 与 `ThumbnailGenerator` 共享。
+
+门户服务可在启动时调用 `preload_fonts()` 预热，避免首个任务承担加载耗时。
+"""
+
+import os
+import threading
+
+from PIL import ImageFont
+
+# 字体目录
+FONTS_RELATIVE_PATH = os.path.join(os.path.dirname(__file__), "..", "fonts")
+
+# 候选字体（按优先级），需支持拉丁字母与中日韩文字
+FONT_CANDIDATES = [
+    # "SourceHanSansCN-Bold.otf",
+    # "SourceHanSansCN-ExtraLight.otf",
+    "SourceHanSansCN-Heavy.otf",
+    # "SourceHanSansCN-Light.otf",
+    # "SourceHanSansCN-Medium.otf",
+    # "SourceHanSansCN-Normal.otf",
+    # "SourceHanSansCN-Regular.otf",
+]
+
+# 默认字幕字号
+DEFAULT_FONT_SIZE = 160
+
+_fonts: dict = {}
+_fonts_lock = threading.Lock()
+_default_font_path: str | None = None
+
+
+def find_font_file() -> str:
+    """在 `fonts/` 目录中查找可用字体，结果在进程内缓存。
+
+    返回第一个存在的候选字体路径；都不存在时返回空字符串，由 PIL 使用默认字体。
+    """
+    global _default_font_path
+    if _default_font_path is None:
+        found = ""
+        for font in FONT_CANDIDATES:
+            path = os.path.join(FONTS_RELATIVE_PATH, font)
+            if os.path.exists(path):
+                found = path
+                break
+        print(f"Using font: {found or 'PIL default'}")
+        _default_font_path = found
+    return _default_font_path
+
+
+def get_font(font_path: str | None = None, size: int = DEFAULT_FONT_SIZE):
+    """返回 (font_path, size) 对应的字体对象，同一进程内只加载一次。
+
+    参数：
+        font_path (str | None): 字体文件路径；为空时使用 `find_font_file()` 的结果。
+        size (int): 字号。
+
+    返回：
+        PIL 字体对象；加载失败时退回 `ImageFont.load_default()`（同样会被缓存）。
+    """
+    path = font_path or find_font_file()
+    key = (path, int(size))
+    font = _fonts.get(key)
+    if font is not None:
+        return font
+    with _fonts_lock:
+        font = _fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(path, int(size)) if path else ImageFont.load_default()
+            except Exception as e:
+                print(f"Error loading font {path} ({size}px): {e}")
+                font = ImageFont.load_default()
+            _fonts[key] = font
+    return font
+
+
+def preload_fonts(sizes=(DEFAULT_FONT_SIZE,), font_path: str | None = None) -> int:
+    """预加载指定字号的字体，返回已缓存的字体数量。适合在服务启动时调用。"""
+    for size in sizes:
+        get_font(font_path, size)
+    return len(_fonts)
+
+
+def clear_fonts() -> None:
+    """清空字体缓存（字体文件更新后或基准测试时使用）。"""
+    global _default_font_path
+    with _fonts_lock:
+        _fonts.clear()
+        _default_font_path = None
@@ -0,0 +1,115 @@
+"""
+单进程多帧抽取。
+
+原先生成竖屏封面时，每个时间点都单独启动一次 `ffmpeg -ss ... -vframes 1`，把 JPEG
+写进当前目录下的 `temp_frames_<uuid>` 临时目录，再由 PIL 重新解码。
+
+`extract_frames` 在一次 ffmpeg 调用中完成全部时间点：每个时间点作为一路带 `-ss`
+输入快速定位，各取一帧后用 concat 滤镜串联，以 PPM 格式经管道输出到 stdout，
+在内存中直接解析为 PIL 图像，不再产生临时文件。
+
+`width` 非空时在滤镜链中先缩放到该宽度（等比，高度取偶数），用于低分辨率的候选帧评估，
+管道中只传输小图。
+
+`keyframe_only=True` 时每路输入加 `-skip_frame nokey`：解码器只解码关键帧（I 帧），
+输出为各时间点之后最近的关键帧，不再从前一个关键帧逐帧解码到目标位置。纯 CPU 实现，
+不依赖硬件解码。
+"""
+
+import subprocess
+
+from PIL import Image
+
+
+def _build_extract_command(
+    video_path: str,
+    timestamps: list[float],
+    width: int | None = None,
+    keyframe_only: bool = False,
+) -> list[str]:
+    """构造一次抽取多帧的 ffmpeg 命令：每个时间点一路输入，各取首帧后 concat 输出。"""
+    command = ['ffmpeg', '-v', 'error', '-nostdin']
+    for t in timestamps:
+        if keyframe_only:
+            command += ['-skip_frame', 'nokey']
+        command += ['-ss', f"{max(0.0, float(t)):.3f}", '-i', video_path]
+
+    n = len(timestamps)
+    # 每路输入只保留定位后的第一帧，（可选缩放）统一像素格式后按顺序串联
+    scale = f"scale={int(width)}:-2," if width else ""
+    chains = [
+        f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,{scale}format=rgb24,setsar=1[f{i}]"
+        for i in range(n)
+    ]
+    labels = ''.join(f"[f{i}]" for i in range(n))
+    filter_graph = ';'.join(chains + [f"{labels}concat=n={n}:v=1:a=0[out]"])
+
+    command += [
+        '-filter_complex', filter_graph,
+        '-map', '[out]',
+        '-frames:v', str(n),
+        # `-vsync` 在新版本中已不推荐但仍可用；`-fps_mode` 要到 ffmpeg 5.1 才有
+        '-vsync', 'passthrough',
+        '-f', 'image2pipe',
+        '-c:v', 'ppm',
+        'pipe:1',
+    ]
+    return command
+
+
+def parse_ppm_stream(data: bytes) -> list[Image.Image]:
+    """解析 ffmpeg image2pipe 输出的连续 PPM(P6) 数据，返回 RGB 图像列表。
+
+    数据不完整（例如进程中途退出）时，返回已完整解析的帧。
+    """
+    frames = []
+    pos, size = 0, len(data)
+    while pos < size:
+        # 头部：P6 <宽> <高> <最大值>，以空白分隔，最后一个空白字符之后为像素数据
+        fields = []
+        while len(fields) < 4:
+            while pos < size and data[pos:pos + 1].isspace():
+                pos += 1
+            start = pos
+            while pos < size and not data[pos:pos + 1].isspace():
+                pos += 1
+            if start == pos:
+                return frames
+            fields.append(data[start:pos])
+        pos += 1
+
+        if fields[0] != b'P6' or fields[3] != b'255':
+            raise ValueError(f"Unsupported PPM header: {b' '.join(fields)!r}")
+        width, height = int(fields[1]), int(fields[2])
+        length = width * height * 3
+        if pos + length > size:
+            return frames
+        frames.append(Image.frombuffer('RGB', (width, height), data[pos:pos + length], 'raw', 'RGB', 0, 1))
+        pos += length
+    return frames
+
+
+def extract_frames(
+    video_path: str,
+    timestamps: list[float],
+    width: int | None = None,
+    keyframe_only: bool = False,
+) -> list[Image.Image]:
+    """在一次 ffmpeg 调用中抽取多个时间点的画面。
+
+    参数：
+        video_path (str): 视频路径。
+        timestamps (list[float]): 时间点（秒），输出顺序与之一致。
+        width (int | None): 缩放到的宽度（等比）；为空时输出原始分辨率。
+        keyframe_only (bool): 只解码关键帧，取各时间点之后最近的关键帧（更快，位置不精确）。
+
+    返回：
+        list[PIL.Image.Image]: RGB 帧列表；时间点超出视频末尾等情况下可能少于请求数量，
+        由调用方检查。ffmpeg 不可用或执行失败时抛出 `subprocess.CalledProcessError` /
+        `FileNotFoundError`。
+    """
+    if not timestamps:
+        return []
+    command = _build_extract_command(video_path, timestamps, width, keyframe_only)
+    result = subprocess.run(command, check=True, capture_output=True)
+    return parse_ppm_stream(result.stdout)
@@ -0,0 +1,125 @@
+"""
+封面候选帧评估与选择。
+
+原先竖屏封面和直播缩略图在 `duration * 0.1 ~ 0.9` 之间盲选随机时间点，经常选中黑场、
+转场模糊帧或纯色画面；`tools/extract_first_frames.py` 则需要手动 `--seek` 躲开片头黑帧。
+
+本模块先在一次 ffmpeg 调用中以低分辨率（默认宽 160px）解码 K 个候选时间点，
+用 numpy 向量化计算每帧的：
+- 平均亮度（过暗/过亮的帧视为不可用）；
+- 拉普拉斯方差（越大越清晰，用于识别模糊帧）；
+- 灰度直方图熵（越大内容越丰富，用于识别纯色/字幕卡画面）；
+再取综合得分最高的 N 个时间点，只对这 N 帧做全分辨率抽取。
+
+`keyframe_only=True` 时候选帧只解码关键帧；最终抽取也应使用同一模式，
+这样两次取到的是同一批关键帧。
+"""
+
+import random
+import subprocess
+from dataclasses import dataclass
+
+import numpy as np
+
+from .frame_extract import extract_frames
+
+# 候选帧数量与评估用的缩放宽度
+DEFAULT_CANDIDATES = 12
+SAMPLE_WIDTH = 160
+
+# 平均亮度（0-255）在此范围之外的帧视为黑场/白场
+MIN_LUMA = 24
+MAX_LUMA = 235
+
+
+@dataclass
+class FrameScore:
+    """单个候选帧的评估结果。"""
+
+    timestamp: float
+    luma: float
+    sharpness: float
+    entropy: float
+    score: float = 0.0
+
+    @property
+    def usable(self) -> bool:
+        return MIN_LUMA <= self.luma <= MAX_LUMA
+
+
+def _luma(frame) -> np.ndarray:
+    """RGB 图像 -> float32 亮度矩阵（BT.601）。"""
+    rgb = np.asarray(frame.convert('RGB'), dtype=np.float32)
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def measure_frame(frame, timestamp: float = 0.0) -> FrameScore:
+    """计算一帧的平均亮度、拉普拉斯方差与直方图熵（未归一化的 `score` 为 0）。"""
+    y = _luma(frame)
+    if y.shape[0] < 3 or y.shape[1] < 3:
+        return FrameScore(timestamp=timestamp, luma=float(y.mean()) if y.size else 0.0, sharpness=0.0, entropy=0.0)
+    # 4 邻域拉普拉斯，只在内部像素上计算
+    lap = (
+        4 * y[1:-1, 1:-1]
+        - y[:-2, 1:-1] - y[2:, 1:-1]
+        - y[1:-1, :-2] - y[1:-1, 2:]
+    )
+    hist = np.bincount(np.clip(y, 0, 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    p = hist[hist > 0] / hist.sum()
+    entropy = float(-(p * np.log2(p)).sum())
+    return FrameScore(timestamp=timestamp, luma=float(y.mean()), sharpness=float(lap.var()), entropy=entropy)
+
+
+def score_frames(frames: list, timestamps: list[float]) -> list[FrameScore]:
+    """评估一组候选帧，返回带综合得分的结果（与输入顺序一致）。
+
+    综合得分 = 0.5 * 熵 / 8 + 0.5 * 清晰度 / 本组最大清晰度；不可用（过暗/过亮）的帧得分减 1，
+    保证只有在全部候选都不可用时才会被选中。
+    """
+    scores = [measure_frame(frame, t) for frame, t in zip(frames, timestamps)]
+    max_sharpness = max((s.sharpness for s in scores), default=0.0) or 1.0
+    for s in scores:
+        s.score = 0.5 * s.entropy / 8.0 + 0.5 * s.sharpness / max_sharpness
+        if not s.usable:
+            s.score -= 1.0
+    return scores
+
+
+def candidate_timestamps(start: float, end: float, count: int) -> list[float]:
+    """在 [start, end] 内分层随机取 `count` 个时间点（每段一个），既覆盖全片又保留随机性。"""
+    count = max(1, int(count))
+    if end <= start:
+        return [max(0.0, start)] * count
+    step = (end - start) / count
+    return [start + step * (i + random.random()) for i in range(count)]
+
+
+def select_frame_timestamps(
+    video_path: str,
+    start: float,
+    end: float,
+    count: int = 3,
+    candidates: int = DEFAULT_CANDIDATES,
+    sample_width: int = SAMPLE_WIDTH,
+    keyframe_only: bool = False,
+) -> list[float] | None:
+    """从 [start, end] 内的候选帧中选出质量最好的 `count` 个时间点（按时间先后排序）。
+
+    候选帧以 `sample_width` 宽度在一次 ffmpeg 调用中解码并评估；抽取或解析失败、
+    或候选帧不足 `count` 个时返回 None，由调用方退回随机时间点。
+    """
+    timestamps = candidate_timestamps(start, end, max(count, candidates))
+    try:
+        frames = extract_frames(video_path, timestamps, width=sample_width, keyframe_only=keyframe_only)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        print(f"Error sampling candidate frames: {e}")
+        return None
+    if len(frames) < count:
+        print(f"Only {len(frames)} candidate frames decoded, need {count}.")
+        return None
+
+    scores = score_frames(frames, timestamps[:len(frames)])
+    best = sorted(scores, key=lambda s: s.score, reverse=True)[:count]
+    for s in best:
+        print(f"Selected frame at {s.timestamp:.2f}s (luma={s.luma:.0f}, sharpness={s.sharpness:.0f}, entropy={s.entropy:.2f})")
+    return sorted(s.timestamp for s in best)
@@ -0,0 +1,193 @@
+"""
+图片感知哈希索引，用于封面选图去重。
+
+`tools/generate_screen_covers.choose_images` 原先纯随机选图，连拍素材经常让同一张封面里
+出现几乎相同的图片，相邻几次生成的封面也高度相似。本模块提供：
+
+- `dhash`：差值哈希（dHash）。JPEG 通过 `Image.draft()` 以 1/8 比例解码，缩到 9x8 灰度后
+  用 numpy 比较相邻像素，得到 64 位整数；两张图哈希的汉明距离越小越相似；
+- `ImageHashIndex`：按图片目录持久化的哈希索引（目录下的 `.image_hash_index.json`），
+  以 (文件名, 大小, 修改时间) 判断是否需要重新计算，万张图片的目录只会完整哈希一次；
+  同时记录最近 N 个封面所用图片的哈希；
+- `choose_distinct`：随机选图时跳过与本封面已选图片、以及最近 N 个封面中图片过于相似的候选。
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+from PIL import Image
+
+# 索引文件名（位于图片目录下）
+INDEX_FILENAME = ".image_hash_index.json"
+
+# 汉明距离不超过该值视为近似重复（64 位 dHash）
+DEFAULT_THRESHOLD = 10
+
+# 记录最近多少个封面用于跨封面去重
+DEFAULT_RECENT_COVERS = 20
+
+# 索引格式变化时递增
+INDEX_VERSION = 1
+
+
+def dhash(path: str, hash_size: int = 8) -> int:
+    """计算图片的 dHash（`hash_size`² 位整数）。"""
+    with Image.open(path) as img:
+        # JPEG 直接以缩小比例解码，其余格式正常解码
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    px = np.asarray(small, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    """两个哈希的汉明距离。"""
+    return (a ^ b).bit_count()
+
+
+def _is_near(h: int, others, threshold: int) -> bool:
+    return any(hamming(h, o) <= threshold for o in others)
+
+
+def choose_distinct(
+    candidates: list[str],
+    k: int,
+    hashes: dict,
+    recent: list | None = None,
+    threshold: int = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """随机选出 k 张互不近似、且尽量不与最近封面重复的图片。
+
+    选择顺序（逐级放宽，保证总能选满 k 张）：
+    1. 与本封面已选图片、最近封面中的图片都不近似；
+    2. 只要求与本封面已选图片不近似；
+    3. 未被选过的任意图片；
+    4. 候选数不足 k 时允许重复。
+    没有哈希的图片（如无法解码）视为与任何图片都不近似。
+
+    参数：
+        candidates: 候选图片路径。
+        k: 选择数量。
+        hashes: 路径 -> dHash。
+        recent: 最近封面使用过的哈希（可迭代的整数）。
+        threshold: 近似判定的汉明距离阈值。
+    """
+    if not candidates or k <= 0:
+        return []
+    recent_hashes = list(recent or [])
+    order = random.sample(candidates, len(candidates))
+    picks: list[str] = []
+    picked_hashes: list[int] = []
+
+    def _take(accept) -> None:
+        for path in order:
+            if len(picks) >= k:
+                return
+            if path in picks:
+                continue
+            h = hashes.get(path)
+            if h is None or accept(h):
+                picks.append(path)
+                if h is not None:
+                    picked_hashes.append(h)
+
+    _take(lambda h: not _is_near(h, picked_hashes, threshold) and not _is_near(h, recent_hashes, threshold))
+    _take(lambda h: not _is_near(h, picked_hashes, threshold))
+    _take(lambda h: True)
+    if len(picks) < k:
+        picks += random.choices(candidates, k=k - len(picks))
+    return picks
+
+
+class ImageHashIndex:
+    """图片目录的持久化 dHash 索引。
+
+    参数：
+        images_dir (str): 图片目录。
+        recent_covers (int): 记录最近多少个封面的图片哈希。
+    """
+
+    def __init__(self, images_dir: str, recent_covers: int = DEFAULT_RECENT_COVERS):
+        self.images_dir = os.path.abspath(images_dir)
+        self.index_path = os.path.join(self.images_dir, INDEX_FILENAME)
+        self.recent_covers = recent_covers
+        # 文件名 -> [大小, 修改时间, 十六进制哈希]
+        self._entries: dict = {}
+        # 最近封面：[[哈希, ...], ...]（十六进制），最新的在最后
+        self._recent: list = []
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return
+        self._entries = data.get('images') or {}
+        self._recent = data.get('recent') or []
+
+    def save(self) -> None:
+        """有变化时原子写回索引文件。"""
+        if not self._dirty:
+            return
+        data = {'version': INDEX_VERSION, 'images': self._entries, 'recent': self._recent[-self.recent_covers:]}
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Error saving image hash index {self.index_path}: {e}")
+
+    def update(self, paths: list[str]) -> int:
+        """为 `paths` 中新增或变化的图片计算哈希，移除已不存在的条目；返回新计算的数量。"""
+        seen = set()
+        hashed = 0
+        for path in paths:
+            name = os.path.basename(path)
+            seen.add(name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entry = self._entries.get(name)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                continue
+            try:
+                value = f"{dhash(path):016x}"
+            except Exception as e:
+                print(f"Error hashing {path}: {e}")
+                continue
+            self._entries[name] = [st.st_size, st.st_mtime_ns, value]
+            self._dirty = True
+            hashed += 1
+        for name in [n for n in self._entries if n not in seen]:
+            del self._entries[name]
+            self._dirty = True
+        return hashed
+
+    def hashes(self, paths: list[str]) -> dict:
+        """路径 -> 整数哈希（只包含已在索引中的图片）。"""
+        out = {}
+        for path in paths:
+            entry = self._entries.get(os.path.basename(path))
+            if entry:
+                out[path] = int(entry[2], 16)
+        return out
+
+    def recent_hashes(self) -> list[int]:
+        """最近 N 个封面使用过的全部图片哈希。"""
+        return [int(h, 16) for cover in self._recent[-self.recent_covers:] for h in cover]
+
+    def remember_cover(self, paths: list[str]) -> None:
+        """记录一个新封面使用的图片，只保留最近 N 个封面。"""
+        cover = [self._entries[name][2] for name in (os.path.basename(p) for p in paths) if name in self._entries]
+        self._recent = (self._recent + [cover])[-self.recent_covers:]
+        self._dirty = True
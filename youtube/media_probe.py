@@ -0,0 +1,275 @@
+"""
+统一的媒体探测服务。
+
+时长、分辨率等信息原先由 `get_video_duration`、`get_video_resolution`、
+`tools/extract_first_frames.probe_video_resolution` 各自启动 ffprobe 获取，同一个文件
+在一次上传/直播流程中会被探测多次，调度器每轮扫描素材库时还会全部重来一遍。
+
+`MediaProbe` 用一次 `ffprobe -show_format -show_streams -of json` 调用取得时长、分辨率、
+编码、码率、帧率、音频采样率/声道数与关键帧间隔，结果按 (路径, 文件大小, 修改时间) 缓存：
+- 进程内字典缓存，同一进程内重复查询不再访问磁盘；
+- 可选的 SQLite 持久化缓存（通常放在 FTP 根目录旁），未变化的文件跨进程、跨调度轮次都不会重新探测。
+
+文件大小或修改时间变化后缓存自动失效。探测失败的结果不缓存。
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+
+# 读取关键帧间隔时只扫描视频开头这段时长内的数据包（秒）
+KEYFRAME_SCAN_SECONDS = 20
+
+# `MediaInfo` 字段变化时递增，SQLite 中旧版本的记录视为未命中并重新探测
+INFO_VERSION = 2
+
+
+@dataclass
+class MediaInfo:
+    """一次探测的结果。无法获取的字段为 None。"""
+
+    path: str
+    size: int
+    mtime_ns: int
+    duration: float | None = None
+    width: int | None = None
+    height: int | None = None
+    video_codec: str | None = None
+    audio_codec: str | None = None
+    audio_sample_rate: int | None = None
+    audio_channels: int | None = None
+    pix_fmt: str | None = None
+    bit_rate: int | None = None
+    fps: float | None = None
+    keyframe_interval: float | None = None
+
+    @property
+    def resolution(self) -> tuple[int | None, int | None]:
+        return self.width, self.height
+
+    @property
+    def is_vertical(self) -> bool:
+        return bool(self.width and self.height and self.height > self.width)
+
+    def to_json(self) -> str:
+        return json.dumps({'v': INFO_VERSION, **asdict(self)}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "MediaInfo | None":
+        """解析 `to_json` 的结果；版本不是 `INFO_VERSION` 时返回 None。"""
+        data = json.loads(raw)
+        if data.get('v') != INFO_VERSION:
+            return None
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def _to_float(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_rate(value) -> float | None:
+    """解析 ffprobe 的帧率字符串（如 "30000/1001"），无效时返回 None。"""
+    if not value:
+        return None
+    num, _, den = str(value).partition('/')
+    num, den = _to_float(num), _to_float(den or 1)
+    if not num or not den:
+        return None
+    return num / den
+
+
+def _keyframe_interval(packets: list, stream_index: int) -> float | None:
+    """根据视频流数据包的关键帧时间戳估算平均关键帧间隔（秒）。"""
+    times = [
+        t for t in (
+            _to_float(p.get('pts_time'))
+            for p in packets
+            if p.get('stream_index') == stream_index and 'K' in (p.get('flags') or '')
+        )
+        if t is not None
+    ]
+    if len(times) < 2:
+        return None
+    times.sort()
+    return (times[-1] - times[0]) / (len(times) - 1)
+
+
+def parse_ffprobe_output(path: str, size: int, mtime_ns: int, data: dict) -> MediaInfo:
+    """将 ffprobe 的 JSON 输出转换为 `MediaInfo`。"""
+    info = MediaInfo(path=path, size=size, mtime_ns=mtime_ns)
+    fmt = data.get('format') or {}
+    streams = data.get('streams') or []
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    info.duration = _to_float(fmt.get('duration'))
+    info.bit_rate = _to_int(fmt.get('bit_rate'))
+    if audio:
+        info.audio_codec = audio.get('codec_name')
+        info.audio_sample_rate = _to_int(audio.get('sample_rate'))
+        info.audio_channels = _to_int(audio.get('channels'))
+    if video:
+        info.width = _to_int(video.get('width'))
+        info.height = _to_int(video.get('height'))
+        info.video_codec = video.get('codec_name')
+        info.pix_fmt = video.get('pix_fmt')
+        info.fps = _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate'))
+        if info.duration is None:
+            info.duration = _to_float(video.get('duration'))
+        if info.bit_rate is None:
+            info.bit_rate = _to_int(video.get('bit_rate'))
+        info.keyframe_interval = _keyframe_interval(data.get('packets') or [], video.get('index'))
+    return info
+
+
+class MediaProbe:
+    """带缓存的 ffprobe 封装，线程安全。
+
+    参数：
+        db_path (str | None): SQLite 缓存文件路径；为空时只使用进程内缓存。
+        ffprobe (str): ffprobe 可执行文件。
+    """
+
+    def __init__(self, db_path: str | None = None, ffprobe: str = 'ffprobe'):
+        self.db_path = db_path
+        self.ffprobe = ffprobe
+        self.hits = 0
+        self.misses = 0
+        self._memory: dict = {}
+        self._lock = threading.Lock()
+        if db_path:
+            self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作单独连接，便于在线程与子进程之间共享同一个数据库文件
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS media_probe ('
+                    ' path TEXT PRIMARY KEY,'
+                    ' size INTEGER NOT NULL,'
+                    ' mtime_ns INTEGER NOT NULL,'
+                    ' info TEXT NOT NULL,'
+                    ' probed_at REAL NOT NULL)'
+                )
+        except sqlite3.Error as e:
+            print(f"Media probe cache disabled ({self.db_path}): {e}")
+            self.db_path = None
+
+    def _load(self, path: str, size: int, mtime_ns: int) -> MediaInfo | None:
+        if not self.db_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT info FROM media_probe WHERE path = ? AND size = ? AND mtime_ns = ?',
+                    (path, size, mtime_ns),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading media probe cache: {e}")
+            return None
+        return MediaInfo.from_json(row[0]) if row else None
+
+    def _store(self, info: MediaInfo) -> None:
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO media_probe (path, size, mtime_ns, info, probed_at) VALUES (?, ?, ?, ?, ?)',
+                    (info.path, info.size, info.mtime_ns, info.to_json(), time.time()),
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing media probe cache: {e}")
+
+    def _run_ffprobe(self, path: str) -> dict | None:
+        command = [
+            self.ffprobe,
+            '-v', 'error',
+            '-show_format',
+            '-show_streams',
+            # 只读取开头一段的视频数据包，用于估算关键帧间隔
+            '-read_intervals', f'%+{KEYFRAME_SCAN_SECONDS}',
+            '-show_entries', 'packet=stream_index,pts_time,flags',
+            '-of', 'json',
+            path,
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
+            return json.loads(result.stdout or '{}')
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+            print(f"Error probing {path}: {e}")
+            return None
+
+    def probe(self, path: str) -> MediaInfo | None:
+        """返回 `path` 的媒体信息；文件不存在或探测失败时返回 None。"""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            print(f"Error probing {path}: {e}")
+            return None
+        key = (path, st.st_size, st.st_mtime_ns)
+
+        info = self._memory.get(key)
+        if info is None:
+            info = self._load(*key)
+            if info is not None:
+                with self._lock:
+                    self._memory[key] = info
+        if info is not None:
+            self.hits += 1
+            return info
+
+        self.misses += 1
+        data = self._run_ffprobe(path)
+        if data is None:
+            return None
+        info = parse_ffprobe_output(path, st.st_size, st.st_mtime_ns, data)
+        with self._lock:
+            self._memory[key] = info
+        self._store(info)
+        return info
+
+    def clear(self) -> None:
+        """清空进程内缓存（不影响 SQLite 中的记录）。"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# 进程级默认实例：未配置时只使用进程内缓存
+media_probe = MediaProbe()
+
+
+def configure_media_probe(db_path: str | None) -> MediaProbe:
+    """将默认实例替换为使用 `db_path` 持久化缓存的实例，返回新实例。"""
+    global media_probe
+    media_probe = MediaProbe(db_path)
+    return media_probe
+
+
+def probe_media(path: str) -> MediaInfo | None:
+    """使用默认实例探测 `path`。"""
+    return media_probe.probe(path)
@@ -0,0 +1,88 @@
+"""
+字幕文本整形：中日韩字符分类与分词。
+
+原先 `_is_cjk_char` 每次调用都会新建 12 个区间的列表并线性扫描，而字间距计算会对
+每一行的每个字符调用它。本模块提供：
+
+- `CJK_RANGES`：按起点排序、预先编译好的区间表，`is_cjk_char` 用 bisect 做 O(log n) 查找；
+- `contains_cjk`：同一区间表编译成的正则，整行判断在 C 层完成；
+- `line_has_cjk` / `line_letter_spacing`：按行记忆化的分类与字间距（`cjk_letter_spacing` 给出中日韩行的字间距）；
+- `tokenize_caption`：每条字幕只分词一次（是否含空格、单词列表），供换行复用。
+"""
+
+import functools
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+
+# 中日韩文字区间（闭区间），按起点排序
+CJK_RANGES = tuple(sorted([
+    (0x4E00, 0x9FFF),    # CJK Unified Ideographs
+    (0x3400, 0x4DBF),    # CJK Unified Ideographs Extension A
+    (0x20000, 0x2A6DF),  # Extension B
+    (0x2A700, 0x2B73F),  # Extension C
+    (0x2B740, 0x2B81F),  # Extension D
+    (0x2B820, 0x2CEAF),  # Extension E
+    (0xF900, 0xFAFF),    # CJK Compatibility Ideographs
+    (0x2F800, 0x2FA1F),  # CJK Compatibility Ideographs Supplement
+    (0x3040, 0x309F),    # Hiragana
+    (0x30A0, 0x30FF),    # Katakana
+    (0x31F0, 0x31FF),    # Katakana Phonetic Extensions
+    (0xAC00, 0xD7AF),    # Hangul Syllables
+]))
+
+_RANGE_STARTS = tuple(start for start, _ in CJK_RANGES)
+_RANGE_ENDS = tuple(end for _, end in CJK_RANGES)
+
+_CJK_RE = re.compile("[" + "".join(f"{chr(start)}-{chr(end)}" for start, end in CJK_RANGES) + "]")
+
+
+def is_cjk_char(ch: str) -> bool:
+    """判断字符是否为中日韩文字（汉字/平假名/片假名/韩文）。"""
+    cp = ord(ch)
+    i = bisect_right(_RANGE_STARTS, cp) - 1
+    return i >= 0 and cp <= _RANGE_ENDS[i]
+
+
+def contains_cjk(text: str) -> bool:
+    """文本中是否含有中日韩字符。"""
+    return _CJK_RE.search(text) is not None
+
+
+@functools.lru_cache(maxsize=4096)
+def line_has_cjk(line: str) -> bool:
+    """记忆化的整行分类：同一行文本只判断一次。"""
+    return contains_cjk(line)
+
+
+def cjk_letter_spacing(fontsize: int) -> int:
+    """含中日韩字符的行使用的字间距（4% 字号，至少 1 像素）。"""
+    return max(1, int(fontsize * 0.04))
+
+
+def line_letter_spacing(line: str, fontsize: int) -> int:
+    """行内字间距：纯英文行为 0，含中日韩字符的行略微加宽。"""
+    if line_has_cjk(line):
+        return cjk_letter_spacing(fontsize)
+    return 0
+
+
+@dataclass(frozen=True)
+class CaptionTokens:
+    """一条字幕的分词结果：是否含空格，以及按空白切分的单词。"""
+
+    text: str
+    has_space: bool
+    words: tuple
+
+
+@functools.lru_cache(maxsize=1024)
+def tokenize_caption(text: str) -> CaptionTokens:
+    """对字幕分词（记忆化，同一条字幕只计算一次）。"""
+    return CaptionTokens(text=text, has_space=" " in text, words=tuple(text.split()))
+
+
+def clear_caches() -> None:
+    """清空分类与分词缓存。"""
+    line_has_cjk.cache_clear()
+    tokenize_caption.cache_clear()
@@ -1,77 +1,85 @@
+import functools
+import io
+import shutil
 import subprocess
+import time
 import random
 import os
 import uuid
 import numpy as np
-import moviepy.editor as mp
-from PIL import Image, ImageDraw, ImageFont
-import os 
-
-# 字体目录
-FONTS_RELATIVE_PATH = os.path.join(os.path.dirname(__file__), "..", "fonts")
-
-def _find_font_file() -> str:
-    """Finds an available (preferably bold) font file on Windows supporting Latin and CJK.
-
-    Priority order (bold first): Microsoft YaHei Bold, SimHei, Microsoft YaHei, Arial Bold, Arial.
-    Returns empty string if none found, letting PIL pick a default.
-    """
-    candidates = [
-        # "SourceHanSansCN-Bold.otf",
-        # "SourceHanSansCN-ExtraLight.otf",
-        "SourceHanSansCN-Heavy.otf",
-        # "SourceHanSansCN-Light.otf",
-        # "SourceHanSansCN-Medium.otf",
-        # "SourceHanSansCN-Normal.otf",
-        # "SourceHanSansCN-Regular.otf",
-    ]
-    for font in candidates:
-        path = os.path.join(FONTS_RELATIVE_PATH, font)
-        print(f"Checking font: {path}")
-        if os.path.exists(path):
-            return path
-    return ""
-
-def add_caption_to_image(image_path: str, caption: str, color: str = 'yellow') -> str:
+from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from .caption_layout import LAYOUT_BACKENDS, LAYOUT_GLYPH, fit_caption_layout, layout_caption, draw_caption_layout, render_caption_tile
+from .fonts import DEFAULT_FONT_SIZE, find_font_file, get_font
+from .frame_extract import extract_frames
+from .frame_select import select_frame_timestamps
+from .media_probe import probe_media
+
+
+# Caption color mapping
+CAPTION_COLORS = {
+    'yellow': (255, 255, 0),
+    'red': (255, 0, 0),
+    'blue': (0, 100, 255),
+    'green': (0, 255, 0),
+    'white': (255, 255, 255),
+    'orange': (255, 165, 0),
+    'purple': (128, 0, 128),
+    'cyan': (0, 255, 255),
+}
+
+
+def add_caption_to_image(
+    image_path: str,
+    caption: str,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+    render_mode: str = "layered",
+    layout_backend: str = LAYOUT_GLYPH,
+    fit_to_box: bool = False,
+) -> str:
     """
-    Render caption onto an image using MoviePy + PIL.
+    Render caption onto an image using PIL.
 
     Visual rules:
     - Keep original case for text, configurable fill color with black stroke/shadow.
     - Safe area: 15% left/right padding, 15% top/bottom padding; text centered.
-    - Fixed font size at 130px; wrapping derived from safe width and glyph width.
-    - Line spacing ~1.1x (spacing = 0.10 * fontsize).
+    - Font size defaults to 160px; wrapping derived from safe width and glyph width.
+    - Line spacing ~1.5x (spacing = spacing_ratio * fontsize).
     - Letter spacing: default for English (ASCII-only) lines; slightly increased for CJK lines.
 
+    Render modes:
+    - "layered" (default): rasterize the text once into a tight mask, derive shadow, bold and
+      stroke from it and composite only the text bounding box onto the base image.
+    - "passes": the original renderer, six per-glyph draw passes on a full-size RGBA overlay.
+
+    Layout backends (see `youtube/caption_layout.py`):
+    - "glyph" (default): every character is positioned and drawn on its own.
+    - "line": lines without CJK letter spacing are drawn with one `draw.text` call each, so the
+      font's kerning is kept; CJK lines still use per-glyph placement.
+
+    Fit-to-box: with `fit_to_box=True` the font size is not fixed; a binary search picks the
+    largest size (within `FIT_MIN_FONT_SIZE`..`FIT_MAX_FONT_SIZE`) whose wrapped layout fits the
+    70% x 70% safe area, so long captions no longer overflow vertically and short ones fill the
+    space. Trials only measure (through the glyph-metrics cache); the caption is drawn once.
+
     Args:
         image_path: Path to the base image.
         caption: Text to overlay.
         color: Text color ('yellow', 'red', 'blue', 'green', 'white', 'orange', 'purple', 'cyan').
+        font_path: Font file; defaults to the first available font under `fonts/`.
+        fontsize: Font size in pixels.
+        spacing_ratio: Line spacing as a fraction of the font size.
+        render_mode: "layered" or "passes" (see above).
+        layout_backend: "glyph" or "line" (see above).
+        fit_to_box: Choose the font size to fill the safe area; `fontsize` is then ignored.
 
     Returns:
-        Path to the output image with caption applied.
-    """
-    # Color mapping
-    color_map = {
-        'yellow': (255, 255, 0),
-        'red': (255, 0, 0),
-        'blue': (0, 100, 255),
-        'green': (0, 255, 0),
-        'white': (255, 255, 255),
-        'orange': (255, 165, 0),
-        'purple': (128, 0, 128),
-        'cyan': (0, 255, 255),
-    }
-    
-    # Get RGB color, default to yellow if not found
-    text_color = color_map.get(color.lower(), color_map['yellow'])
-    """Adds a centered, wrapped caption to an image using MoviePy + PIL.
-
-    - Auto-wraps text within a safe area (70% width, 40% height) with 15%/30% padding
-    - Centers the text block, uses 1.1x line height equivalent (spacing ~0.1*fontsize)
-    - Yellow uppercase text with black stroke for readability
-
-    Returns the path to the updated image (overwrites original). On error, returns None.
+        Path to the output image with caption applied (the original is overwritten), or None on error.
     """
     if not caption:
         return image_path
@@ -82,558 +90,686 @@ def add_caption_to_image(image_path: str, caption: str, color: str = 'yellow') -
         print(f"Error opening image for caption overlay: {e}")
         return None
 
+    composed = caption_image(
+        base_img,
+        caption,
+        color=color,
+        font_path=font_path,
+        fontsize=fontsize,
+        spacing_ratio=spacing_ratio,
+        render_mode=render_mode,
+        layout_backend=layout_backend,
+        fit_to_box=fit_to_box,
+    )
+
+    # Save according to extension: JPG/JPEG requires RGB (no alpha)
+    try:
+        lower = image_path.lower()
+        if lower.endswith((".jpg", ".jpeg")):
+            composed.convert("RGB").save(image_path, quality=95)
+        else:
+            composed.save(image_path)
+        return image_path
+    except Exception as e:
+        print(f"Error saving captioned image: {e}")
+        return None
+
+def caption_image(
+    base_img: Image.Image,
+    caption: str,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+    render_mode: str = "layered",
+    layout_backend: str = LAYOUT_GLYPH,
+    fit_to_box: bool = False,
+) -> Image.Image:
+    """In-memory core of `add_caption_to_image`: draws `caption` onto an RGB image and returns it.
+
+    No file is read or written, so a stitched cover can be captioned and encoded exactly once.
+    The "layered" mode draws into `base_img` and returns it; "passes" returns a new RGBA image.
+    """
+    # Get RGB color, default to yellow if not found
+    text_color = CAPTION_COLORS.get(color.lower(), CAPTION_COLORS['yellow'])
+
     w, h = base_img.size
 
     # Keep English text in original case, only apply uppercase to non-CJK text if needed
     # For now, we'll keep original case for all text to maintain natural readability
     caption_up = caption
 
-    # Fixed font size and wrapping derived from safe area and glyph width
-    fontsize = 160
-    spacing = int(max(0, fontsize * 0.50))  # 1.5x line height spacing
-
-    # Choose font
-    font_path = _find_font_file()
-    print(f"Using font: {font_path}")
-    try:
-        font = ImageFont.truetype(font_path, fontsize) if font_path else ImageFont.load_default()
-    except Exception:
-        font = ImageFont.load_default()
-
-    # Create transparent overlay the same size as base
-    overlay = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-
     # Compute safe area and text bounding box
     safe_x = int(w * 0.15)
     safe_y = int(h * 0.15)
     safe_w = int(w * 0.70)
     safe_h = int(h * 0.70)
 
-    # Derive wrapping: if text has spaces, use word-based wrap; otherwise measure per-character to split.
-    available_width = safe_w
-    estimated_glyph_width = fontsize * 0.6
+    if fit_to_box:
+        # Largest font size whose wrapped layout fits the safe area (measurement-only trials),
+        # never smaller than `fontsize` when that size already fits
+        fontsize, font, layout = fit_caption_layout(
+            functools.partial(get_font, font_path),
+            caption_up,
+            safe_w,
+            safe_h,
+            spacing_ratio,
+            backend=layout_backend,
+            baseline_size=fontsize,
+        )
+    else:
+        # Font size and wrapping derived from safe area and glyph width
+        spacing = int(max(0, fontsize * spacing_ratio))  # 1.5x line height spacing by default
 
-    # Precompute letter spacing for this block once
-    try:
-        line_letter_spacing_px = _line_letter_spacing(caption_up)
-    except Exception:
-        line_letter_spacing_px = int(max(0, fontsize * 0.02))
+        # Font faces are loaded once per process and shared across calls
+        font = get_font(font_path, fontsize)
 
-    def _split_no_space_text_to_lines(text: str) -> list:
-        """Split a long string without spaces into lines based on measured widths.
+        # Wrap and position every glyph once; glyph widths come from the shared metrics cache
+        layout = layout_caption(font, caption_up, safe_w, fontsize, spacing, backend=layout_backend)
 
-        Measures each character width using the current font and accumulates until
-        the line reaches available width considering per-character letter spacing.
-        """
-        if not text:
-            return []
-        lines_acc = []
-        current_line = []
-        current_width = 0
-        # Use precomputed letter spacing for this text block
-        ls_px = line_letter_spacing_px
-
-        for i, ch in enumerate(text):
-            try:
-                ch_bbox = draw.textbbox((0, 0), ch, font=font)
-                ch_w = ch_bbox[2] - ch_bbox[0]
-            except Exception:
-                ch_w = int(estimated_glyph_width)
-
-            # extra spacing before this char except first in line
-            extra = ls_px if current_line else 0
-            if current_width + extra + ch_w <= available_width:
-                current_line.append(ch)
-                current_width += extra + ch_w
-            else:
-                # finalize current line
-                if current_line:
-                    lines_acc.append(''.join(current_line))
-                # start new line
-                current_line = [ch]
-                current_width = ch_w
-
-        if current_line:
-            lines_acc.append(''.join(current_line))
-        return lines_acc
-
-    if ' ' in caption_up:
-        # word-based wrapping using measured pixel widths; fallback to char-splitting for long words
-        try:
-            space_bbox = draw.textbbox((0, 0), " ", font=font)
-            space_w = space_bbox[2] - space_bbox[0]
-        except Exception:
-            space_w = int(estimated_glyph_width * 0.33)
-
-        def _wrap_by_words_measured(text: str) -> list:
-            """Wrap text by words to fit available width using measured pixel widths.
-
-            - Measures each word with `draw.textbbox` for accurate width.
-            - Adds space width and letter spacing between words.
-            - If a single word exceeds available width, splits it using
-              `_split_no_space_text_to_lines(word)` and places segments accordingly.
-            """
-            words = text.split()
-            if not words:
-                return []
-            ls_px_line = line_letter_spacing_px
-            lines_acc = []
-            current_words = []
-            current_width = 0
-
-            for idx, word in enumerate(words):
-                # measure word width
-                try:
-                    w_bbox = draw.textbbox((0, 0), word, font=font)
-                    w_w = w_bbox[2] - w_bbox[0]
-                except Exception:
-                    w_w = int(len(word) * estimated_glyph_width)
-
-                # width to add if appended to current line
-                sep_w = (space_w + ls_px_line) if current_words else 0
-                need_w = sep_w + w_w
-
-                if need_w <= available_width and current_width + need_w <= available_width:
-                    # fits current line
-                    current_words.append(word)
-                    current_width += need_w
-                else:
-                    # if the word itself is too long, split by characters and place segments
-                    if w_w > available_width:
-                        # finalize current line first if it has content
-                        if current_words:
-                            lines_acc.append(' '.join(current_words))
-                            current_words = []
-                            current_width = 0
-
-                        segments = _split_no_space_text_to_lines(word)
-                        # place each segment as its own line
-                        for seg in segments:
-                            lines_acc.append(seg)
-                    else:
-                        # move current line to accumulator and start a new line with this word
-                        if current_words:
-                            lines_acc.append(' '.join(current_words))
-                        current_words = [word]
-                        current_width = w_w
-
-            if current_words:
-                lines_acc.append(' '.join(current_words))
-            return lines_acc
-
-        lines = _wrap_by_words_measured(caption_up)
+    # Center the text block within safe area
+    tx = safe_x + max(0, (safe_w - layout.width) // 2)
+    ty = safe_y + max(0, (safe_h - layout.height) // 2)
+
+    if render_mode == "passes":
+        composed = _render_caption_passes(base_img, layout, font, text_color, fontsize, tx, ty)
     else:
-        # no spaces: split using measured widths
-        lines = _split_no_space_text_to_lines(caption_up)
-
-    # Helper: detect if a character is CJK/Han/Hangul/Katakana/Hiragana
-    def _is_cjk_char(ch: str) -> bool:
-        cp = ord(ch)
-        ranges = [
-            (0x4E00, 0x9FFF),   # CJK Unified Ideographs
-            (0x3400, 0x4DBF),   # CJK Unified Ideographs Extension A
-            (0x20000, 0x2A6DF), # Extension B
-            (0x2A700, 0x2B73F), # Extension C
-            (0x2B740, 0x2B81F), # Extension D
-            (0x2B820, 0x2CEAF), # Extension E
-            (0xF900, 0xFAFF),   # CJK Compatibility Ideographs
-            (0x2F800, 0x2FA1F), # CJK Compatibility Ideographs Supplement
-            (0x3040, 0x309F),   # Hiragana
-            (0x30A0, 0x30FF),   # Katakana
-            (0x31F0, 0x31FF),   # Katakana Phonetic Extensions
-            (0xAC00, 0xD7AF),   # Hangul Syllables
-        ]
-        return any(start <= cp <= end for start, end in ranges)
-
-    # Per-line letter spacing: 0 for pure English lines, slight spacing for CJK / mixed lines
-    def _line_letter_spacing(ln: str) -> int:
-        has_cjk = any(_is_cjk_char(ch) for ch in ln)
-        if has_cjk:
-            return max(1, int(fontsize * 0.04))
-        # English/default: no extra tracking
-        return 0
-
-    def _measure_text_block(lines_list):
-        # Measure typical line height
-        try:
-            bbox_h = draw.textbbox((0, 0), "Hg", font=font)
-            typical_h = bbox_h[3] - bbox_h[1]
-        except Exception:
-            typical_h = int(fontsize)
-
-        max_w = 0
-        total_h = 0
-        for idx, ln in enumerate(lines_list):
-            line_w = 0
-            ls_px = _line_letter_spacing(ln)
-            for i, ch in enumerate(ln):
-                try:
-                    ch_bbox = draw.textbbox((0, 0), ch, font=font)
-                    ch_w = ch_bbox[2] - ch_bbox[0]
-                except Exception:
-                    ch_w = int(fontsize * 0.6)
-                line_w += ch_w
-                if i < len(ln) - 1:
-                    line_w += ls_px
-            max_w = max(max_w, line_w)
-            total_h += typical_h
-            if idx < len(lines_list) - 1:
-                total_h += spacing
-        return max_w, total_h, typical_h
-
-    def _draw_text_block(origin_x, origin_y, lines_list, block_w, fill=(255, 255, 0, 255), stroke_width=0, stroke_fill=None):
-        x0, y0 = origin_x, origin_y
-        _, _, typical_h = _measure_text_block(lines_list)
-        y = y0
-        for ln in lines_list:
-            # center each line inside the text block width
-            line_w = 0
-            ch_widths = []
-            ls_px = _line_letter_spacing(ln)
-            for i, ch in enumerate(ln):
-                try:
-                    ch_bbox = draw.textbbox((0, 0), ch, font=font)
-                    ch_w = ch_bbox[2] - ch_bbox[0]
-                except Exception:
-                    ch_w = int(fontsize * 0.6)
-                ch_widths.append(ch_w)
-                line_w += ch_w
-                if i < len(ln) - 1:
-                    line_w += ls_px
-            x = origin_x + max(0, (block_w - line_w) // 2)
-            for i, ch in enumerate(ln):
-                draw.text((x, y), ch, font=font, fill=fill,
-                          stroke_width=stroke_width or 0,
-                          stroke_fill=stroke_fill)
-                x += ch_widths[i]
-                if i < len(ln) - 1:
-                    x += ls_px
-            y += typical_h + spacing
-
-    # Measure block size to center within safe area
-    text_w, text_h, typical_h = _measure_text_block(lines)
-    tx = safe_x + max(0, (safe_w - text_w) // 2)
-    ty = safe_y + max(0, (safe_h - text_h) // 2)
+        composed = _render_caption_layered(base_img, layout, font, text_color, fontsize, tx, ty)
+
+    return composed
+
+def _render_caption_passes(base_img, layout, font, text_color, fontsize, tx, ty):
+    """Original renderer: six per-glyph draw passes on a full-size RGBA overlay."""
+    overlay = Image.new("RGBA", base_img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
 
     # Subtle shadow
     shadow_offset = (2, 2)
-    _draw_text_block(tx + shadow_offset[0], ty + shadow_offset[1], lines, text_w, fill=(0, 0, 0, 180))
+    draw_caption_layout(draw, layout, (tx + shadow_offset[0], ty + shadow_offset[1]), font, fill=(0, 0, 0, 180))
     # Simulate bold: extra passes without stroke
     bold_offset = max(1, int(fontsize * 0.02))
     for ox, oy in [(bold_offset, 0), (-bold_offset, 0), (0, bold_offset), (0, -bold_offset)]:
-        _draw_text_block(tx + ox, ty + oy, lines, text_w, fill=(*text_color, 255))
+        draw_caption_layout(draw, layout, (tx + ox, ty + oy), font, fill=(*text_color, 255))
     # Main text: specified color with black stroke
-    _draw_text_block(tx, ty, lines, text_w, fill=(*text_color, 255), stroke_width=2, stroke_fill=(0, 0, 0, 255))
+    draw_caption_layout(draw, layout, (tx, ty), font, fill=(*text_color, 255), stroke_width=2, stroke_fill=(0, 0, 0, 255))
 
-    # Composite and save using PIL to avoid RGBA->JPEG errors
-    try:
-        composed = base_img.convert("RGBA")
-        composed.alpha_composite(overlay)
-        # Save according to extension: JPG/JPEG requires RGB (no alpha)
-        lower = image_path.lower()
-        if lower.endswith((".jpg", ".jpeg")):
-            composed.convert("RGB").save(image_path, quality=95)
-        else:
-            composed.save(image_path)
-        return image_path
-    except Exception as e:
-        print(f"Error saving captioned image: {e}")
-        return None
+    # Composite using PIL to avoid RGBA->JPEG errors
+    composed = base_img.convert("RGBA")
+    composed.alpha_composite(overlay)
+    return composed
+
+def _render_caption_layered(base_img, layout, font, text_color, fontsize, tx, ty):
+    """Render the caption tile once and alpha-composite only its bounding box onto `base_img`."""
+    tile, (ox, oy) = render_caption_tile(layout, font, (*text_color, 255), fontsize)
+    if tile is None:
+        return base_img
+
+    w, h = base_img.size
+    left, top = tx + ox, ty + oy
+    box = (max(0, left), max(0, top), min(w, left + tile.width), min(h, top + tile.height))
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return base_img
+    # Clip the tile to the part that lands on the image
+    tile = tile.crop((box[0] - left, box[1] - top, box[2] - left, box[3] - top))
+
+    region = base_img.crop(box).convert("RGBA")
+    region.alpha_composite(tile)
+    base_img.paste(region.convert("RGB"), box)
+    return base_img
 
 def get_video_duration(video_path):
-    """Gets the duration of a video in seconds using ffprobe."""
-    command = [
-        'ffprobe',
-        '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        video_path
-    ]
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
-        return float(result.stdout)
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"Error getting video duration: {e}")
+    """Gets the duration of a video in seconds (cached media probe)."""
+    info = probe_media(video_path)
+    if info is None or info.duration is None:
+        print(f"Error getting video duration: {video_path}")
         return None
+    return info.duration
 
 def get_video_resolution(video_path):
-    """Gets the resolution of a video using ffprobe."""
-    command = [
-        'ffprobe',
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height',
-        '-of', 'csv=s=x:p=0',
-        video_path
-    ]
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
-        width, height = map(int, result.stdout.strip().split('x'))
-        return width, height
-    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
-        print(f"Error getting video resolution: {e}")
+    """Gets the resolution of a video (cached media probe)."""
+    info = probe_media(video_path)
+    if info is None or info.width is None or info.height is None:
+        print(f"Error getting video resolution: {video_path}")
         return None, None
+    return info.width, info.height
 
-def generate_thumbnail(
-    video_path: str | None = None,
-    image_paths: list[str] | None = None,
-    caption: str | None = None,
-    color: str = 'yellow',
-    compress: bool = True,
-    quality: int = 85,
-):
+def probe_video(video_path):
+    """Gets (duration, width, height) of a video from one cached media probe.
+
+    Returns None for any value that could not be read.
     """
-    生成封面图（缩略图）：支持传入图片组或从竖屏视频随机抽帧拼接。
+    info = probe_media(video_path)
+    if info is None:
+        return None, None, None
+    return info.duration, info.width, info.height
+
+@functools.lru_cache(maxsize=32)
+def _feather_ramp(height: int, overlap: int) -> Image.Image:
+    """返回 (height, overlap) 大小的横向渐变蒙版：第 j 列 alpha = int(255 * j / overlap)。按尺寸缓存复用。"""
+    ramp = (255 * (np.arange(overlap) / float(overlap))).astype(np.uint8)
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(ramp, (height, overlap))), mode='L')
+
+def _resize_to_height(img: Image.Image, h: int) -> Image.Image:
+    """等比缩放到高度 `h`（LANCZOS），高度已一致时原样返回。"""
+    if img.height == h:
+        return img
+    new_w = max(1, int(img.width * h / img.height))
+    return img.resize((new_w, h), Image.LANCZOS)
+
+def stitch_horizontal(images: list, overlap: int = 150) -> Image.Image:
+    """将多张图片按最小高度对齐后水平拼接，相邻图片在重叠区域做线性渐变融合。
+
+    - 所有图片先等比缩放到最小高度；实际重叠宽度为 `max(1, min(overlap, 各图宽度))`。
+    - 渐变蒙版按 (高度, 重叠宽度) 缓存，只在重叠条带内做融合，其余部分直接粘贴。
+    - 输出模式与第一张图片一致，其余图片会转换为相同模式。
 
-    - 图片组：将 `image_paths` 中的图片按高度对齐并水平拼接，边缘采用渐变融合，最终输出到第一张图片所在目录。
-    - 视频：仅当为竖屏视频（高度>宽度）且时长>=180s 时，从中随机抽取 3 帧并拼接，输出到视频同目录。
-    - 可选在生成后叠加字幕（颜色可选）。
-    - 默认开启轻量压缩（`compress=True`，`quality=85`），尽量不影响观感同时减少文件体积。
+    参数：
+        images (list[PIL.Image.Image]): 待拼接的图片（至少 1 张）。
+        overlap (int): 期望的重叠宽度（像素），默认 150。
+
+    返回：
+        PIL.Image.Image: 拼接后的图片。
+    """
+    mode = images[0].mode
+    target_h = min(img.height for img in images)
+    imgs = [_resize_to_height(img if img.mode == mode else img.convert(mode), target_h) for img in images]
+
+    widths = [img.width for img in imgs]
+    overlap = max(1, min(overlap, *widths))
+    total_w = sum(widths) - overlap * (len(imgs) - 1)
+    base = Image.new(mode, (total_w, target_h))
+    ramp = _feather_ramp(target_h, overlap)
+
+    x = 0
+    for idx, img in enumerate(imgs):
+        if idx == 0:
+            base.paste(img, (0, 0))
+            x = img.width
+            continue
+        x -= overlap
+        strip_box = (x, 0, x + overlap, target_h)
+        # 先取出已有内容的重叠条带，整图粘贴后再把条带按渐变蒙版融合回去
+        previous = base.crop(strip_box)
+        base.paste(img, (x, 0))
+        base.paste(Image.composite(img.crop((0, 0, overlap, target_h)), previous, ramp), strip_box)
+        x += img.width
+    return base
+
+# 图片组拼接封面的最大高度：更高的素材（如手机原图）在解码阶段就按比例缩小，
+# 字幕字号随之等比缩小（见 `_compose_thumbnail`），字幕与画面的比例与原尺寸拼接时一致
+STITCH_MAX_HEIGHT = 1080
+
+def stitch_native_height(paths: list[str]) -> int:
+    """不限制高度时拼接结果的高度（各图最小高度），只读取文件头。"""
+    heights = []
+    for path in paths:
+        with Image.open(path) as img:
+            heights.append(img.height)
+    return min(heights)
+
+def stitch_image_files(paths: list[str], overlap: int = 150, max_height: int | None = STITCH_MAX_HEIGHT) -> Image.Image:
+    """低内存版 `stitch_horizontal`：直接从文件拼接，输出 RGB 图像。
+
+    - 先只读取文件头得到各图尺寸，确定目标高度（最小高度，且不超过 `max_height`）与画布大小；
+    - 每张图片单独打开、缩放、粘贴后立即释放，任意时刻只有一张源图在内存中；
+    - JPEG 通过 `Image.draft()` 在解码时直接按 1/2、1/4、1/8 缩小，其余格式缩放时使用
+      `reducing_gap`（先 `reduce` 再 LANCZOS）；
+    - 全程使用 RGB（3 字节/像素），不再分配 RGBA 画布。
+
+    重叠区域的渐变融合与 `stitch_horizontal` 相同。
 
     参数：
-        video_path (str | None): 视频路径；不提供时必须提供 `image_paths`。
-        image_paths (list[str] | None): 图片路径列表；提供时优先使用图片生成封面。
-        caption (str | None): 可选字幕文本。
-        color (str): 字幕颜色。
+        paths (list[str]): 图片路径（至少 1 张）。
+        overlap (int): 期望的重叠宽度（像素），默认 150。
+        max_height (int | None): 输出高度上限；None 表示不限制。
 
     返回：
-        str | None: 生成的封面图路径；失败返回 None。
+        PIL.Image.Image: 拼接后的 RGB 图片。
+    """
+    sizes = []
+    for path in paths:
+        with Image.open(path) as img:
+            sizes.append(img.size)
+    target_h = min(h for _, h in sizes)
+    if max_height:
+        target_h = min(target_h, int(max_height))
+    widths = [w if h == target_h else max(1, int(w * target_h / h)) for w, h in sizes]
+    overlap = max(1, min(overlap, *widths))
+    base = Image.new('RGB', (sum(widths) - overlap * (len(paths) - 1), target_h))
+    ramp = _feather_ramp(target_h, overlap)
+
+    x = 0
+    for idx, (path, width) in enumerate(zip(paths, widths)):
+        with Image.open(path) as src:
+            if src.size != (width, target_h):
+                # JPEG：以不小于目标尺寸的最小缩放比例解码
+                src.draft('RGB', (width, target_h))
+            img = src.convert('RGB')
+        if img.size != (width, target_h):
+            img = img.resize((width, target_h), Image.LANCZOS, reducing_gap=3.0)
+        if idx == 0:
+            base.paste(img, (0, 0))
+        else:
+            x -= overlap
+            strip_box = (x, 0, x + overlap, target_h)
+            previous = base.crop(strip_box)
+            base.paste(img, (x, 0))
+            base.paste(Image.composite(img.crop((0, 0, overlap, target_h)), previous, ramp), strip_box)
+        x += width
+        del img
+    return base
+
+def _save_compressed_jpeg(img: Image.Image, out, do_compress: bool = True, q: int = 85):
+    """以优化的 JPEG 参数保存图片，兼顾体积与观感。
+
+    - 当 `do_compress=True` 时，使用 `quality=q`（默认 85）、`optimize=True`、`progressive=True`、`subsampling=2(4:2:0)`。
+    - 当 `do_compress=False` 时，使用较高质量（95），仍启用 `optimize=True` 与 `progressive=True`。
+    - 输入 `img` 将被转换为 `RGB` 以确保 JPEG 兼容。
+    - `out` 可以是文件路径，也可以是可写的文件对象（如 `io.BytesIO`）。
     """
-    def _save_compressed_jpeg(img: Image.Image, out_path: str, do_compress: bool, q: int):
-        """以优化的 JPEG 参数保存图片，兼顾体积与观感。
+    img_rgb = img.convert('RGB')
+    params = {
+        'format': 'JPEG',
+        'optimize': True,
+        'progressive': True,
+        'subsampling': 2,
+    }
+    if do_compress:
+        params['quality'] = max(10, min(95, int(q)))
+    else:
+        params['quality'] = 95
+    img_rgb.save(out, **params)
+
+def encode_jpeg(img: Image.Image, compress: bool = True, quality: int = 85) -> io.BytesIO:
+    """将图片编码为内存中的 JPEG（参数同 `_save_compressed_jpeg`），返回指针位于开头的 `BytesIO`。"""
+    buf = io.BytesIO()
+    _save_compressed_jpeg(img, buf, compress, quality)
+    buf.seek(0)
+    return buf
+
+# YouTube 实际展示的缩略图尺寸与上传大小上限
+YOUTUBE_THUMBNAIL_SIZE = (1280, 720)
+YOUTUBE_THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+
+def fit_within(img: Image.Image, max_size: tuple[int, int]) -> Image.Image:
+    """等比缩小到不超过 `max_size`（宽, 高）；本身更小时原样返回。"""
+    scale = min(max_size[0] / img.width, max_size[1] / img.height)
+    if scale >= 1:
+        return img
+    new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(new_size, Image.LANCZOS)
+
+def encode_jpeg_to_budget(
+    img: Image.Image,
+    max_bytes: int = YOUTUBE_THUMBNAIL_MAX_BYTES,
+    max_size: tuple[int, int] | None = YOUTUBE_THUMBNAIL_SIZE,
+    min_quality: int = 30,
+    max_quality: int = 92,
+) -> tuple[io.BytesIO, int]:
+    """按字节预算编码 JPEG：先缩小到 `max_size`，再在内存中二分查找不超过 `max_bytes` 的最高质量。
+
+    - 不启用 `optimize`（额外的哈夫曼优化趟数），仍使用 progressive 与 4:2:0 采样；
+    - 最高质量即满足预算时只编码一次；
+    - 最低质量仍超出预算时返回最低质量的结果并打印警告。
 
-        - 当 `do_compress=True` 时，使用 `quality=q`（默认 85）、`optimize=True`、`progressive=True`、`subsampling=2(4:2:0)`。
-        - 当 `do_compress=False` 时，使用较高质量（95），仍启用 `optimize=True` 与 `progressive=True`。
-        - 输入 `img` 将被转换为 `RGB` 以确保 JPEG 兼容。
-        """
-        img_rgb = img.convert('RGB')
-        params = {
-            'format': 'JPEG',
-            'optimize': True,
-            'progressive': True,
-            'subsampling': 2,
-        }
-        if do_compress:
-            params['quality'] = max(10, min(95, int(q)))
+    返回：
+        (BytesIO, quality): 编码结果（指针位于开头）与最终使用的质量。
+    """
+    img = img.convert('RGB')
+    if max_size:
+        img = fit_within(img, max_size)
+
+    def _encode(q: int) -> io.BytesIO:
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=q, progressive=True, subsampling=2)
+        return buf
+
+    encodes = 0
+    best, best_q = None, None
+    lo, hi = min_quality, max_quality
+    # 先试最高质量，多数封面在目标尺寸下一次即可满足预算
+    q = hi
+    while lo <= hi:
+        buf = _encode(q)
+        encodes += 1
+        if buf.tell() <= max_bytes:
+            best, best_q = buf, q
+            lo = q + 1
         else:
-            params['quality'] = 95
-        img_rgb.save(out_path, **params)
+            hi = q - 1
+        q = (lo + hi) // 2
+
+    if best is None:
+        best, best_q = _encode(min_quality), min_quality
+        encodes += 1
+        print(f"Warning: thumbnail exceeds {max_bytes} bytes even at quality {min_quality}.")
+
+    size = best.tell()
+    best.seek(0)
+    print(
+        f"Thumbnail JPEG: {img.width}x{img.height}, quality={best_q}, "
+        f"{size / 1024:.1f} KiB (budget {max_bytes / 1024:.0f} KiB, {encodes} encode(s))"
+    )
+    return best, best_q
+
+def _compose_thumbnail(
+    video_path: str | None = None,
+    image_paths: list[str] | None = None,
+    caption: str | None = None,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    layout_backend: str = LAYOUT_GLYPH,
+    keyframe_only: bool = False,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+):
+    """在内存中完成拼接与字幕叠加，返回 (RGB 图像, 默认输出目录)；失败返回 (None, None)。
+
+    - 图片组：`image_paths` 中的图片按高度对齐水平拼接（`stitch_image_files`，高度不超过
+      `STITCH_MAX_HEIGHT`），输出目录为第一张图片所在目录。拼接结果被缩小时，字幕字号按
+      同一比例缩小，使字幕相对封面的大小与不缩小时相同。
+    - 视频：仅竖屏且时长>=180s 时从低分辨率候选帧中选出质量最好的 3 帧拼接，输出目录为视频所在目录。
+      `keyframe_only=True` 时候选与最终抽帧都只解码关键帧。
+    """
     # 分支一：直接使用图片组拼接
     if image_paths:
         # 过滤不存在的路径
         valid_paths = [p for p in image_paths if isinstance(p, str) and os.path.exists(p)]
         if not valid_paths:
             print("No valid image paths provided.")
-            return None
+            return None, None
 
         try:
-            imgs = [Image.open(p).convert('RGBA') for p in valid_paths]
-            target_h = min(img.height for img in imgs)
-
-            def _resize_to_h(img, h):
-                if img.height == h:
-                    return img
-                new_w = max(1, int(img.width * h / img.height))
-                return img.resize((new_w, h), Image.LANCZOS)
-
-            imgs = [_resize_to_h(img, target_h) for img in imgs]
-
-            widths = [img.width for img in imgs]
-            overlap = max(1, min(150, *widths))
-            total_w = sum(widths) - overlap * (len(imgs) - 1)
-            base = Image.new('RGBA', (total_w, target_h), (0, 0, 0, 0))
-
-            x = 0
-            for idx, img in enumerate(imgs):
-                if idx == 0:
-                    base.paste(img, (x, 0))
-                    x += img.width
-                else:
-                    alpha = np.ones((target_h, img.width), dtype=np.uint8) * 255
-                    for j in range(overlap):
-                        alpha_val = int(255 * (j / float(overlap)))
-                        alpha[:, j] = alpha_val
-                    mask = Image.fromarray(alpha, mode='L')
-                    x = x - overlap
-                    base.paste(img, (x, 0), mask)
-                    x += img.width
-
-            output_thumbnail_path = os.path.join(
-                os.path.dirname(valid_paths[0]), f"generated_thumbnail_{uuid.uuid4().hex[:8]}.jpg"
-            )
-
-            _save_compressed_jpeg(base, output_thumbnail_path, compress, quality)
-
-            if caption:
-                result = add_caption_to_image(output_thumbnail_path, caption, color=color)
-                if result is None:
-                    return None
-            return output_thumbnail_path
+            # 逐张解码（JPEG 按比例缩小解码）并直接拼接到 RGB 画布，不同时持有全部原图
+            native_h = stitch_native_height(valid_paths)
+            base = stitch_image_files(valid_paths)
         except Exception as e:
             print(f"Error stitching provided images: {e}")
-            return None
-
-    # 分支二：从视频抽帧拼接（保留原有逻辑与限制）
-    if not video_path:
-        print("Either image_paths or video_path must be provided.")
-        return None
+            return None, None
+        if base.height < native_h:
+            fontsize = max(1, round(fontsize * base.height / native_h))
+        out_dir = os.path.dirname(valid_paths[0])
+    else:
+        # 分支二：从视频抽帧拼接（保留原有逻辑与限制）
+        if not video_path:
+            print("Either image_paths or video_path must be provided.")
+            return None, None
+
+        duration, width, height = probe_video(video_path)
+
+        print(f"Video duration: {duration} seconds")
+        print(f"Video resolution: {width}x{height}")
+
+        if duration is None or width is None or height is None:
+            return None, None
+
+        if not (height > width):
+            print("Video is not a vertical video, skipping thumbnail generation.")
+            return None, None
+
+        if duration < 180:  # 不足3分钟，则是shorts，不需要生成缩略图
+            print("Video duration is less than 180 seconds, skipping thumbnail generation.")
+            return None, None
+
+        # 先以低分辨率评估一组候选帧，挑出最清晰、非黑场的 3 个时间点；失败时退回随机时间点
+        timestamps = select_frame_timestamps(
+            video_path, duration * 0.1, duration * 0.9, count=3, keyframe_only=keyframe_only
+        )
+        if not timestamps:
+            timestamps = [random.uniform(duration * 0.1, duration * 0.9) for _ in range(3)]
+        # 一次 ffmpeg 调用抽取全分辨率帧，帧经管道直接进入内存，不落临时文件
+        try:
+            frames = extract_frames(video_path, timestamps, keyframe_only=keyframe_only)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            stderr = e.stderr.decode('utf-8', errors='ignore') if isinstance(e, subprocess.CalledProcessError) and e.stderr else e
+            print(f"Error extracting frames: {stderr}")
+            return None, None
+        except ValueError as e:
+            print(f"Error decoding extracted frames: {e}")
+            return None, None
 
-    duration = get_video_duration(video_path)
-    width, height = get_video_resolution(video_path)
+        if len(frames) != 3:
+            print("Could not extract 3 frames.")
+            return None, None
 
-    print(f"Video duration: {duration} seconds")
-    print(f"Video resolution: {width}x{height}")
+        try:
+            base = stitch_horizontal(frames)
+        except Exception as e:
+            print(f"Error stitching frames (PIL): {e}")
+            return None, None
+        out_dir = os.path.dirname(video_path)
 
-    if duration is None or width is None or height is None:
-        return None
+    # 字幕直接画在内存中的拼接结果上，整张封面只编码一次
+    img = base if base.mode == 'RGB' else base.convert('RGB')
+    if caption:
+        try:
+            img = caption_image(
+                img, caption, color=color, font_path=font_path, fontsize=fontsize,
+                spacing_ratio=spacing_ratio, layout_backend=layout_backend,
+            )
+        except Exception as e:
+            print(f"Error adding caption to thumbnail: {e}")
+            return None, None
+    return img, out_dir
 
-    if not (height > width):
-        print("Video is not a vertical video, skipping thumbnail generation.")
+def render_thumbnail(
+    video_path: str | None = None,
+    image_paths: list[str] | None = None,
+    caption: str | None = None,
+    color: str = 'yellow',
+    compress: bool = True,
+    quality: int = 85,
+    font_path: str | None = None,
+    output_path: str | None = None,
+    max_bytes: int | None = None,
+    layout_backend: str = LAYOUT_GLYPH,
+    keyframe_only: bool = False,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+) -> io.BytesIO | None:
+    """与 `generate_thumbnail` 相同的封面，但以内存中的 JPEG（`BytesIO`）返回。
+
+    拼接、字幕、编码都在内存中完成且只编码一次，可直接交给 `YouTubeClient.set_thumbnail` 上传。
+    `output_path` 非空时额外把同一份字节写入磁盘（不再重新编码）。失败返回 None。
+    `max_bytes` 非空时改用 `encode_jpeg_to_budget`：缩小到 1280x720 并按字节预算自动选择质量
+    （此时忽略 `compress`/`quality`）。
+    """
+    img, _ = _compose_thumbnail(
+        video_path, image_paths, caption, color, font_path, layout_backend, keyframe_only,
+        fontsize=fontsize, spacing_ratio=spacing_ratio,
+    )
+    if img is None:
         return None
+    if max_bytes:
+        buf, _ = encode_jpeg_to_budget(img, max_bytes)
+    else:
+        buf = encode_jpeg(img, compress, quality)
+    if output_path:
+        with open(output_path, 'wb') as f:
+            f.write(buf.getbuffer())
+    return buf
 
-    if duration < 180:  # 不足3分钟，则是shorts，不需要生成缩略图
-        print("Video duration is less than 180 seconds, skipping thumbnail generation.")
-        return None
+def generate_thumbnail(
+    video_path: str | None = None,
+    image_paths: list[str] | None = None,
+    caption: str | None = None,
+    color: str = 'yellow',
+    compress: bool = True,
+    quality: int = 85,
+    font_path: str | None = None,
+    layout_backend: str = LAYOUT_GLYPH,
+    keyframe_only: bool = False,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+):
+    """
+    生成封面图（缩略图）：支持传入图片组或从竖屏视频抽帧拼接。
 
-    temp_dir = f"temp_frames_{uuid.uuid4().hex}"
-    os.makedirs(temp_dir, exist_ok=True)
-
-    frame_paths = []
-    run_id = uuid.uuid4().hex
-    for i in range(3):
-        random_time = random.uniform(duration * 0.1, duration * 0.9)
-        frame_path = os.path.join(temp_dir, f'frame_{i+1}_{run_id}.jpg')
-
-        command = [
-            'ffmpeg',
-            '-ss', str(random_time),
-            '-i', video_path,
-            '-vframes', '1',
-            '-q:v', '2',
-            frame_path,
-            '-y'
-        ]
-        try:
-            subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-            frame_paths.append(frame_path)
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            print(f"Error extracting frame {i+1}: {e.stderr if isinstance(e, subprocess.CalledProcessError) else e}")
-            for fp in frame_paths:
-                if os.path.exists(fp):
-                    os.remove(fp)
-            if os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
-            return None
+    - 图片组：将 `image_paths` 中的图片按高度对齐并水平拼接，边缘采用渐变融合，最终输出到第一张图片所在目录。
+    - 视频：仅当为竖屏视频（高度>宽度）且时长>=180s 时，从低分辨率候选帧中评估并选出
+      最清晰、非黑场的 3 帧（见 `youtube/frame_select.py`），全分辨率抽取后拼接，输出到视频同目录。
+    - 可选叠加字幕（颜色可选）；字幕在内存中叠加后整体只编码一次。
+    - 默认开启轻量压缩（`compress=True`，`quality=85`），尽量不影响观感同时减少文件体积。
+    - 不需要落盘时可使用 `render_thumbnail` 直接得到内存中的 JPEG。
 
-    if len(frame_paths) != 3:
-        print("Could not extract 3 frames.")
-        for fp in frame_paths:
-            if os.path.exists(fp):
-                os.remove(fp)
-        if os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
-        return None
+    参数：
+        video_path (str | None): 视频路径；不提供时必须提供 `image_paths`。
+        image_paths (list[str] | None): 图片路径列表；提供时优先使用图片生成封面。
+        caption (str | None): 可选字幕文本。
+        color (str): 字幕颜色。
+        font_path (str | None): 字幕字体路径；默认自动在 `fonts/` 中探测。
+        layout_backend (str): 字幕排版后端，"glyph"（逐字符）或 "line"（整行绘制，保留字距调整）。
+        keyframe_only (bool): 只解码关键帧（`-skip_frame nokey`），取时间点之后最近的关键帧，
+            长视频上抽帧明显更快，纯 CPU 实现。
+        fontsize (int): 字幕字号（像素）。
+        spacing_ratio (float): 行距占字号的比例。
 
-    output_thumbnail_path = os.path.join(
-        os.path.dirname(video_path), f"generated_thumbnail_{uuid.uuid4().hex[:8]}.jpg"
+    返回：
+        str | None: 生成的封面图路径；失败返回 None。
+    """
+    img, out_dir = _compose_thumbnail(
+        video_path, image_paths, caption, color, font_path, layout_backend, keyframe_only,
+        fontsize=fontsize, spacing_ratio=spacing_ratio,
     )
+    if img is None:
+        return None
 
+    output_thumbnail_path = os.path.join(out_dir, f"generated_thumbnail_{uuid.uuid4().hex[:8]}.jpg")
     try:
-        imgs = [Image.open(fp).convert('RGBA') for fp in frame_paths]
-        target_h = min(img.height for img in imgs)
-
-        def _resize_to_h(img, h):
-            if img.height == h:
-                return img
-            new_w = max(1, int(img.width * h / img.height))
-            return img.resize((new_w, h), Image.LANCZOS)
-
-        imgs = [_resize_to_h(img, target_h) for img in imgs]
-
-        widths = [img.width for img in imgs]
-        overlap = max(1, min(150, *widths))
-        total_w = sum(widths) - overlap * (len(imgs) - 1)
-        base = Image.new('RGBA', (total_w, target_h), (0, 0, 0, 0))
-
-        x = 0
-        for idx, img in enumerate(imgs):
-            if idx == 0:
-                base.paste(img, (x, 0))
-                x += img.width
-            else:
-                alpha = np.ones((target_h, img.width), dtype=np.uint8) * 255
-                for j in range(overlap):
-                    alpha_val = int(255 * (j / float(overlap)))
-                    alpha[:, j] = alpha_val
-                mask = Image.fromarray(alpha, mode='L')
-                x = x - overlap
-                base.paste(img, (x, 0), mask)
-                x += img.width
-
-        _save_compressed_jpeg(base, output_thumbnail_path, compress, quality)
-
-        if caption:
-            result = add_caption_to_image(output_thumbnail_path, caption, color=color)
-            if result is None:
-                output_thumbnail_path = None
+        _save_compressed_jpeg(img, output_thumbnail_path, compress, quality)
     except Exception as e:
-        print(f"Error stitching frames (PIL): {e}")
-        output_thumbnail_path = None
+        print(f"Error saving thumbnail: {e}")
+        return None
+    return output_thumbnail_path
 
-    for fp in frame_paths:
-        if os.path.exists(fp):
-            os.remove(fp)
-    if os.path.exists(temp_dir):
-        os.rmdir(temp_dir)
+def _pick_single_timestamp(video_path: str, duration: float) -> float:
+    """Best-scoring single frame between 10% and 90% of the video, or a random time if sampling fails."""
+    selected = select_frame_timestamps(video_path, duration * 0.1, duration * 0.9, count=1)
+    return selected[0] if selected else random.uniform(duration * 0.1, duration * 0.9)
 
-    return output_thumbnail_path
+# `generate_stream_thumbnail` 的输出文件名（写在视频所在目录）
+STREAM_THUMBNAIL_NAME = "generated_stream_thumbnail.jpg"
 
-def generate_stream_thumbnail(video_path, caption: str = None, color: str = 'yellow'):
+def generate_stream_thumbnail(
+    video_path,
+    caption: str = None,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    layout_backend: str = LAYOUT_GLYPH,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+):
     """
     Generates a thumbnail for a live stream based on video orientation.
 
-    - For vertical videos (height > width), it stitches 3 random frames.
-    - For horizontal videos (width >= height), it extracts a single random frame.
+    - For vertical videos (height > width), it stitches 3 frames.
+    - For horizontal videos (width >= height), it extracts a single frame.
+    - Frames are chosen by scoring low-resolution candidates (see `youtube/frame_select.py`):
+      sharp, non-black frames win over the previous blind random picks.
 
     Args:
         video_path (str): The path to the video file.
+        caption (str | None): Optional caption text.
+        color (str): Caption color.
+        font_path (str | None): Caption font; defaults to the first available font under `fonts/`.
+        layout_backend (str): Caption layout backend, "glyph" or "line".
+        fontsize (int): Caption font size in pixels.
+        spacing_ratio (float): Line spacing as a fraction of the font size.
+
+    The thumbnail is rendered in memory (`render_stream_thumbnail`, full size) and published as
+    `generated_stream_thumbnail.jpg` next to the video through a temporary file and an atomic
+    rename, so repeated calls replace one file instead of leaving a new one each time.
 
     Returns:
         str: The path to the generated thumbnail, or None if generation fails.
     """
-    duration = get_video_duration(video_path)
-    width, height = get_video_resolution(video_path)
+    buf = render_stream_thumbnail(
+        video_path, caption, color, font_path=font_path, max_bytes=None,
+        layout_backend=layout_backend, fontsize=fontsize, spacing_ratio=spacing_ratio,
+    )
+    if buf is None:
+        return None
 
-    if duration is None or width is None or height is None:
+    # 固定文件名，重复调用覆盖同一个文件而不是在视频目录里越积越多；
+    # 先写临时文件再原子改名，读取方看不到写了一半的图片
+    output_thumbnail_path = os.path.join(os.path.dirname(video_path), STREAM_THUMBNAIL_NAME)
+    part_path = os.path.join(os.path.dirname(video_path), f".{STREAM_THUMBNAIL_NAME}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with open(part_path, 'wb') as f:
+            f.write(buf.getbuffer())
+        os.replace(part_path, output_thumbnail_path)
+    except OSError as e:
+        print(f"Error saving stream thumbnail: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return None
+    return output_thumbnail_path
+
+
+def render_stream_thumbnail(
+    video_path,
+    caption: str = None,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    max_bytes: int | None = YOUTUBE_THUMBNAIL_MAX_BYTES,
+    layout_backend: str = LAYOUT_GLYPH,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    spacing_ratio: float = 0.5,
+) -> io.BytesIO | None:
+    """
+    In-memory variant of `generate_stream_thumbnail`: returns the thumbnail as a JPEG `BytesIO`.
+
+    Frames are piped from ffmpeg, captioned in memory and encoded once; nothing is written to disk.
+    With `max_bytes` (default: YouTube's 2 MB limit) the image is downscaled to 1280x720 and its
+    JPEG quality is chosen to fit the byte budget; pass None for the previous full-size encode.
+
+    Returns:
+        io.BytesIO | None: The encoded thumbnail, or None if generation fails.
+    """
+    duration, width, height = probe_video(video_path)
 
-    output_thumbnail_path = os.path.join(os.path.dirname(video_path), 'generated_stream_thumbnail.jpg')
+    if duration is None or width is None or height is None:
+        return None
 
     if height > width:  # Vertical video
         print("Vertical video detected. Generating a 3-frame stitched thumbnail.")
-        return generate_thumbnail(video_path, caption, color) # Reuse existing logic; add caption if provided
-    else:  # Horizontal or square video
-        print("Horizontal/square video detected. Generating a single-frame thumbnail.")
-        random_time = random.uniform(duration * 0.1, duration * 0.9)
-        command = [
-            'ffmpeg',
-            '-ss', str(random_time),
-            '-i', video_path,
-            '-vframes', '1',
-            '-q:v', '2',
-            output_thumbnail_path,
-            '-y'
-        ]
+        return render_thumbnail(
+            video_path=video_path,
+            caption=caption,
+            color=color,
+            font_path=font_path,
+            max_bytes=max_bytes,
+            layout_backend=layout_backend,
+            fontsize=fontsize,
+            spacing_ratio=spacing_ratio,
+        )
+
+    print("Horizontal/square video detected. Generating a single-frame thumbnail.")
+    random_time = _pick_single_timestamp(video_path, duration)
+    try:
+        frames = extract_frames(video_path, [random_time])
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        print(f"Error extracting single frame: {e.stderr if isinstance(e, subprocess.CalledProcessError) else e}")
+        return None
+    if not frames:
+        print("Could not extract a frame.")
+        return None
+
+    img = frames[0]
+    if caption:
         try:
-            subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-            if caption:
-                result = add_caption_to_image(output_thumbnail_path, caption, color=color)
-                return result
-            return output_thumbnail_path
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            print(f"Error extracting single frame: {e.stderr if isinstance(e, subprocess.CalledProcessError) else e}")
+            img = caption_image(
+                img, caption, color=color, font_path=font_path, fontsize=fontsize,
+                spacing_ratio=spacing_ratio, layout_backend=layout_backend,
+            )
+        except Exception as e:
+            print(f"Error adding caption to thumbnail: {e}")
             return None
+    if max_bytes:
+        buf, _ = encode_jpeg_to_budget(img, max_bytes)
+        return buf
+    # 与原先 ffmpeg `-q:v 2` 的单帧截图相当的高质量编码
+    return encode_jpeg(img, compress=False)
 
 
 def generate_thumbhail_by_pics(pic_paths: list[str], output_path: str, caption: str = None, color: str = 'yellow') -> str | None:
@@ -655,6 +791,110 @@ def generate_thumbhail_by_pics(pic_paths: list[str], output_path: str, caption:
     return generate_thumbnail(pic_paths, caption, color)
 
 
+@dataclass
+class ThumbnailJob:
+    """批量生成中的单个任务。
+
+    - kind='images'：由 `image_paths` 拼接封面；
+    - kind='video'：竖屏视频抽帧拼接（同 `generate_thumbnail`）；
+    - kind='stream'：直播缩略图（同 `generate_stream_thumbnail`）；
+    - kind='caption'：直接在 `image_paths[0]` 上叠加字幕。
+
+    `output_path` 非空时，生成结果会被写到该路径：'images'/'video'/'stream' 在内存中渲染后直接
+    写入，不在素材目录中产生中间文件；'caption' 的结果会被移动到该路径。
+    """
+
+    kind: str = 'images'
+    image_paths: list = field(default_factory=list)
+    video_path: str | None = None
+    caption: str | None = None
+    color: str = 'yellow'
+    output_path: str | None = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+
+
+@dataclass
+class ThumbnailResult:
+    """批量任务的结果：`path` 为 None 表示失败，`error` 给出原因；`elapsed` 为任务耗时（秒）。"""
+
+    job: ThumbnailJob
+    path: str | None
+    elapsed: float
+    error: str | None = None
+    worker_pid: int = 0
+
+
+# 批量任务工作进程内的生成器实例（由 `_init_batch_worker` 创建，字体在进程内常驻）
+_batch_generator = None
+
+
+def _init_batch_worker(font_path: str | None, fontsize: int, spacing_ratio: float, layout_backend: str = LAYOUT_GLYPH) -> None:
+    """进程池初始化：每个工作进程创建一次生成器并预热字体。"""
+    global _batch_generator
+    _batch_generator = ThumbnailGenerator(
+        font_path=font_path,
+        fontsize=fontsize,
+        spacing_ratio=spacing_ratio,
+        layout_backend=layout_backend,
+    )
+    _batch_generator.preload_font()
+
+
+def _run_thumbnail_job(job: ThumbnailJob) -> ThumbnailResult:
+    """在当前进程执行一个批量任务，异常转为失败结果而不是向上抛出。"""
+    start = time.perf_counter()
+    path, error = None, None
+    try:
+        tg = _batch_generator
+        if job.output_path and job.kind in ('images', 'video', 'stream'):
+            return _render_job_to_output(tg, job, start)
+        if job.kind == 'images':
+            path = tg.generate_thumbnail(image_paths=job.image_paths, caption=job.caption, color=job.color)
+        elif job.kind == 'video':
+            path = tg.generate_thumbnail(video_path=job.video_path, caption=job.caption, color=job.color)
+        elif job.kind == 'stream':
+            path = tg.generate_stream_thumbnail(job.video_path, caption=job.caption, color=job.color)
+        elif job.kind == 'caption':
+            path = tg.add_caption_to_image(job.image_paths[0], job.caption, color=job.color)
+        else:
+            error = f"Unknown job kind: {job.kind}"
+
+        if path and job.output_path and os.path.abspath(path) != os.path.abspath(job.output_path):
+            os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+            shutil.move(path, job.output_path)
+            path = job.output_path
+        if path is None and error is None:
+            error = "thumbnail generation failed"
+    except Exception as e:
+        path, error = None, f"{type(e).__name__}: {e}"
+    return ThumbnailResult(job=job, path=path, elapsed=time.perf_counter() - start, error=error, worker_pid=os.getpid())
+
+
+def _render_job_to_output(tg, job: ThumbnailJob, start: float) -> ThumbnailResult:
+    """在内存中渲染任务并直接写到 `job.output_path`；失败时删除写了一半的文件。"""
+    path, error = None, None
+    try:
+        if job.kind == 'stream':
+            # 与 `generate_stream_thumbnail` 的落盘结果一致：原尺寸编码
+            buf = tg.render_stream_thumbnail(job.video_path, caption=job.caption, color=job.color, max_bytes=None)
+        elif job.kind == 'images':
+            buf = tg.render_thumbnail(image_paths=job.image_paths, caption=job.caption, color=job.color)
+        else:
+            buf = tg.render_thumbnail(video_path=job.video_path, caption=job.caption, color=job.color)
+        if buf is None:
+            error = "thumbnail generation failed"
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+            with open(job.output_path, 'wb') as f:
+                f.write(buf.getbuffer())
+            path = job.output_path
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    if path is None and os.path.exists(job.output_path):
+        os.remove(job.output_path)
+    return ThumbnailResult(job=job, path=path, elapsed=time.perf_counter() - start, error=error, worker_pid=os.getpid())
+
+
 class ThumbnailGenerator:
     """缩略图与字幕生成器（面向对象封装）。
 
@@ -670,29 +910,33 @@ class ThumbnailGenerator:
         >>> # 生成直播缩略图（横屏单帧/竖屏复用三帧拼接）
         >>> stream_thumb = tg.generate_stream_thumbnail("/path/to/stream.mp4", caption="直播回放")
 
+    字体通过进程级字体注册表加载（见 `youtube/fonts.py`），多个实例与过程式 API 共享同一份字体对象。
+
     参数：
         font_path (str | None): 指定字体路径；默认自动在 `fonts/` 中探测可用字体。
         fontsize (int): 字体大小，默认 160。
         spacing_ratio (float): 行距与字体大小比例，默认 0.5（约 1.5x 行高）。
+        layout_backend (str): 字幕排版后端：'glyph'（默认，逐字符绘制）或 'line'
+            （整行一次绘制并保留字距调整，仅需中日韩字间距的行逐字符绘制）。
     """
 
-    def __init__(self, font_path: str | None = None, fontsize: int = 160, spacing_ratio: float = 0.5):
-        self.font_path = font_path or _find_font_file()
+    def __init__(
+        self,
+        font_path: str | None = None,
+        fontsize: int = 160,
+        spacing_ratio: float = 0.5,
+        layout_backend: str = LAYOUT_GLYPH,
+    ):
+        if layout_backend not in LAYOUT_BACKENDS:
+            raise ValueError(f"Unknown layout backend: {layout_backend}")
+        self.font_path = font_path or find_font_file()
         self.fontsize = fontsize
         self.spacing_ratio = spacing_ratio
-        # 文本颜色映射
-        self.color_map = {
-            'yellow': (255, 255, 0),
-            'red': (255, 0, 0),
-            'blue': (0, 100, 255),
-            'green': (0, 255, 0),
-            'white': (255, 255, 255),
-            'orange': (255, 165, 0),
-            'purple': (128, 0, 128),
-            'cyan': (0, 255, 255),
-        }
-
-    def add_caption_to_image(self, image_path: str, caption: str, color: str = 'yellow') -> str | None:
+        self.layout_backend = layout_backend
+        # 文本颜色映射（与模块级 CAPTION_COLORS 共用一份）
+        self.color_map = CAPTION_COLORS
+
+    def add_caption_to_image(self, image_path: str, caption: str, color: str = 'yellow', fit_to_box: bool = False) -> str | None:
         """为图片叠加居中且自动换行的字幕。
 
         - 依据安全区域（左右 15%、上下 15%）自动换行并居中排列。
@@ -703,12 +947,26 @@ class ThumbnailGenerator:
             image_path (str): 图片路径。
             caption (str): 字幕文本。
             color (str): 文本颜色名，如 'yellow'、'red' 等。
+            fit_to_box (bool): 为 True 时自动选择能填满安全区域的最大字号（忽略实例的 `fontsize`）。
 
         返回：
             str | None: 处理后的图片路径或 None。
         """
         # 复用现有过程式实现，保持行为一致并降低引入风险
-        return add_caption_to_image(image_path, caption, color)
+        return add_caption_to_image(
+            image_path,
+            caption,
+            color,
+            font_path=self.font_path,
+            fontsize=self.fontsize,
+            spacing_ratio=self.spacing_ratio,
+            layout_backend=self.layout_backend,
+            fit_to_box=fit_to_box,
+        )
+
+    def preload_font(self):
+        """预加载本实例使用的字体（进程内只加载一次），返回字体对象。"""
+        return get_font(self.font_path, self.fontsize)
 
     def get_video_duration(self, video_path: str) -> float | None:
         """使用 ffprobe 获取视频时长（秒）。失败返回 None。"""
@@ -723,20 +981,53 @@ class ThumbnailGenerator:
         video_path: str | None = None,
         image_paths: list[str] | None = None,
         caption: str | None = None,
-        color: str = 'yellow'
+        color: str = 'yellow',
+        keyframe_only: bool = False,
     ) -> str | None:
-        """生成封面图：支持传入图片组或从竖屏视频随机抽帧拼接。
+        """生成封面图：支持传入图片组或从竖屏视频抽帧拼接。
 
         参数：
             video_path (str | None): 视频路径；不提供时可传 `image_paths`。
             image_paths (list[str] | None): 图片路径列表；优先使用图片生成。
             caption (str | None): 可选字幕文本。
             color (str): 字幕颜色。
+            keyframe_only (bool): 视频抽帧时只解码关键帧。
 
         返回：
             str | None: 生成的封面图路径或 None。
         """
-        return generate_thumbnail(video_path=video_path, image_paths=image_paths, caption=caption, color=color)
+        return generate_thumbnail(
+            video_path=video_path,
+            image_paths=image_paths,
+            caption=caption,
+            color=color,
+            font_path=self.font_path,
+            layout_backend=self.layout_backend,
+            keyframe_only=keyframe_only,
+            fontsize=self.fontsize,
+            spacing_ratio=self.spacing_ratio,
+        )
+
+    def render_thumbnail(
+        self,
+        video_path: str | None = None,
+        image_paths: list[str] | None = None,
+        caption: str | None = None,
+        color: str = 'yellow',
+        keyframe_only: bool = False,
+    ) -> io.BytesIO | None:
+        """与 `generate_thumbnail` 相同，但返回内存中的 JPEG（`BytesIO`），不写磁盘。"""
+        return render_thumbnail(
+            video_path=video_path,
+            image_paths=image_paths,
+            caption=caption,
+            color=color,
+            font_path=self.font_path,
+            layout_backend=self.layout_backend,
+            keyframe_only=keyframe_only,
+            fontsize=self.fontsize,
+            spacing_ratio=self.spacing_ratio,
+        )
 
     def generate_stream_thumbnail(self, video_path: str, caption: str | None = None, color: str = 'yellow') -> str | None:
         """生成直播缩略图：竖屏复用三帧拼接；横/方屏截取单帧。
@@ -749,4 +1040,59 @@ class ThumbnailGenerator:
         返回：
             str | None: 生成的缩略图路径或 None。
         """
-        return generate_stream_thumbnail(video_path, caption, color)
\ No newline at end of file
+        return generate_stream_thumbnail(
+            video_path, caption, color, font_path=self.font_path, layout_backend=self.layout_backend,
+            fontsize=self.fontsize, spacing_ratio=self.spacing_ratio,
+        )
+
+    def render_stream_thumbnail(
+        self,
+        video_path: str,
+        caption: str | None = None,
+        color: str = 'yellow',
+        max_bytes: int | None = YOUTUBE_THUMBNAIL_MAX_BYTES,
+    ) -> io.BytesIO | None:
+        """与 `generate_stream_thumbnail` 相同，但返回内存中的 JPEG（`BytesIO`），不写磁盘。
+
+        默认与模块函数 `render_stream_thumbnail` 一致：缩小到 1280x720 并控制在 `max_bytes` 以内，
+        可直接上传；传 None 时按原尺寸编码。
+        """
+        return render_stream_thumbnail(
+            video_path, caption, color, font_path=self.font_path, max_bytes=max_bytes,
+            layout_backend=self.layout_backend, fontsize=self.fontsize, spacing_ratio=self.spacing_ratio,
+        )
+
+    def generate_batch(self, jobs, workers: int | None = None):
+        """使用进程池批量生成缩略图，按完成顺序逐个产出 `ThumbnailResult`。
+
+        - 每个工作进程只初始化一次（加载字体并常驻），之后的任务复用同一份字体与排版缓存；
+        - PIL 绘制受 GIL 限制，使用进程而不是线程才能用满多核；
+        - `workers` 默认为 CPU 核数；为 1 时在当前进程内顺序执行，不创建进程池。
+
+        参数：
+            jobs (Iterable[ThumbnailJob]): 任务列表。
+            workers (int | None): 工作进程数。
+
+        返回：
+            Iterator[ThumbnailResult]: 按完成顺序产出的结果（含单任务耗时）。
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        workers = max(1, min(int(workers or os.cpu_count() or 1), len(jobs)))
+        init_args = (self.font_path, self.fontsize, self.spacing_ratio, self.layout_backend)
+
+        if workers == 1:
+            _init_batch_worker(*init_args)
+            for job in jobs:
+                yield _run_thumbnail_job(job)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=init_args) as executor:
+            futures = {executor.submit(_run_thumbnail_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # 工作进程异常退出等情况，任务本身的异常已在 _run_thumbnail_job 中处理
+                    yield ThumbnailResult(job=futures[future], path=None, elapsed=0.0, error=f"{type(e).__name__}: {e}")
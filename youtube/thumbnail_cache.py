@@ -0,0 +1,215 @@
+"""
+内容寻址的缩略图缓存。
+
+每次直播/上传都会把底图复制一份、叠加字幕、上传后再删除，同一张封面配同一句字幕
+一天内会被重复渲染几十次。本模块把渲染结果按内容寻址保存在账号目录下：
+
+- 键为 (源内容, 字幕, 颜色, 字体, 字号) 的 SHA-256；源内容为底图字节的哈希；
+- 从视频抽帧生成的缩略图不进缓存：抽帧时间点每次随机选取（见 `youtube/frame_select.py`），
+  同一个键不会再次出现；
+- 命中时直接返回缓存中的 JPEG，不做任何解码/编码；
+- 目录总大小超过上限时按最近使用时间（LRU）淘汰。
+
+缓存文件由缓存自身管理，调用方不应删除。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+from PIL import Image
+
+from .fonts import DEFAULT_FONT_SIZE, find_font_file
+from .thumbnail import YOUTUBE_THUMBNAIL_MAX_BYTES, caption_image, encode_jpeg_to_budget
+
+# 账号目录下的缓存子目录名
+CACHE_DIRNAME = "thumbnail_cache"
+
+# 默认缓存上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 字幕渲染逻辑变化时递增，使旧缓存自然失效
+RENDER_VERSION = 2
+
+# 底图内容哈希的进程内缓存上限（条），超过后淘汰最久未使用的条目
+SOURCE_DIGEST_CACHE_SIZE = 1024
+
+# 底图内容哈希的进程内缓存：(路径, 大小, 修改时间) -> sha256，按 LRU 淘汰
+_source_digests: "OrderedDict[tuple, str]" = OrderedDict()
+_source_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """返回文件内容的 SHA-256；同一进程内按 (路径, 大小, 修改时间) 复用最近的结果。"""
+    st = os.stat(path)
+    stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _source_lock:
+        digest = _source_digests.get(stat_key)
+        if digest is not None:
+            _source_digests.move_to_end(stat_key)
+            return digest
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _source_lock:
+        _source_digests[stat_key] = digest
+        while len(_source_digests) > SOURCE_DIGEST_CACHE_SIZE:
+            _source_digests.popitem(last=False)
+    return digest
+
+
+class ThumbnailCache:
+    """磁盘上的内容寻址缩略图缓存，按总大小上限做 LRU 淘汰。
+
+    参数：
+        cache_dir (str): 缓存目录。
+        max_bytes (int): 缓存总大小上限（字节）。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_account(cls, auth_dir: str, max_bytes: int = DEFAULT_MAX_BYTES) -> "ThumbnailCache":
+        """由账号的 `auth2.0` 目录定位账号目录，返回其下的缓存。"""
+        account_dir = os.path.dirname(os.path.abspath(auth_dir))
+        return cls(os.path.join(account_dir, CACHE_DIRNAME), max_bytes=max_bytes)
+
+    @staticmethod
+    def make_key(source: dict, caption: str | None, color: str, font_path: str | None = None, fontsize: int = DEFAULT_FONT_SIZE) -> str:
+        """由来源描述与渲染参数计算缓存键。"""
+        payload = {
+            'v': RENDER_VERSION,
+            'source': source,
+            'caption': caption or '',
+            'color': color,
+            'font': os.path.basename(font_path or find_font_file() or ''),
+            'fontsize': int(fontsize),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def image_key(
+        cls,
+        image_path: str,
+        caption: str | None,
+        color: str,
+        font_path: str | None = None,
+        fontsize: int = DEFAULT_FONT_SIZE,
+        max_bytes: int | None = None,
+    ) -> str:
+        """底图 + 字幕（+ 编码字节预算）的缓存键（底图按内容哈希，改名或移动不影响命中）。"""
+        return cls.make_key({'image': file_digest(image_path), 'max_bytes': max_bytes}, caption, color, font_path, fontsize)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def get(self, key: str) -> str | None:
+        """命中时返回缓存文件路径并刷新其使用时间，否则返回 None。"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, src_path: str, move: bool = False) -> str:
+        """把已渲染好的文件放入缓存（原子替换），返回缓存中的路径。"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        if move:
+            shutil.move(src_path, tmp_path)
+        else:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def new_work_path(self) -> str:
+        """返回缓存目录内的临时工作文件路径（.jpg），渲染完成后可直接 `put(..., move=True)`。"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, f"work_{uuid.uuid4().hex}.jpg")
+
+    def _entries(self) -> list:
+        entries = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith('.jpg') or name.startswith('work_'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: str | None = None) -> int:
+        """总大小超过上限时删除最久未使用的条目（`keep` 除外），返回删除的文件数。"""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
+
+
+def get_captioned_thumbnail(
+    cache: ThumbnailCache,
+    base_image: str,
+    caption: str,
+    color: str = 'yellow',
+    font_path: str | None = None,
+    fontsize: int = DEFAULT_FONT_SIZE,
+    max_bytes: int = YOUTUBE_THUMBNAIL_MAX_BYTES,
+) -> str | None:
+    """返回 `base_image` 叠加字幕后的缓存路径；未命中时渲染一次并写入缓存。
+
+    结果按 `encode_jpeg_to_budget` 缩小到 1280x720 并控制在 `max_bytes` 以内，可直接上传。
+    底图本身不会被修改。失败返回 None。
+    """
+    key = ThumbnailCache.image_key(base_image, caption, color, font_path, fontsize, max_bytes)
+    cached = cache.get(key)
+    if cached:
+        print(f"Thumbnail cache hit: {cached}")
+        return cached
+
+    try:
+        with Image.open(base_image) as img:
+            base = img.convert('RGB')
+        composed = caption_image(base, caption, color=color, font_path=font_path, fontsize=fontsize)
+        buf, _ = encode_jpeg_to_budget(composed, max_bytes)
+    except Exception as e:
+        print(f"Error rendering captioned thumbnail: {e}")
+        return None
+
+    work_path = cache.new_work_path()
+    try:
+        with open(work_path, 'wb') as f:
+            f.write(buf.getbuffer())
+        return cache.put(key, work_path, move=True)
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)